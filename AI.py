@@ -1,11 +1,17 @@
 # AI class
 import numpy as np
-import tensorflow as tf
+from replay import ReplayBuffer
+from numpy_net import NumpyNet
+from model_factory import factory, modelState, setModelState
+from history import GRAPH_CHANNELS, NODE_TYPES, isGraph, stateShape
+# tensorflow is imported only when a model is built or loaded, so runs
+# without a TF backed AI never pay for it
 
 class AI:
     def __init__(self, state_size : int = 5, action_size : int = 5,
                  learning_rate : float = 0.01, alpha : float = 0.1, gamma : float = 0.9, 
-                 exploration : float = 1.0, exploration_decay : float = 0.94, NN_data : dict = None, model_loc : str = None) -> None:
+                 exploration : float = 1.0, exploration_decay : float = 0.94, NN_data : dict = None, model_loc : str = None,
+                 replay_data : dict = None, inference : str = "keras", sync_every : int = 1) -> None:
         """
         AI class.
 
@@ -17,8 +23,15 @@ class AI:
             gamma = (float) significance of previous reward\n
             exploration = (float) determines exploration\n
             exploration_decay = (float) rate of exploration decay\n
-            NN_data = (dict) {"name" : dense} type of neural_net\n
+            NN_data = (dict) {"name" : dense} type of neural_net, "dense", "lstm" or "stgraph" (graph attention
+                      over the gut graph, "units" and "heads" set its size, "nodes" and "channels" its input),
+                      "lstm_memory" is the window of lstm and stgraph\n
             model_loc = (str) for importing model eg : "./data/model.h5"\n
+            replay_data = (dict) {"capacity" : (int), "batch_size" : (int), "train_every" : (int)} train from an
+                          experience replay buffer, one gradient step on a minibatch every train_every calls.
+                          None trains online on every transition\n
+            inference = (str) "keras" or "numpy" : decide runs on a numpy copy of the (dense) model\n
+            sync_every = (int) numpy copy is refreshed after this many weight updates\n
         """
         self.state_size = state_size
         self.action_size = action_size
@@ -27,18 +40,67 @@ class AI:
         self.gamma = gamma
         self.exploration = exploration
         self.exploration_decay = exploration_decay
-        if model_loc == None:
-            if NN_data["type"] == "dense":
-                self.model = self._build_dense()
-            elif NN_data["type"] == "LSTM":
-                self.model = self._build_LSTM(**NN_data)
-        else:
-            self.model = tf.keras.models.load_model(model_loc)
+        # the keras model is made on first use (see model), a PooledModel running on the one
+        # compiled model of its architecture (or of its model file)
+        self.NN_data = NN_data
+        self.model_loc = model_loc
+        self._model = None
+        # numpy inference copy of the model
+        self.numpy_model = None
+        self.sync_every = sync_every
+        self.updates_since_sync = 0
+        # weight updates so far
+        self.updates = 0
+        if inference == "numpy":
+            self.numpy_model = NumpyNet(self.model)
+        elif inference != "keras":
+            raise ValueError(f"unknown inference : {inference}")
+        # experience replay
+        self.replay = None
+        if replay_data != None:
+            self.replay = ReplayBuffer(capacity=replay_data.get("capacity", 10000), state_shape=stateShape(state_size, NN_data))
+            self.batch_size = replay_data.get("batch_size", 32)
+            self.train_every = replay_data.get("train_every", 4)
+            self.train_calls = 0
+
+    @property
+    def model(self) -> "tf.keras.Model":
+        """
+        Keras model, built on first access so a world with many learners starts fast.
+        """
+        if self._model is None:
+            self._model = self._makeModel()
+        return self._model
+
+    @model.setter
+    def model(self, model) -> None:
+        self._model = model
+
+    def _makeModel(self) -> "tf.keras.Model":
+        if self.model_loc != None:
+            return factory.load(self.model_loc)
+        if self.NN_data["type"] == "dense":
+            key = ("dense", self.state_size, self.action_size, None, self.learning_rate)
+            return factory.build(key, self._build_dense)
+        if self.NN_data["type"].lower() == "lstm":
+            lstm_memory = self.NN_data.get("lstm_memory", 2)
+            # compiled with the default adam learning rate, learning_rate doesn't change the model
+            key = ("lstm", self.state_size, self.action_size, lstm_memory, None)
+            return factory.build(key, lambda: self._build_LSTM(lstm_memory=lstm_memory))
+        if isGraph(self.NN_data):
+            memory, nodes, channels = stateShape(self.state_size, self.NN_data)
+            units = self.NN_data.get("units", 16)
+            heads = self.NN_data.get("heads", 2)
+            key = ("stgraph", nodes, self.action_size, (memory, channels, units, heads), self.learning_rate)
+            return factory.build(key, lambda: self._build_STGraph(memory=memory, nodes=nodes, channels=channels,
+                                                                  units=units, heads=heads))
+        raise ValueError(f"unknown NN_data type : {self.NN_data['type']}")
 
-    def _build_dense(self) -> tf.keras.Model:
+    def _build_dense(self) -> "tf.keras.Model":
         """
         Build a densely connected model
         """
+        import tensorflow as tf
         model = tf.keras.models.Sequential()
         model.add(tf.keras.layers.Dense(10, input_shape = (self.state_size,) ))
         model.add(tf.keras.layers.Dense(10, activation = 'relu' ))
@@ -47,13 +109,14 @@ class AI:
         
         return model
 
-    def _build_LSTM(self, lstm_memory : int = 2) -> tf.keras.Model:
+    def _build_LSTM(self, lstm_memory : int = 2) -> "tf.keras.Model":
         """
         Build LSTM
 
         Parameters:\n
             lstm_memory = (int) number of previous states kept in track.
         """
+        import tensorflow as tf
         model = tf.keras.models.Sequential()
         model.add(tf.keras.layers.LSTM(units=128, input_shape=(lstm_memory, self.state_size)))
         model.add(tf.keras.layers.Dense(units=self.action_size, activation='softmax'))
@@ -61,6 +124,51 @@ class AI:
         
         return model
     
+    def _build_STGraph(self, memory : int = 2, nodes : int = 5, channels : int = GRAPH_CHANNELS,
+                       units : int = 16, heads : int = 2) -> "tf.keras.Model":
+        """
+        Build a spatio-temporal graph attention model (Social Attention, arXiv:1710.04689) over the
+        gut graph (see history.GutGraph).\n
+        Every node is embedded from its value plus a learned embedding of its node type, spatial
+        edges join all real nodes of a time step (padding slots are masked out) and temporal edges
+        join a node to itself over the last memory steps. Attention over every node and step is
+        computed in one batched pass (attention_axes), never node by node.
+
+        Parameters:\n
+            memory = (int) time steps in a state (lstm_memory)\n
+            nodes = (int) nodes of the graph, padding slots included\n
+            channels = (int) value, node type, mask and the extra node features (one-hot id of a shared policy)\n
+            units = (int) size of the node features\n
+            heads = (int) attention heads\n
+        """
+        import tensorflow as tf
+        layers = tf.keras.layers
+        ops = tf.keras.ops
+        states = layers.Input(shape=(memory, nodes, channels))
+        # node type and mask are the same at every step, read from the latest one
+        types = ops.cast(states[:, -1, :, 1], "int32")
+        mask = states[:, -1, :, 2]
+        # (batch, memory, nodes, units) : value (and extra features) projection + node type embedding
+        features = ops.concatenate([states[..., :1], states[..., GRAPH_CHANNELS:]], axis=-1)
+        embedding = layers.Embedding(NODE_TYPES, units)(types)
+        hidden = ops.relu(layers.Dense(units)(features) + embedding[:, None])
+        # spatial edges : nodes of a time step attend to every real node of that step
+        spatial_mask = ops.tile(ops.cast(mask[:, None, None, :], "bool"), [1, memory, nodes, 1])
+        spatial = layers.MultiHeadAttention(num_heads=heads, key_dim=units, attention_axes=(2,))(
+            hidden, hidden, attention_mask=spatial_mask)
+        hidden = layers.LayerNormalization()(layers.Add()([hidden, spatial]))
+        # temporal edges : the latest step of every node attends to its past steps
+        latest = layers.Cropping2D(cropping=((memory - 1, 0), (0, 0)))(hidden)
+        temporal = layers.MultiHeadAttention(num_heads=heads, key_dim=units, attention_axes=(1,))(latest, hidden)
+        latest = layers.LayerNormalization()(layers.Add()([latest, temporal]))
+        # padding slots do not reach the output
+        latest = latest*mask[:, None, :, None]
+        q_values = layers.Dense(self.action_size, activation="softmax")(layers.Flatten()(latest))
+        model = tf.keras.Model(inputs=states, outputs=q_values)
+        model.compile(loss = 'categorical_crossentropy', optimizer = tf.keras.optimizers.Adam(learning_rate = self.learning_rate))
+
+        return model
+
     def _act(self, state : list = None) -> list:
         """
         Calculate q values\n
@@ -70,8 +178,23 @@ class AI:
         Return\n
             q_values = (list) values of action\n
         """
+        if self.numpy_model != None:
+            return self.numpy_model.predict(state)[0]
         q_values = self.model.predict(state)
         return q_values[0]
+
+    def _actBatch(self, states : np.ndarray = None) -> np.ndarray:
+        """
+        Calculate q values of many states in one forward pass\n
+
+        Parameters\n
+            states = (ndarray) (batch, ...) stacked states\n
+        Return\n
+            q_values = (ndarray) (batch, action_size) values of action\n
+        """
+        if self.numpy_model != None:
+            return self.numpy_model.predict(states)
+        return self.model.predict(states, verbose=0)
     
     def _findAllMax(self, list_ : list = None) -> list:
         """
@@ -122,6 +245,9 @@ class AI:
             next_state = (list) state after the action was taken\n
             action = (int) current action\n
         """
+        if self.replay != None:
+            self._remember(rewards=[reward], states=state, next_states=next_state, actions=[action])
+            return
         q_values = self.model.predict(state)
         next_q_values = self.model.predict(next_state)
 
@@ -129,4 +255,107 @@ class AI:
         q_values[0][action] = (1 - self.alpha)*q_values[0][action] + self.alpha*(reward + self.gamma * np.max(next_q_values[0]))
 
         # update the NN weights
-        self.model.fit(state, q_values, epochs=10, verbose=None)
\ No newline at end of file
+        self.model.fit(state, q_values, epochs=10, verbose=None)
+        self._weightsChanged()
+
+    def trainBatch(self, rewards : np.ndarray = None, states : np.ndarray = None,
+                   next_states : np.ndarray = None, actions : np.ndarray = None):
+        """
+        Trains the NN on many transitions at once (same update as train)
+
+        Parameters:\n
+            rewards = (ndarray) (batch,) reward from getting to new state\n
+            states = (ndarray) (batch, ...) states before action was taken\n
+            next_states = (ndarray) (batch, ...) states after the action was taken\n
+            actions = (ndarray) (batch,) actions taken\n
+        """
+        if self.replay != None:
+            self._remember(rewards=rewards, states=states, next_states=next_states, actions=actions)
+            return
+        q_values = self.model.predict(states, verbose=0)
+        next_q_values = self.model.predict(next_states, verbose=0)
+        rows = np.arange(len(actions))
+
+        # Bellmann equation
+        q_values[rows, actions] = (1 - self.alpha)*q_values[rows, actions] + self.alpha*(rewards + self.gamma * np.max(next_q_values, axis=1))
+
+        # update the NN weights
+        self.model.fit(states, q_values, epochs=10, verbose=0)
+        self._weightsChanged()
+
+    def _remember(self, rewards : np.ndarray = None, states : np.ndarray = None,
+                  next_states : np.ndarray = None, actions : np.ndarray = None) -> None:
+        """
+        Store transitions in the replay buffer and train every train_every calls.
+        """
+        self.replay.add(states=states, actions=actions, rewards=rewards, next_states=next_states)
+        self.train_calls += 1
+        if self.train_calls % self.train_every == 0 and len(self.replay) >= self.batch_size:
+            self._replayStep()
+
+    def _replayStep(self) -> None:
+        """
+        One gradient step on a minibatch sampled from the replay buffer
+        """
+        states, actions, rewards, next_states = self.replay.sample(batch_size=self.batch_size)
+        # states and next states in one forward pass
+        q_all = np.asarray(self.model.predict_on_batch(np.concatenate([states, next_states], axis=0)))
+        q_values, next_q_values = q_all[:self.batch_size].copy(), q_all[self.batch_size:]
+        rows = np.arange(self.batch_size)
+
+        # Bellmann equation
+        q_values[rows, actions] = (1 - self.alpha)*q_values[rows, actions] + self.alpha*(rewards + self.gamma * np.max(next_q_values, axis=1))
+
+        # update the NN weights
+        self.model.train_on_batch(states, q_values)
+        self._weightsChanged()
+
+    def _weightsChanged(self) -> None:
+        """
+        Refresh the numpy inference copy every sync_every weight updates
+        """
+        self.updates += 1
+        if self.numpy_model == None:
+            return
+        self.updates_since_sync += 1
+        if self.updates_since_sync >= self.sync_every:
+            self.numpy_model.sync(self.model)
+            self.updates_since_sync = 0
+
+    def __getstate__(self) -> dict:
+        """
+        Pickle support (checkpoints) : the keras model is kept as an in memory copy of its weights and
+        optimizer state (see modelState), the model itself is made again from the factory on load.
+        """
+        state = self.__dict__.copy()
+        state["_model"] = None if self._model is None else modelState(self._model)
+        return state
+
+    def __setstate__(self, state : dict) -> None:
+        model_state = state["_model"]
+        state["_model"] = None
+        self.__dict__.update(state)
+        if model_state != None:
+            setModelState(self.model, model_state)
+
+def makeAI(state_size : int = 5, action_size : int = 5, NN_data : dict = None, **AI_data):
+    """
+    Build the decision maker selected by NN_data["type"].\n
+    "random" and "scripted" are no-learning policies and "tabular" and "linear" are numpy
+    tile coded Q learners (TileQ), none of them imports tensorflow. Every other type builds an AI.
+
+    Parameters:\n
+        state_size = (int) num of input layer nodes\n
+        action_size = (int) num of output layer nodes\n
+        NN_data = (dict) {"type" : (str), ...} type of neural_net or policy\n
+        AI_data = remaining AI parameters\n
+    """
+    if NN_data != None and NN_data["type"] in ("random", "scripted"):
+        from policy import RandomPolicy, ScriptedPolicy
+        if NN_data["type"] == "random":
+            return RandomPolicy(state_size=state_size, action_size=action_size, NN_data=NN_data, **AI_data)
+        return ScriptedPolicy(state_size=state_size, action_size=action_size, NN_data=NN_data, **AI_data)
+    if NN_data != None and NN_data["type"] in ("tabular", "linear"):
+        from tile_q import TileQ
+        return TileQ(state_size=state_size, action_size=action_size, NN_data=NN_data, **AI_data)
+    return AI(state_size=state_size, action_size=action_size, NN_data=NN_data, **AI_data)
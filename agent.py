@@ -1,4 +1,6 @@
-from AI import AI
+from AI import makeAI
+from history import historyFor
+from types import MappingProxyType
 import numpy as np
 
 # Agent class
@@ -7,7 +9,8 @@ class Agent():
                     kick_resilience : dict = None, kick_satisfaction : float = 100,
                     action_size : int = 5, state_size : int = 5,
                     eat_default_time : float = 10, AI_data : dict = None, 
-                    food_consume_rate : int = 1, chemical_decay_rate : float = 0.01) -> None:
+                    food_consume_rate : int = 1, chemical_decay_rate : float = 0.01,
+                    chemical_list : list = None, component_list : list = None, food_list : list = None) -> None:
         """
         Agent class\n
         
@@ -26,44 +29,99 @@ class Agent():
                 {\n
                     "learning_rate" : (float)?, "alpha" : (float)?, "gamma" : (float)?, "exp_rate" : (float)?, "model_loc" : None}\n  
                 }\n
-        """
-        self.food_pop = food_pop
-        self.component_pop = component_pop
-        self.chemicals = chemicals
+            chemical_list = (list) ["chem_1", ... ] order of the chemicals array (default : kick_resilience keys)\n
+            component_list = (list) ["comp_1", ... ] order of the component array (default : component_pop keys)\n
+            food_list = (list) ["food_1", ... ] order of the food array (default : food_pop keys)\n
+        """
+        self.chemical_list = list(kick_resilience) if chemical_list == None else chemical_list
+        self.component_list = list(component_pop) if component_list == None else component_list
+        self.food_list = list(food_pop) if food_list == None else food_list
+        # name -> index maps
+        self.chemical_index = {chem : idx for idx, chem in enumerate(self.chemical_list)}
+        self.component_index = {comp : idx for idx, comp in enumerate(self.component_list)}
+        self.food_index = {food : idx for idx, food in enumerate(self.food_list)}
+        # gut content as dense arrays
+        self.food_pop_array = self._toArray(food_pop, self.food_index)
+        self.component_pop_array = self._toArray(component_pop, self.component_index)
+        self.chemicals_array = self._toArray(chemicals, self.chemical_index)
+        # food name -> component array, filled on first eat
+        self._food_components = {}
+        # kick and resilience arrays, built on the first reward
+        self._kick = None
         self.kick_resilience = kick_resilience
         self.kick_satisfaction = kick_satisfaction
         self.eat_time_default = eat_default_time
         self.food_consume_rate = food_consume_rate
         self.chemical_decay_rate = chemical_decay_rate
-        self.ai = AI(state_size=state_size, action_size=action_size, **AI_data)
+        self.ai = makeAI(state_size=state_size, action_size=action_size, **AI_data)
         # keep track of when to eat
         self.eat_time = eat_default_time
         # keep track of action
         self.action = 0
         # keep track of reward
         self.reward = 0
-        # keep track of current state
-        if AI_data["NN_data"]["type"] == "dense":
-            self.curr_state = np.zeros((1, state_size))
-            self.next_state = np.zeros((1, state_size))
-        elif AI_data["NN_data"]["type"] == "lstm":
-            self.curr_state = np.zeros((AI_data["NN_data"]["lstm_memory"], state_size))
-            self.next_state = np.zeros((AI_data["NN_data"]["lstm_memory"], state_size))
+        # history of observations, curr_state and next_state are windows of it
+        # (no ai and the no-learning policies keep a dense state)
+        self.history = historyFor(state_size=state_size, AI_data=AI_data)
+        self.curr_state = self.history.window()
+        self.next_state = self.history.window()
+        # shared GutGraph of the world for stgraph learners, their ai is fed its windows instead
+        self.graph = None
+
+    def _toArray(self, values : dict = None, index : dict = None) -> np.ndarray:
+        """
+        Name keyed dict to dense array (missing names are 0).
+        """
+        array = np.zeros(len(index))
+        for name, value in (values or {}).items():
+            array[index[name]] = value
+        return array
+
+    @property
+    def chemicals(self) -> MappingProxyType:
+        """
+        Read-only {"chem_1" : amount, ... } view of chemicals_array.
+        """
+        return MappingProxyType(dict(zip(self.chemical_list, self.chemicals_array.tolist())))
+
+    @property
+    def component_pop(self) -> MappingProxyType:
+        """
+        Read-only {"comp_1" : amount, ... } view of component_pop_array.
+        """
+        return MappingProxyType(dict(zip(self.component_list, self.component_pop_array.tolist())))
+
+    @property
+    def food_pop(self) -> MappingProxyType:
+        """
+        Read-only {"food_1" : amount, ... } view of food_pop_array.
+        """
+        return MappingProxyType(dict(zip(self.food_list, self.food_pop_array.tolist())))
 
-    def _setState(self, chemical_list : list = None, state : np.ndarray = None) -> np.ndarray:
+    def _setState(self, chemical_list : list = None) -> np.ndarray:
         """
-        Convert chemical poulation data to state.\n
+        Add the chemical poulation to the history.\n
 
         Parameter:\n
-            chemical_list = (list) List of all chemical names.
-            state = (ndarray) state of system
+            chemical_list = (list) List of all chemical names (same order as chemicals_array).
+        Return:\n
+            state = (ndarray) window of the history
         """
-        for index, chemical in enumerate(chemical_list):
-            if chemical in self.chemicals:
-                state[0][index] = self.chemicals[chemical]
-        state = np.roll(state, -1)
-        
-        return state
+        return self.history.append(self.chemicals_array)
+
+    @property
+    def curr_input(self) -> np.ndarray:
+        """
+        Current state fed to the ai : curr_state, or the shared gut graph window of an stgraph learner.
+        """
+        return self.curr_state if self.graph == None else self.graph.curr
+
+    @property
+    def next_input(self) -> np.ndarray:
+        """
+        Same as curr_input for next_state.
+        """
+        return self.next_state if self.graph == None else self.graph.next
 
     def setCurrState(self, chemical_list : list = None) -> None:
         """
@@ -72,7 +130,7 @@ class Agent():
         Parameter:\n
             chemical_list = (list) List of all chemical names.
         """
-        self.curr_state = self._setState(chemical_list=chemical_list, state=self.curr_state)
+        self.curr_state = self._setState(chemical_list=chemical_list)
 
     def setNextState(self, chemical_list : list = None) -> None:
         """
@@ -81,7 +139,7 @@ class Agent():
         Parameter:\n
             chemical_list = (list) List of all chemical names.
         """
-        self.next_state = self._setState(chemical_list=chemical_list, state=self.curr_state)
+        self.next_state = self._setState(chemical_list=chemical_list)
     
     def getAction(self) -> int:
         """
@@ -93,7 +151,7 @@ class Agent():
         Return:\n
             action = (int) index of action taken by the agent
         """
-        self.action = self.ai.decide(self.curr_state)
+        self.action = self.ai.decide(self.curr_input)
         return self.action
     
     def _setComponentPop(self, components : dict = None) -> None:
@@ -103,8 +161,7 @@ class Agent():
         Parameter:\n
             components = (dict) {"comp_1" : (float) ratio, ... ] Components in food consumed.\n
         """
-        for component, ratio in components.items():
-            self.component_pop[component] = self.component_pop.get(component, 0) + self.food_consume_rate * ratio
+        self.component_pop_array += self.food_consume_rate * self._toArray(components, self.component_index)
 
     def eat(self, food : str = None, food_dict : dict = None) -> None:
         """
@@ -114,43 +171,46 @@ class Agent():
             food = (str) food currently consumed
             food_dict = (dict) {"comp_1" : (flaot) ratio, ... } Food compponent makeup.\n
         """
-        self.food_pop[food] = self.food_pop.get(food, 0) + self.food_consume_rate
-        self._setComponentPop(components = food_dict)
+        self.food_pop_array[self.food_index[food]] += self.food_consume_rate
+        if food not in self._food_components:
+            self._food_components[food] = self._toArray(food_dict, self.component_index)
+        self.component_pop_array += self.food_consume_rate * self._food_components[food]
         
         # reset the eat time
         self.eat_time = self.eat_time_default
 
-    def decayChemicals(self) -> None:
+    def decayChemicals(self, ticks : float = 1) -> None:
         """
-        After every step chemical decays
+        After every step chemical decays, ticks steps of decay at once use the closed form rate**ticks
         """
-        for chemical in self.chemicals:
-            self.chemicals[chemical] *= self.chemical_decay_rate
+        self.chemicals_array *= self.chemical_decay_rate**ticks
     
     def setChemicals(self, chemicals_produced : dict = None) -> None:
         """
         Set chemical population after bacteria produces it.
 
         Parameter:\n
-            chemical_produced = (dict) {"chemical_1" : (float) amount, ... }
+            chemical_produced = (dict) {"chemical_1" : (float) amount, ... } or (ndarray) ordered as chemical_list
         """
-        for chemical in chemicals_produced:
-            self.chemicals[chemical] = self.chemicals.get(chemical, 0) + chemicals_produced[chemical]
+        if isinstance(chemicals_produced, dict):
+            for chemical, amount in chemicals_produced.items():
+                self.chemicals_array[self.chemical_index[chemical]] += amount
+        else:
+            self.chemicals_array += chemicals_produced
 
     def findReward(self, chemical_list : list = None, chemical_profile : dict = None):
         """
+        Reward of the last meal : change in chemicals weighted by kick/kick_resilience.
+
+        Parameters:\n
+            chemical_list = (list) List of all chemical names (same order as chemicals_array)\n
+            chemical_profile = (dict) {"chemical_1" : (dict) {"kick" : (float) value, ...}, ...} Profile of chemical\n
         """
+        if self._kick is None:
+            self._kick = np.array([chemical_profile[chemical]["kick"] for chemical in self.chemical_list])
+            self._resilience = np.array([self.kick_resilience[chemical] for chemical in self.chemical_list])
         # reward depends on change in chemical
-        chemical_before = self._stateToChem(state=self.curr_state[0], chemical_list=chemical_list)
-        chemical_after = self._stateToChem(state=self.next_state[0], chemical_list=chemical_list)
-        # calculates reward
-        reward = 0
-        for chemical in chemical_list:
-            chemical_diff_factor = (chemical_after.get(chemical, 0) - chemical_before.get(chemical, 0))/self.kick_resilience[chemical]
-            kick = chemical_profile[chemical]["kick"]
-            reward += (kick*chemical_diff_factor)
-        # set total reward
-        self.reward = reward
+        self.reward = float(((self.next_state[..., -1, :].ravel() - self.curr_state[..., -1, :].ravel())/self._resilience) @ self._kick)
     
     def _stateToChem(self, state : np.ndarray = None, chemical_list : list = None) -> dict:
         """
@@ -162,7 +222,4 @@ class Agent():
         Retrn:\n
             chemical_dict = (dict) {"chem_1" : (float) amount, ...}
         """
-        chemical_dict = {}
-        for idx, chemical in enumerate(chemical_list):
-            chemical_dict[chemical] = state[idx]
-        return chemical_dict
\ No newline at end of file
+        return dict(zip(chemical_list, state))
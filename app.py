@@ -1,7 +1,19 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template, abort
+import itertools
+import threading
+import time
+from stream import SimulationRun
 
 app = Flask(__name__)
 
+# running/finished simulations, watched by any number of clients
+runs = {}
+runs_lock = threading.Lock()
+run_ids = itertools.count(1)
+# finished runs are dropped RUN_TTL seconds after their end, or oldest first past MAX_FINISHED_RUNS
+RUN_TTL = 3600
+MAX_FINISHED_RUNS = 20
+
 # Index page
 @app.route("/")
 def index():
@@ -17,5 +29,116 @@ def receive_data():
     data = request.form['data']
     return jsonify({'success': True, 'data': data})
 
+def _evictRuns():
+    """
+    Drop expired finished runs, call with runs_lock held. Running runs are never dropped.
+    """
+    now = time.monotonic()
+    finished = [(run.finished, run_id) for run_id, run in runs.items() if run.finished != None]
+    finished.sort()
+    for idx, (end, run_id) in enumerate(finished):
+        if now - end > RUN_TTL or len(finished) - idx > MAX_FINISHED_RUNS:
+            del runs[run_id]
+
+def _lastEventId():
+    """
+    Last-Event-ID header of a reconnecting client, -1 when missing or malformed.
+    """
+    try:
+        return int(request.headers.get("Last-Event-ID", -1))
+    except ValueError:
+        return -1
+
+def _number(options : dict = None, name : str = None, default = None, cast = int):
+    """
+    Positive number option of a run, ValueError when it isn't one.
+    """
+    value = options.get(name, default)
+    if isinstance(value, bool):
+        raise ValueError(f"{name} must be a positive number, got {value!r}")
+    try:
+        number = cast(value)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f"{name} must be a positive number, got {value!r}")
+    if cast == int and isinstance(value, float) and number != value:
+        raise ValueError(f"{name} must be an integer, got {value!r}")
+    if not number > 0 or number == float("inf"):
+        raise ValueError(f"{name} must be a positive number, got {value!r}")
+    return number
+
+def _runOptions(options = None) -> dict:
+    """
+    Checked SimulationRun arguments of the json body of POST /runs, ValueError on a bad option.
+    """
+    if not isinstance(options, dict):
+        raise ValueError("json body must be an object")
+    if options.get("policy") not in (None, "random", "scripted"):
+        raise ValueError(f"policy must be \"random\" or \"scripted\", got {options['policy']!r}")
+    if options.get("engine") not in (None, "object", "vector"):
+        raise ValueError(f"engine must be \"object\" or \"vector\", got {options['engine']!r}")
+    return {"total_time" : _number(options, "total_time", 2000), "interval" : _number(options, "interval", 0.25, float),
+            "max_batch" : _number(options, "max_batch", 100)}
+
+def _getRun(run_id):
+    with runs_lock:
+        _evictRuns()
+        run = runs.get(run_id)
+    if run == None:
+        abort(404)
+    return run
+
+# Start a simulation
+@app.route('/runs', methods=['POST'])
+def start_run():
+    """
+    json body (every key optional) :
+        {"total_time" : (int), "policy" : "random" | "scripted" (no-learning run), "engine" : "object" | "vector",
+         "interval" : (float), "max_batch" : (int)}
+    a bad option is answered with 400 and an error message.
+    """
+    from main import defaultData, noLearningData
+    options = request.get_json(silent=True)
+    if options == None and len(request.get_data()) > 0:
+        return jsonify({'success': False, 'error': "body must be json"}), 400
+    if options == None:
+        options = {}
+    try:
+        run_options = _runOptions(options)
+    except ValueError as error:
+        return jsonify({'success': False, 'error': str(error)}), 400
+    data = defaultData()
+    if options.get("policy") != None:
+        data = noLearningData(data, options["policy"])
+    if options.get("engine") != None:
+        data["engine"] = options["engine"]
+    data["log_data"] = {"verbosity" : 0}
+    run = SimulationRun(data=data, **run_options)
+    with runs_lock:
+        _evictRuns()
+        run_id = str(next(run_ids))
+        runs[run_id] = run
+    run.start()
+    return jsonify({'success': True, 'run_id': run_id}), 201
+
+# Progress of a simulation
+@app.route('/runs/<run_id>', methods=['GET'])
+def run_status(run_id):
+    return jsonify(_getRun(run_id).status())
+
+# Stop a simulation
+@app.route('/runs/<run_id>/stop', methods=['POST'])
+def stop_run(run_id):
+    _getRun(run_id).stop()
+    return jsonify({'success': True})
+
+# Server-Sent Events of a simulation, from the start (or Last-Event-ID) to the end
+@app.route('/runs/<run_id>/stream', methods=['GET'])
+def stream_run(run_id):
+    run = _getRun(run_id)
+    cursor = max(_lastEventId(), -1) + 1
+    return Response(run.events(cursor=cursor), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    # threaded so a stream doesn't block the other clients
+    app.run(debug=True, threaded=True)
@@ -1,4 +1,5 @@
-from AI import AI
+from AI import makeAI
+from history import historyFor
 import numpy as np
 
 # Bacteria class
@@ -6,7 +7,8 @@ class Bacteria:
     def __init__(self, id : int = 0, pop : float = 100,
                  comp_like : dict = None, chemical_produce : list = None, chemical_inducer : dict = None,
                  chemical_produce_rate : float = 1, eat_rate : float = 0.01, speed : float = 1,
-                 state_size : int = 5, action_size : int = 5, increased_production_rate : float = 1, AI_data : dict = None) -> None:
+                 state_size : int = 5, action_size : int = 5, increased_production_rate : float = 1, AI_data : dict = None,
+                 ai : object = None) -> None:
         """
         Bacteria class.
 
@@ -25,6 +27,7 @@ class Bacteria:
                 {\n
                     "learning_rate" : (float)?, "alpha" : (float)?, "gamma" : (float)?, "exp_rate" : (float)?, "model_loc" : None}\n  
                 }\n
+            ai = (PolicyMember) already built policy (shared policy), AI_data is then only used for the state shape\n
         """
         self.id = id
         self.pop = pop
@@ -38,30 +41,33 @@ class Bacteria:
         # chemical induced speed
         self.speed = speed
         # ai parameters
-        if AI_data == None:
+        if ai != None:
+            self.ai = ai
+        elif AI_data == None:
             self.ai = None
         else:
-            self.ai = AI(state_size=state_size, action_size=action_size, **AI_data)
+            self.ai = makeAI(state_size=state_size, action_size=action_size, **AI_data)
         # keep track of action
         self.action = 0
         self.increased_chemical_production_rate = increased_production_rate
         # keep track of reward
         self.reward = 0
-        # keep track of current state
-        if AI_data["NN_data"]["type"] == "dense":
-            self.curr_state = np.zeros((1, state_size))
-            self.next_state = np.zeros((1, state_size))
-        elif AI_data["NN_data"]["type"] == "lstm":
-            self.curr_state = np.zeros((AI_data["NN_data"]["lstm_memory"], state_size))
-            self.next_state = np.zeros((AI_data["NN_data"]["lstm_memory"], state_size))
+        # history of observations, curr_state and next_state are windows of it
+        # (no ai and the no-learning policies keep a dense state)
+        self.history = historyFor(state_size=state_size, AI_data=AI_data)
+        self.curr_state = self.history.window()
+        self.next_state = self.history.window()
+        # shared GutGraph of the world for stgraph learners, their ai is fed its windows instead
+        self.graph = None
 
-    def growth(self, comp_pop, total_bacteria_pop) -> dict:
+    def growth(self, comp_pop, total_bacteria_pop, interaction : float = 0) -> dict:
         """
         Bacteria population model:\n
         After every time step bacteria population changes according to logarithmic model.
 
         Parameter:\n
             comp_pop : (dict) {"comp_1" : pop}
+            interaction : (float) growth change from the other colonies (see InteractionGraph.effect)
 
         Return:\n
             comp_pop : (dict) {"comp_1" : pop} reducing the food conumer anount.
@@ -83,6 +89,8 @@ class Bacteria:
 
         # change the populatio of the bacteria based on log growth
         change_pop = self.eat_rate*self.pop*(1 - self.pop/capacity)
+        if interaction != 0:
+            change_pop += self.eat_rate*self.pop*interaction
         
         self.pre_pop = self.pop
         self.pop += change_pop
@@ -91,38 +99,66 @@ class Bacteria:
 
         return comp_pop
 
-    def _setState(self, component_list : list = None, component_pop : dict = None, state : np.ndarray = None) -> np.ndarray:
+    def _setState(self, component_list : list = None, component_pop : dict = None) -> np.ndarray:
         """
-        Convert chemical poulation data to state.\n
+        Convert component poulation data to an observation and add it to the history.\n
 
         Parameter:\n
-            chemical_list = (list) List of all chemical names.
-            state = (ndarray) state of system
+            component_list = (list) List of all component names.
+            component_pop = (dict) {"comp_1" : pop} components missing keep their last value
+        Return:\n
+            state = (ndarray) window of the history
         """
+        values = self.history.latest().copy()
         for index, component in enumerate(component_list):
             if component in component_pop:
-                state[0][index] = component_pop[component]
-        state = np.roll(state, -1)
-        
-        return state
+                values[index] = component_pop[component]
+
+        return self.history.append(values)
+
+    @property
+    def curr_input(self) -> np.ndarray:
+        """
+        Current state fed to the ai : curr_state, or the shared gut graph window of an stgraph learner.
+        """
+        return self.curr_state if self.graph == None else self.graph.curr
+
+    @property
+    def next_input(self) -> np.ndarray:
+        """
+        Same as curr_input for next_state.
+        """
+        return self.next_state if self.graph == None else self.graph.next
 
     def setCurrState(self, component_list : list = None, component_pop : dict = None) -> None:
         """
         set current state.\n
 
         Parameter:\n
-            chemical_list = (list) List of all chemical names.
+            component_list = (list) List of all component names.
         """
-        self.curr_state = self._setState(component_list=component_list, component_pop=component_pop, state=self.curr_state)
+        self.curr_state = self._setState(component_list=component_list, component_pop=component_pop)
 
     def setNextState(self, component_list : list = None, component_pop : dict = None) -> None:
         """
         set next state.\n
 
         Parameter:\n
-            chemical_list = (list) List of all chemical names.
+            component_list = (list) List of all component names.
+        """
+        self.next_state = self._setState(component_list=component_list, component_pop=component_pop)
+
+    def setCurrStateArray(self, values : np.ndarray = None) -> None:
+        """
+        Same as setCurrState, values is the component population ordered as component_list.
+        """
+        self.curr_state = self.history.append(values)
+
+    def setNextStateArray(self, values : np.ndarray = None) -> None:
+        """
+        Same as setNextState, values is the component population ordered as component_list.
         """
-        self.next_state = self._setState(component_list=component_list, component_pop=component_pop, state=self.next_state)
+        self.next_state = self.history.append(values)
 
     def recatToChemical(self, chemicals) -> None:
         """
@@ -143,7 +179,7 @@ class Bacteria:
         """
         production_rate = np.ones(len(self.chemical_produce))*self.chemical_produce_rate
         if self.ai != None:
-            self.action = self.ai.decide(self.curr_state)
+            self.action = self.ai.decide(self.curr_input)
             production_rate[self.action] += self.increased_chemical_production_rate
         
         # keep track of chemicals produced
@@ -0,0 +1,299 @@
+import argparse
+import copy
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+# code run in a fresh interpreter for each startup case
+STARTUP_CASES = {
+    "no_learning" : "from main import defaultData, noLearningData\n"
+                    "from world import World\n"
+                    "world = World(**noLearningData(defaultData()))\n",
+    "tensorflow" : "from main import defaultData\n"
+                   "from world import World\n"
+                   "world = World(**defaultData())\n",
+}
+
+def _startupOnce(code : str = None) -> dict:
+    """
+    Run code in a new python process and time it.
+
+    Parameter:\n
+        code = (str) code building a World\n
+    Return:\n
+        result = (dict) {"wall" : (float) seconds, "tensorflow_imported" : (bool)}
+    """
+    code = code + "import sys\nprint('tensorflow' in sys.modules)\n"
+    env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL="3")
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                         env=env, capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - start
+    return {"wall" : wall, "tensorflow_imported" : out.stdout.strip().splitlines()[-1] == "True"}
+
+def benchStartup(repeat : int = 3) -> dict:
+    """
+    Time interpreter start + imports + World construction with and without learning.
+
+    Parameter:\n
+        repeat = (int) runs per case, the best run is reported\n
+    Return:\n
+        results = (dict) {"case" : {"best" : (float), "runs" : [(float), ...], "tensorflow_imported" : (bool)}, ...}
+    """
+    results = {}
+    for name, code in STARTUP_CASES.items():
+        runs = [_startupOnce(code) for _ in range(repeat)]
+        results[name] = {
+            "best" : min(run["wall"] for run in runs),
+            "runs" : [run["wall"] for run in runs],
+            "tensorflow_imported" : runs[-1]["tensorflow_imported"],
+        }
+    return results
+
+# learner configs of the benchmark worlds
+LEARNERS = {
+    # main.py AI_data
+    "dense" : {},
+    # dense net with numpy inference and minibatch replay training
+    "fast" : {"inference" : "numpy", "sync_every" : 10, "replay_data" : {"capacity" : 10000, "batch_size" : 32, "train_every" : 4}},
+    # numpy tile coded Q learners
+    "tabular" : {"NN_data" : {"type" : "tabular"}},
+    "linear" : {"NN_data" : {"type" : "linear"}},
+    # spatio-temporal graph attention over the gut graph, 2 step window
+    "stgraph" : {"NN_data" : {"type" : "stgraph", "lstm_memory" : 2}},
+    # no learning, never imports tensorflow
+    "random" : None,
+}
+
+# phases timed separately, (owner, method)
+PHASES = ["World.step", "AI.decide", "AI.train", "Bacteria.growth", "Agent.findReward", "World._log"]
+
+def scaledData(no_bacteria : int = 2, no_components : int = 4, no_chemical : int = 5, learner : str = "fast",
+               engine : str = "object", seed : int = 0) -> dict:
+    """
+    World data like main.defaultData with any number of colonies, components and chemicals.\n
+    Colonies like 1-2 random components, produce 1-2 random chemicals and are induced by up to 2.
+
+    Parameters:\n
+        learner = (str) key of LEARNERS used by the agent and every colony\n
+        engine = (str) World engine\n
+        seed = (int) seed of the random world layout\n
+    """
+    from main import defaultData, noLearningData
+    data = defaultData()
+    rng = np.random.RandomState(seed)
+    component_list = [f"comp-{(i+1):02d}" for i in range(no_components)]
+    chemical_list = [f"chem-{(i+1):02d}" for i in range(no_chemical)]
+    data.update(no_bacteria=no_bacteria, no_components=no_components, no_chemical=no_chemical,
+                component_list=component_list, chemical_list=chemical_list, engine=engine)
+    data["food_profile"] = {food : {comp : float(rng.randint(0, 100)) for comp in component_list} for food in data["food_list"]}
+    data["chemical_profile"] = {chem : {"kick" : float(rng.uniform(1, 10))} for chem in chemical_list}
+    AI_data = data["bacteria_data"][0]["AI_data"]
+    bacteria_data = []
+    for i in range(no_bacteria):
+        likes = rng.choice(no_components, size=min(rng.randint(1, 3), no_components), replace=False)
+        produces = rng.choice(no_chemical, size=min(rng.randint(1, 3), no_chemical), replace=False)
+        inducers = rng.choice(no_chemical, size=min(rng.randint(0, 3), no_chemical), replace=False)
+        bacteria_data.append({"id" : i + 1, "pop" : 100, "comp_like" : {component_list[j] : 1.0 for j in sorted(likes)},
+                              "chemical_produce" : [chemical_list[j] for j in produces],
+                              "chemical_inducer" : {chemical_list[j] : float(rng.normal(0, 0.1)) for j in sorted(inducers)},
+                              "state_size" : no_components, "action_size" : len(produces), "AI_data" : copy.deepcopy(AI_data)})
+    data["bacteria_data"] = bacteria_data
+    agent_data = data["agent_data"]
+    agent_data["kick_resilience"] = {chem : 10 for chem in chemical_list}
+    agent_data["state_size"] = no_chemical
+    if LEARNERS[learner] == None:
+        return noLearningData(data, "random")
+    for AI_data in [agent_data["AI_data"]] + [bacteria["AI_data"] for bacteria in bacteria_data]:
+        AI_data.update(copy.deepcopy(LEARNERS[learner]))
+    return data
+
+def _peakRSS() -> float:
+    """
+    Peak resident set size of this process in MB.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macOS
+    return peak/1024**2 if sys.platform == "darwin" else peak/1024
+
+def benchCase(no_bacteria : int = 2, no_components : int = 4, no_chemical : int = 5, learner : str = "fast",
+              engine : str = "object", steps : int = 50, warmup : int = 10, seed : int = 0) -> dict:
+    """
+    Time steps of one world (after warmup steps), the world logs every step to a temporary csv.
+
+    Return:\n
+        result = (dict) {"params" : (dict), "steps_per_sec" : (float), "phases" : (dict) see Profiler.stats, "peak_rss_mb" : (float)}
+    """
+    from world import World
+    from profiler import Profiler
+    params = {"no_bacteria" : no_bacteria, "no_components" : no_components, "no_chemical" : no_chemical,
+              "learner" : learner, "engine" : engine, "steps" : steps, "seed" : seed}
+    np.random.seed(seed)
+    data = scaledData(no_bacteria, no_components, no_chemical, learner=learner, engine=engine, seed=seed)
+    data["log_data"] = {"verbosity" : 0}
+    world = World(**data)
+    timer = Profiler()
+    timer.wrap(world, "step", "World.step")
+    timer.wrap(world, "_log", "World._log")
+    timer.wrap(world.agent, "findReward", "Agent.findReward")
+    timer.wrap(world.population, "growth", "Bacteria.growth")
+    for ai in [world.agent.ai] + [bacteria.ai for bacteria in world.bacterias]:
+        timer.wrap(ai, "decide", "AI.decide")
+        timer.wrap(ai, "train", "AI.train")
+    for bacteria in world.bacterias:
+        timer.wrap(bacteria, "growth", "Bacteria.growth")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filename = os.path.join(tmp_dir, "bench.csv")
+        for _ in range(warmup):
+            world.step(filename)
+        timer.reset()
+        start = time.perf_counter()
+        for _ in range(steps):
+            world.step(filename)
+        wall = time.perf_counter() - start
+        world.closeLog()
+    phases = timer.stats()
+    phases.pop("counters")
+    return {"params" : params, "steps_per_sec" : steps/wall, "phases" : phases, "peak_rss_mb" : _peakRSS()}
+
+def benchFastForward(lengths : list = None, no_bacteria : int = 2, engine : str = "object", repeat : int = 5,
+                     seed : int = 0) -> dict:
+    """
+    Time quiet stretches (no meal, no colony ai) of every length stepped one step at a time and
+    fast-forwarded, from copies of the same world. World.advance only fast-forwards stretches of at
+    least World.MIN_FAST_FORWARD steps.
+
+    Parameters:\n
+        lengths = (list) stretch lengths in steps\n
+        repeat = (int) runs per length and path, the best run is reported\n
+    Return:\n
+        results = (dict) {length : {"step" : (float) seconds, "fast_forward" : (float) seconds, "speedup" : (float)}, ...}
+    """
+    from world import World
+    lengths = [4, 8, 16, 32, 64, 256, 1024] if lengths == None else lengths
+    np.random.seed(seed)
+    data = scaledData(no_bacteria, learner="random", engine=engine, seed=seed)
+    for bacteria in data["bacteria_data"]:
+        bacteria["AI_data"] = None
+    data["log_data"] = {"verbosity" : 0}
+    # one meal then nothing but the stretch
+    data["schedule_data"] = {"meal_interval" : 10**9, "first_meal" : 0}
+    world = World(**data)
+    world.step()
+    def best(run, length):
+        runs = []
+        for _ in range(repeat):
+            copy_world = copy.deepcopy(world)
+            start = time.perf_counter()
+            run(copy_world, length)
+            runs.append(time.perf_counter() - start)
+        return min(runs)
+    def stepped(copy_world, length):
+        for _ in range(length):
+            copy_world.step()
+    results = {}
+    for length in lengths:
+        step = best(stepped, length)
+        fast_forward = best(lambda copy_world, length: copy_world.fastForward(ticks=length), length)
+        results[length] = {"step" : step, "fast_forward" : fast_forward, "speedup" : step/fast_forward}
+    return results
+
+def caseName(params : dict = None) -> str:
+    return f"b{params['no_bacteria']}_c{params['no_components']}_h{params['no_chemical']}_{params['learner']}_{params['engine']}"
+
+def _benchCaseProcess(case : dict = None) -> dict:
+    """
+    benchCase in a fresh python process, so peak RSS and imports belong to this case only.
+    """
+    code = f"import json\nfrom benchmark import benchCase\nprint(json.dumps(benchCase(**{case!r})))\n"
+    env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL="3")
+    out = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                         env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def sweepCases(sizes : list = None, learner : str = "fast", engine : str = "object", **kwargs) -> list:
+    """
+    main.py defaults, then no_bacteria, no_components and no_chemical scaled one at a time.
+
+    Parameters:\n
+        sizes = (list) values every axis is swept over\n
+        kwargs = other benchCase parameters\n
+    Return:\n
+        cases = (list) [(dict) benchCase parameters, ...]
+    """
+    sizes = [10, 50, 100, 200] if sizes == None else sizes
+    defaults = {"no_bacteria" : 2, "no_components" : 4, "no_chemical" : 5}
+    cases = [dict(defaults, learner=learner, engine=engine, **kwargs)]
+    for axis in defaults:
+        for size in sizes:
+            cases.append(dict(defaults, learner=learner, engine=engine, **kwargs, **{axis : size}))
+    return cases
+
+def benchSweep(cases : list = None) -> dict:
+    """
+    Run every case in its own process.
+
+    Return:\n
+        results = (dict) {caseName : benchCase result, ...}
+    """
+    cases = sweepCases() if cases == None else cases
+    return {caseName(case) : _benchCaseProcess(case) for case in cases}
+
+def compare(results : dict = None, baseline : dict = None, tolerance : float = 0.1) -> list:
+    """
+    Regressions of results against a baseline (both outputs of benchSweep).\n
+    Flags lower steps/sec, higher p50 latency of a phase and higher peak RSS by more than tolerance.
+
+    Return:\n
+        regressions = (list) [(dict) {"case", "metric", "baseline", "value", "change"}, ...]
+    """
+    regressions = []
+    def check(case, metric, old, new, higher_is_better):
+        change = (new - old)/old if old > 0 else 0.0
+        if (higher_is_better and change < -tolerance) or (not higher_is_better and change > tolerance):
+            regressions.append({"case" : case, "metric" : metric, "baseline" : old, "value" : new, "change" : change})
+    for case, result in results.items():
+        if case not in baseline:
+            continue
+        old = baseline[case]
+        check(case, "steps_per_sec", old["steps_per_sec"], result["steps_per_sec"], True)
+        check(case, "peak_rss_mb", old["peak_rss_mb"], result["peak_rss_mb"], False)
+        for phase, stats in result["phases"].items():
+            if phase in old["phases"]:
+                check(case, f"{phase}.p50", old["phases"][phase]["p50"], stats["p50"], False)
+    return regressions
+
+if __name__=="__main__":
+    parser = argparse.ArgumentParser(description="World benchmarks, results are printed as json")
+    parser.add_argument("--startup", action="store_true", help="time interpreter start + World construction")
+    parser.add_argument("--fast-forward", action="store_true", help="time quiet stretches stepped and fast-forwarded")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[10, 50, 100, 200], help="values of the size sweep")
+    parser.add_argument("--learner", default="fast", choices=list(LEARNERS))
+    parser.add_argument("--engine", default="object", choices=["object", "vector"])
+    parser.add_argument("--steps", type=int, default=50)
+    parser.add_argument("--output", help="also write the results to this json file")
+    parser.add_argument("--baseline", help="json results to compare against, exit code 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+    if args.startup:
+        report = {"startup" : benchStartup()}
+    elif args.fast_forward:
+        report = {"fast_forward" : {engine : benchFastForward(engine=engine) for engine in ("object", "vector")}}
+    else:
+        cases = sweepCases(sizes=args.sizes, learner=args.learner, engine=args.engine, steps=args.steps)
+        report = {"cases" : benchSweep(cases)}
+    if args.baseline != None:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        report["regressions"] = compare(report.get("cases", {}), baseline.get("cases", {}), args.tolerance)
+    if args.output != None:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    print(json.dumps(report, indent=2))
+    if len(report.get("regressions", [])) > 0:
+        sys.exit(1)
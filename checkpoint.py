@@ -0,0 +1,103 @@
+import os
+import pickle
+import random
+import threading
+import zlib
+import numpy as np
+
+# Checkpointer class
+class Checkpointer:
+    def __init__(self, filename : str = "./data/checkpoint.ckpt", every : int = 100, compress_level : int = 1) -> None:
+        """
+        Periodic snapshots of a whole World in a single compressed pickle.\n
+        The world is pickled in the step loop (so the snapshot is consistent), keras models only
+        as in memory copies of their weights and optimizer state, compressing and writing happen
+        in a background thread. The file is replaced atomically, a crash while
+        writing leaves the previous checkpoint intact.
+
+        Parameters:\n
+            filename = (str) checkpoint file\n
+            every = (int) steps between checkpoints\n
+            compress_level = (int) zlib level, 1 is fast and already shrinks the replay buffers a lot\n
+        """
+        self.filename = filename
+        self.every = every
+        self.compress_level = compress_level
+        self.thread = None
+        self.error = None
+
+    def due(self, world) -> bool:
+        """
+        True when world.time is a multiple of every.
+        """
+        return self.every > 0 and world.time > 0 and world.time % self.every == 0
+
+    def save(self, world) -> None:
+        """
+        Snapshot the world and the random generators, the file is written in the background.
+
+        Parameter:\n
+            world = (World) world being simulated
+        """
+        # one write in flight at a time
+        self.wait()
+        if world.logger != None:
+            world.logger.flush()
+        # the snapshot holds fully trained weights
+        if getattr(world, "pipeline", None) != None:
+            world.pipeline.drain()
+        # timed methods can't be pickled, the profiler is attached again after the snapshot
+        profiler = getattr(world, "profiler", None)
+        if profiler != None:
+            profiler.detach()
+        try:
+            payload = pickle.dumps({"world" : world, "random" : random.getstate(), "numpy" : np.random.get_state()},
+                                   protocol=pickle.HIGHEST_PROTOCOL)
+        finally:
+            if profiler != None:
+                profiler.attach(world)
+        self.thread = threading.Thread(target=self._write, args=(payload,))
+        self.thread.start()
+
+    def _write(self, payload : bytes = None) -> None:
+        try:
+            directory = os.path.dirname(os.path.abspath(self.filename))
+            os.makedirs(directory, exist_ok=True)
+            tmp_file = self.filename + ".tmp"
+            with open(tmp_file, "wb") as file:
+                file.write(zlib.compress(payload, self.compress_level))
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_file, self.filename)
+        except Exception as error:
+            self.error = error
+
+    def wait(self) -> None:
+        """
+        Block until the last checkpoint is on disk, re-raise its error if it failed.
+        """
+        if self.thread != None:
+            self.thread.join()
+            self.thread = None
+        if self.error != None:
+            error, self.error = self.error, None
+            raise error
+
+def loadCheckpoint(filename : str = "./data/checkpoint.ckpt"):
+    """
+    Restore a World saved by Checkpointer, the random generators are restored too so the run
+    continues exactly as if it was never stopped.
+
+    Return:\n
+        world = (World) world at the checkpointed step
+    """
+    with open(filename, "rb") as file:
+        state = pickle.loads(zlib.decompress(file.read()))
+    random.setstate(state["random"])
+    np.random.set_state(state["numpy"])
+    world = state["world"]
+    if world.logger != None:
+        world.logger.reopen()
+    if getattr(world, "profiler", None) != None:
+        world.profiler.attach(world)
+    return world
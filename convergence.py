@@ -0,0 +1,166 @@
+import numpy as np
+
+# ConvergenceMonitor class
+class ConvergenceMonitor:
+    def __init__(self, window : int = 100, rtol : float = 1e-6, atol : float = 1e-9, max_exploration : float = 0.01,
+                 period : int = None, action : str = "stop", min_time : int = 0) -> None:
+        """
+        Detect when a World run reached its steady state.\n
+        Colony populations, components and chemicals are sampled after every step. The run has
+        converged when, over the last window steps, every value is within rtol of its value one
+        period earlier (a periodic steady state) and every learner explores less than max_exploration.
+        Without a period every multiple of the meal interval up to window is tried (a cycle of
+        several meals, eg : an agent alternating foods), the shortest one that repeats is kept.\n
+        The run then either stops or skips ahead whole periods at once (skip), the reason is kept in reason.
+
+        Parameters:\n
+            window = (int) steps that have to repeat\n
+            rtol, atol = (float) relative and absolute tolerance of the change over a period\n
+            max_exploration = (float) max exploration rate of every learner\n
+            period = (int) steps of the cycle, None detects it among the multiples of the meal interval
+                     (every step count when the interval is a function) up to window\n
+            action = (str) "stop" ends the run, "skip" jumps ahead whole periods\n
+            min_time = (int) never converged before this time\n
+        """
+        if action not in ("stop", "skip"):
+            raise ValueError(f"unknown action : {action}")
+        self.window = window
+        self.rtol = rtol
+        self.atol = atol
+        self.max_exploration = max_exploration
+        self.period = period
+        # candidate periods and the step of the checks, set on the first sample
+        self.periods = None
+        self.check_every = None
+        self.action = action
+        self.min_time = min_time
+        self.done = False
+        self.reason = None
+        self.skipped = 0
+        # ring buffer of the last window + longest period samples
+        self.times = None
+        self.states = None
+        self.totals = None
+        self.explorations = None
+        self.count = 0
+
+    def _learners(self, world) -> list:
+        """
+        Agent and colony learners that explore (no-learning policies never do).
+        """
+        learners = [world.agent.ai] + [bacteria.ai for bacteria in world.bacterias]
+        return [learner for learner in learners if hasattr(learner, "exploration")]
+
+    def _state(self, world) -> np.ndarray:
+        """
+        Colony populations (in id order), components and chemicals as one vector.
+        """
+        pops = [bacteria.pop for bacteria in sorted(world.bacterias, key=lambda bacteria: bacteria.id)]
+        return np.concatenate([pops, world.agent.component_pop_array, world.agent.chemicals_array])
+
+    def observe(self, world) -> bool:
+        """
+        Sample world after a step.
+
+        Return:\n
+            done = (bool) the run has converged
+        """
+        if self.done:
+            return True
+        if self.periods == None:
+            self._setPeriods(world)
+        state = self._state(world)
+        explorations = np.array([learner.exploration for learner in self._learners(world)], dtype=float)
+        if self.states is None:
+            length = self.window + max(self.periods)
+            self.times = np.full(length, -1, dtype=np.int64)
+            self.states = np.zeros((length, len(state)))
+            self.totals = np.zeros((length, 2))
+            self.explorations = np.ones((length, len(explorations)))
+        slot = self.count % len(self.times)
+        self.times[slot] = world.time
+        self.states[slot] = state
+        self.totals[slot] = (world.total_reward, world.meals)
+        self.explorations[slot] = explorations
+        self.count += 1
+        # checked once per meal interval (or per given period)
+        if world.time < self.min_time or world.time % self.check_every != 0 or np.max(explorations, initial=0) > self.max_exploration:
+            return False
+        for period in self.periods:
+            change = self.change(world.time, period)
+            if change != None and change <= self.rtol:
+                self.done = True
+                self.period = period
+                self.reason = {"reason" : "converged", "action" : self.action, "time" : world.time, "period" : period,
+                               "relative_change" : change, "exploration" : float(np.max(explorations, initial=0)),
+                               "skipped" : self.skipped}
+                break
+        return self.done
+
+    def _setPeriods(self, world) -> None:
+        """
+        The given period, or every multiple of the meal interval up to window (shortest first).
+        """
+        if self.period != None:
+            self.periods = [self.period]
+            self.check_every = self.period
+            return
+        interval = world.scheduler.meal_interval
+        base = 1 if callable(interval) else world.scheduler.interval(world)
+        self.periods = list(range(base, max(self.window, base) + 1, base))
+        self.check_every = base
+
+    def _slot(self, time : int = 0) -> int:
+        """
+        Slot of the sample taken at time, None if it isn't kept.
+        """
+        slots = np.flatnonzero(self.times == time)
+        return None if len(slots) == 0 else slots[0]
+
+    def change(self, time : int = 0, period : int = None) -> float:
+        """
+        Max relative change over one period (default : self.period) of the samples of the last
+        window steps up to time (the last sample), None while some of these samples are missing.
+        """
+        period = self.period if period == None else period
+        lags = np.arange(self.window + period)
+        slots = (self.count - 1 - lags) % len(self.times)
+        if self.window + period > len(self.times) or np.any(self.times[slots] != time - lags):
+            return None
+        now, before = self.states[slots[:self.window]], self.states[slots[period:]]
+        return float(np.max(np.abs(now - before)/(np.abs(before) + self.atol)))
+
+    def skip(self, world = None, total_time : int = 0) -> int:
+        """
+        Jump world ahead by whole periods (up to total_time and before the next non meal event) :
+        the state repeats, reward and meals grow by their amount over the last period and the
+        exploration of every learner keeps decaying at its rate over the last period. Learners are
+        taken as frozen (their small updates are not replayed) and skipped steps are not logged.
+
+        Return:\n
+            ticks = (int) steps skipped
+        """
+        end = total_time
+        for time, _, kind, _ in world.scheduler.heap:
+            if kind != "meal":
+                end = min(end, time)
+        cycles = max((end - world.time)//self.period, 0)
+        now, before = self._slot(world.time), self._slot(world.time - self.period)
+        if cycles == 0 or now == None or before == None:
+            self.done = False
+            return 0
+        ticks = cycles*self.period
+        reward, meals = self.totals[now] - self.totals[before]
+        world.total_reward += cycles*reward
+        world.meals += int(round(cycles*meals))
+        ratio = self.explorations[now]/np.maximum(self.explorations[before], 1e-300)
+        for learner, rate in zip(self._learners(world), ratio):
+            learner.exploration *= rate**cycles
+        world.time += ticks
+        world.scheduler.shift(ticks)
+        self.skipped += ticks
+        self.reason["skipped"] = self.skipped
+        # samples are taken again from the new time, convergence is checked again after window + period steps
+        self.times[:] = -1
+        self.done = False
+        return ticks
@@ -0,0 +1,179 @@
+import numpy as np
+
+# StateHistory class
+class StateHistory:
+    def __init__(self, memory : int = 1, state_size : int = 5, window_shape : tuple = None) -> None:
+        """
+        Preallocated circular history of the last observations of a learner.\n
+        Every row is written twice (slot and slot + length) so the latest memory rows are
+        always one contiguous slice of the buffer : append never allocates and window
+        returns a view.\n
+        One extra slot is kept so the window handed out before an append is still intact
+        after it, the curr_state and next_state of a transition are two views of the same buffer.
+
+        Parameters:\n
+            memory = (int) number of observations in a window (lstm_memory, 1 for dense states)\n
+            state_size = (int) size of one observation\n
+            window_shape = (tuple) shape the network expects, eg : (1, state_size) or (1, lstm_memory, state_size)\n
+        """
+        self.memory = memory
+        self.state_size = state_size
+        self.window_shape = (1, state_size) if window_shape == None else tuple(window_shape)
+        self.length = memory + 1
+        self.buffer = np.zeros((2*self.length, state_size))
+        # slot of the latest observation
+        self.head = self.length - 1
+
+    def append(self, values : np.ndarray = None) -> np.ndarray:
+        """
+        Add an observation and return the new window.
+
+        Parameter:\n
+            values = (ndarray) (state_size,) observation\n
+        Return:\n
+            window = (ndarray) view of the latest memory observations, oldest first
+        """
+        self.head = (self.head + 1) % self.length
+        self.buffer[self.head] = values
+        self.buffer[self.head + self.length] = values
+        return self.window()
+
+    def window(self) -> np.ndarray:
+        """
+        View of the latest memory observations, oldest first, in window_shape.
+        """
+        start = self.head + self.length - self.memory + 1
+        return self.buffer[start:start + self.memory].reshape(self.window_shape)
+
+    def latest(self) -> np.ndarray:
+        """
+        View of the latest observation.
+        """
+        return self.buffer[self.head]
+
+    def clear(self) -> None:
+        """
+        Forget every observation.
+        """
+        self.buffer[:] = 0
+        self.head = self.length - 1
+
+# NN_data types fed a window of the last lstm_memory observations
+WINDOW_TYPES = ("lstm", "stgraph")
+
+def windowMemory(NN_data : dict = None) -> int:
+    """
+    Observations in a state of the network selected by NN_data, None for a dense state.
+    """
+    if NN_data != None and NN_data["type"].lower() in WINDOW_TYPES:
+        return NN_data.get("lstm_memory", 2)
+    return None
+
+def historyFor(state_size : int = 5, AI_data : dict = None) -> StateHistory:
+    """
+    StateHistory shaped for the network selected by AI_data (no ai and non window types keep a dense state).
+    """
+    memory = windowMemory(None if AI_data == None else AI_data["NN_data"])
+    if memory != None:
+        return StateHistory(memory=memory, state_size=state_size, window_shape=(1, memory, state_size))
+    return StateHistory(memory=1, state_size=state_size)
+
+def stateShape(state_size : int = 5, NN_data : dict = None) -> tuple:
+    """
+    Shape of one state (without the batch axis) of the network selected by NN_data.
+    """
+    memory = windowMemory(NN_data)
+    if isGraph(NN_data):
+        return (memory, NN_data.get("nodes", state_size), NN_data.get("channels", GRAPH_CHANNELS))
+    if memory != None:
+        return (memory, state_size)
+    return (state_size,)
+
+def isGraph(NN_data : dict = None) -> bool:
+    """
+    True when the network selected by NN_data is fed the gut graph (see GutGraph).
+    """
+    return NN_data != None and NN_data["type"].lower() == "stgraph"
+
+# node types of the gut graph
+COLONY, COMPONENT, CHEMICAL = 0, 1, 2
+NODE_TYPES = 3
+# channels of a node : value, node type, 1 for a real node and 0 for a padding slot
+GRAPH_CHANNELS = 3
+
+# GutGraph class
+class GutGraph:
+    def __init__(self, colony_ids : list = None, no_components : int = 5, no_chemical : int = 5,
+                 memory : int = 2, max_colonies : int = None) -> None:
+        """
+        Shared observation of the whole gut as a graph, fed to every stgraph learner of a World.\n
+        Nodes are the colony populations (max_colonies slots, the unused ones are padding), the
+        component populations and the chemicals, in that order. A state is a (1, memory, nodes,
+        GRAPH_CHANNELS) window of the last observations : every node has its value, its node type
+        (COLONY, COMPONENT or CHEMICAL) and a mask channel that is 0 on padding slots, so worlds
+        with a different number of colonies can run the same network.\n
+        The graph is observed twice per step (curr and next), curr and next are the windows every
+        learner decides and trains on.
+
+        Parameters:\n
+            colony_ids = (list) id of every colony, colony i gets slot i\n
+            no_components = (int) number of components\n
+            no_chemical = (int) number of chemicals\n
+            memory = (int) observations in a window\n
+            max_colonies = (int) colony slots, None : one per colony\n
+        """
+        max_colonies = len(colony_ids) if max_colonies == None else max_colonies
+        if len(colony_ids) > max_colonies:
+            raise ValueError(f"{len(colony_ids)} colonies do not fit in max_colonies = {max_colonies}")
+        self.max_colonies = max_colonies
+        self.nodes = max_colonies + no_components + no_chemical
+        self.memory = memory
+        # colony id -> slot, ids sorted for a vectorised lookup
+        self.ids = np.asarray(colony_ids)
+        self.order = np.argsort(self.ids, kind="stable")
+        self.no_colonies = len(colony_ids)
+        self.component_start = max_colonies
+        self.chemical_start = max_colonies + no_components
+        # latest observation, the type and mask channels never change
+        self.values = np.zeros((self.nodes, GRAPH_CHANNELS))
+        self.values[:self.component_start, 1] = COLONY
+        self.values[self.component_start:self.chemical_start, 1] = COMPONENT
+        self.values[self.chemical_start:, 1] = CHEMICAL
+        self.values[:, 2] = 1
+        self.values[self.no_colonies:self.component_start, 2] = 0
+        self.history = StateHistory(memory=memory, state_size=self.nodes*GRAPH_CHANNELS,
+                                    window_shape=(1, memory, self.nodes, GRAPH_CHANNELS))
+        self.history.buffer[:] = self.values.ravel()
+        self.curr = self.history.window()
+        self.next = self.history.window()
+
+    def slots(self, ids : np.ndarray = None) -> np.ndarray:
+        """
+        Slot of every colony id.
+        """
+        return self.order[np.searchsorted(self.ids[self.order], ids)]
+
+    def observe(self, world = None, population = None) -> np.ndarray:
+        """
+        Add the current gut content of world to the history.
+
+        Parameters:\n
+            world = (World) world being simulated\n
+            population = (Population) colonies to read instead of world.population / world.bacterias\n
+        Return:\n
+            window = (ndarray) (1, memory, nodes, GRAPH_CHANNELS) view of the history
+        """
+        population = world.population if population == None else population
+        if population != None:
+            self.values[self.slots(population.id), 0] = population.pop
+        else:
+            self.values[self.slots([bacteria.id for bacteria in world.bacterias]), 0] = [bacteria.pop for bacteria in world.bacterias]
+        self.values[self.component_start:self.chemical_start, 0] = world.agent.component_pop_array
+        self.values[self.chemical_start:, 0] = world.agent.chemicals_array
+        return self.history.append(self.values.ravel())
+
+    def observeCurr(self, world = None, population = None) -> None:
+        self.curr = self.observe(world=world, population=population)
+
+    def observeNext(self, world = None, population = None) -> None:
+        self.next = self.observe(world=world, population=population)
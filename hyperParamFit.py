@@ -1,41 +1,204 @@
 from bayes_opt import BayesianOptimization
-from main import main
-
-# Define the RL objective function to be optimized
-def rl_objective_function(h0, h1, h2, h3, h4, h5):
-    # Set the RL hyperparameters based on x and y
-    kick_satisfaction = h0
-    eat_time = h1
-    learning_rate = h2
-    alpha = h3
-    gamma = h4
-    exp_decay = h5
-
-    # Initialize and train the RL agent with the hyperparameters
-    evaluation_metric = main(kick_satisfaction,eat_time,learning_rate,alpha,gamma,exp_decay)
-
-    # Return the negative evaluation metric (BayesianOptimization minimizes the objective function)
-    return -evaluation_metric
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import json
+import multiprocessing
+import os
+import numpy as np
+from main import defaultData, applyHyperParams
+from runner import _initWorker, _needsTF, seedAll
 
 # Define the parameter bounds for optimization
 parameter_bounds = {
-    'h0': (0, 10),
-    'h1': (1, 10),
-    'h2': (0.001, 1),
-    'h3': (0.01, 1),
-    'h4': (0, 1),
-    'h5': (0, 1)
+    'kick_satisfaction': (0, 10),
+    'eat_time': (1, 10),
+    'learning_rate': (0.001, 1),
+    'alpha': (0.01, 1),
+    'gamma': (0, 1),
+    'exp_decay': (0, 1)
 }
 
-# Create an instance of the BayesianOptimization class
-bayes_optimizer = BayesianOptimization(f=rl_objective_function, pbounds=parameter_bounds)
+def rl_objective_function(kick_satisfaction, eat_time, learning_rate, alpha, gamma, exp_decay,
+                          total_time : int = 2000, seed : int = 0, check_every : int = 100,
+                          reference : list = None, min_checks : int = 3) -> dict:
+    """
+    Run one trial and score it by the agent reward summed over the run (higher is better).\n
+    Every check_every steps the reward so far is compared to reference, the median curve of the
+    finished trials; a trial below it after min_checks checks is stopped early.
+
+    Return:\n
+        trial = (dict) {"params" : (dict), "target" : (float), "curve" : [(float), ...], "stopped" : (bool)}
+    """
+    from world import World
+    params = {"kick_satisfaction" : kick_satisfaction, "eat_time" : eat_time, "learning_rate" : learning_rate,
+              "alpha" : alpha, "gamma" : gamma, "exp_decay" : exp_decay}
+    data = applyHyperParams(defaultData(), **params)
+    data["log_data"] = {"verbosity" : 0}
+    seedAll(seed, tensorflow=_needsTF(data))
+    world = World(**data)
+
+    # reward summed so far, recorded every check_every steps
+    curve = []
+    stopped = False
+    for time in range(total_time):
+        world.step()
+        if (time + 1) % check_every == 0:
+            curve.append(float(world.total_reward))
+            check = len(curve) - 1
+            if reference != None and check >= min_checks - 1 and check < len(reference) and curve[check] < reference[check]:
+                stopped = True
+                break
+    # a stopped trial is scored by extrapolating its reward rate to the full run
+    target = world.total_reward*total_time/max(world.time, 1)
+    return {"params" : params, "target" : float(target), "curve" : curve, "stopped" : stopped}
+
+def _runTrial(job : dict = None) -> dict:
+    return rl_objective_function(**job)
+
+# ParallelSearch class
+class ParallelSearch:
+    def __init__(self, pbounds : dict = None, state_file : str = "./data/hyperparam_search.json",
+                 batch_size : int = 4, processes : int = None, total_time : int = 2000,
+                 check_every : int = 100, min_checks : int = 3, seed : int = 0, init_points : int = 2) -> None:
+        """
+        Bayesian hyper parameter search evaluating batches of points in parallel.
+
+        Parameters:\n
+            pbounds = (dict) {"name" : (low, high), ...} search space\n
+            state_file = (str) json file with every finished trial, an existing file is resumed\n
+            batch_size = (int) points suggested at once\n
+            processes = (int) worker processes, None uses batch_size\n
+            total_time = (int) steps of every trial\n
+            check_every = (int) steps between early stopping checks\n
+            min_checks = (int) checks a trial always survives\n
+            seed = (int) seed of the simulations and of the optimiser\n
+            init_points = (int) random trials before the optimiser's suggestions\n
+        """
+        self.pbounds = parameter_bounds if pbounds == None else pbounds
+        self.state_file = state_file
+        self.batch_size = batch_size
+        self.processes = batch_size if processes == None else processes
+        self.total_time = total_time
+        self.check_every = check_every
+        self.min_checks = min_checks
+        self.seed = seed
+        self.init_points = init_points
+        self.trials = []
+        if state_file != None and os.path.exists(state_file):
+            with open(state_file) as file:
+                self.trials = json.load(file)["trials"]
+        # a resumed search draws new random points, not the ones of the trials it already has
+        self.random = np.random.RandomState([seed, len(self.trials)])
+
+    def _save(self) -> None:
+        """
+        Write the search state atomically.
+        """
+        if self.state_file == None:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.state_file)), exist_ok=True)
+        tmp_file = self.state_file + ".tmp"
+        with open(tmp_file, "w") as file:
+            json.dump({"pbounds" : self.pbounds, "trials" : self.trials}, file, indent=1)
+        os.replace(tmp_file, self.state_file)
+
+    def _reference(self) -> list:
+        """
+        Median reward curve of the trials that ran to the end.
+        """
+        curves = [trial["curve"] for trial in self.trials if not trial["stopped"]]
+        if len(curves) < 2:
+            return None
+        length = min(len(curve) for curve in curves)
+        return list(np.median([curve[:length] for curve in curves], axis=0))
+
+    def _scores(self) -> list:
+        """
+        (params, target) of every trial as the optimiser sees it : a stopped trial only has an extrapolated
+        target of its most exploring steps, it gets the worst target of the finished trials (as in best).
+        """
+        finished = [trial["target"] for trial in self.trials if not trial["stopped"]]
+        worst = min(finished, default=None)
+        return [(trial["params"], trial["target"] if not trial["stopped"] or worst == None else worst)
+                for trial in self.trials]
+
+    def _optimizer(self) -> BayesianOptimization:
+        optimizer = BayesianOptimization(f=None, pbounds=self.pbounds, verbose=0,
+                                         random_state=self.random.randint(2**31), allow_duplicate_points=True)
+        for params, target in self._scores():
+            optimizer.register(params=params, target=target)
+        return optimizer
+
+    def suggestBatch(self, size : int = None, pending : list = None) -> list:
+        """
+        Several points at once : random points until init is done, then the optimiser's
+        suggestions with a constant liar (the points still being evaluated and the ones already
+        suggested are registered with the worst target so far).
+
+        Parameters:\n
+            size = (int) number of points, None : batch_size\n
+            pending = (list) [(dict) params, ...] points whose trial is still running\n
+        """
+        size = self.batch_size if size == None else size
+        pending = [] if pending == None else pending
+        if len(self.trials) < max(self.init_points, 1):
+            return [{key : self.random.uniform(low, high) for key, (low, high) in self.pbounds.items()}
+                    for _ in range(size)]
+        optimizer = self._optimizer()
+        lie = min(target for _, target in self._scores())
+        for point in pending:
+            optimizer.register(params=point, target=lie)
+        points = []
+        for _ in range(size):
+            point = optimizer.suggest()
+            optimizer.register(params=point, target=lie)
+            points.append({key : float(value) for key, value in point.items()})
+        return points
+
+    def maximize(self, init_points : int = None, n_iter : int = 5) -> dict:
+        """
+        Run (or resume) the search until init_points (None : the one given to the search) + n_iter trials are done.
+
+        Return:\n
+            best = (dict) {"params" : (dict), "target" : (float), ...} best finished trial
+        """
+        if init_points != None:
+            self.init_points = init_points
+        total = self.init_points + n_iter
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=self.processes, mp_context=context, initializer=_initWorker) as pool:
+            # running trial -> its point
+            pending = {}
+            while len(self.trials) + len(pending) < total or pending:
+                # keep every worker busy
+                free = min(self.processes - len(pending), total - len(self.trials) - len(pending))
+                if free > 0:
+                    reference = self._reference()
+                    for point in self.suggestBatch(free, pending=list(pending.values())):
+                        job = dict(point, total_time=self.total_time, seed=self.seed, check_every=self.check_every,
+                                   reference=reference, min_checks=self.min_checks)
+                        pending[pool.submit(_runTrial, job)] = point
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    del pending[future]
+                    self.trials.append(future.result())
+                self._save()
+        return self.best()
+
+    def best(self) -> dict:
+        """
+        Best trial that ran to the end.
+        """
+        finished = [trial for trial in self.trials if not trial["stopped"]] or self.trials
+        return max(finished, key=lambda trial: trial["target"])
 
-# Perform Bayesian optimization
-bayes_optimizer.maximize(init_points=2, n_iter=5)
+if __name__=="__main__":
+    # Perform Bayesian optimization
+    search = ParallelSearch(pbounds=parameter_bounds, batch_size=4)
+    best = search.maximize(init_points=2, n_iter=5)
 
-# Access the best hyperparameters and the corresponding evaluation metric
-best_hyperparameters = bayes_optimizer.max['params']
-best_evaluation_metric = -bayes_optimizer.max['target']
+    # Access the best hyperparameters and the corresponding evaluation metric
+    best_hyperparameters = best["params"]
+    best_evaluation_metric = best["target"]
 
-print(best_evaluation_metric)
-print(best_hyperparameters)
\ No newline at end of file
+    print(best_evaluation_metric)
+    print(best_hyperparameters)
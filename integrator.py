@@ -0,0 +1,387 @@
+import copy
+import numpy as np
+
+def geometricSum(rate : float = 0.01, ticks : float = 1) -> float:
+    """
+    sum of rate**k for k in range(ticks), ticks may be fractional.
+    """
+    if rate == 1:
+        return ticks
+    return (1 - rate**ticks)/(1 - rate)
+
+def decayChemicals(chemicals : np.ndarray = None, rate : float = 0.01, ticks : float = 1) -> np.ndarray:
+    """
+    Chemicals after ticks steps of decay, closed form of multiplying by rate every step.
+    """
+    return chemicals*rate**ticks
+
+# GutODE class
+class GutODE:
+    def __init__(self, population = None, decay_rate : float = 0.01, method : str = "rk4", dt : int = 1,
+                 rtol : float = 1e-3, atol : float = 1e-6, max_step : int = 256) -> None:
+        """
+        Continuous version of the colony step, advances growth, food, chemicals and speed over many
+        ticks in one call for all colonies at once (Population arrays, leading world axes allowed).\n
+        Growth and food consumption follow the equations of Population.growth (speed ordered or shared
+        food access, a tick is one unit of time) : a step of one tick is the per tick update itself,
+        longer steps integrate the continuous version. The switches of the per tick model (a pool
+        running out, a colony hitting the 0.01 floor, the food a colony sees running out, the speed
+        order changing) are detected inside every step, a step that crosses one is cut down, to single
+        ticks if needed. Chemicals and speed are linear in the production, they are summed tick by tick
+        over the populations of every tick (interpolated inside a step).\n
+        error is an estimate of the max relative deviation from the per tick model (integration error
+        plus the gap between a continuous and a discrete tick, and what it does to the speed), World.integrate
+        steps the stretch instead when it is above rtol. rtol holds for one call, the errors of successive
+        stretches add up. Colonies produce at their base rate (no ai decisions).\n
+        "discrete" runs the per tick model itself (no error) : the populations tick by tick, the chemicals
+        and speed of blocks of up to max_step ticks at once, it is what World.fastForward uses.
+
+        Parameters:\n
+            population = (Population) colonies, its arrays are replaced by the advanced ones\n
+            decay_rate = (float) chemical_decay_rate of the agent\n
+            method = (str) "euler" or "rk4" fixed steps, "adaptive" rk4 steps sized by step doubling, "discrete" per tick updates\n
+            dt = (int) step size in ticks (first step size for "adaptive"), 1 steps the per tick model\n
+            rtol = (float) accepted relative error, "adaptive" keeps the error under it (single ticks where
+                   the continuous and the discrete tick differ too much)\n
+            atol = (float) absolute error floor of the relative errors\n
+            max_step = (int) longest step in ticks\n
+        """
+        if method not in ("euler", "rk4", "adaptive", "discrete"):
+            raise ValueError(f"unknown method : {method}")
+        self.population = population
+        self.decay_rate = decay_rate
+        self.method = method
+        self.dt = max(int(dt), 1)
+        self.rtol = rtol
+        self.atol = atol
+        self.max_step = max(int(max_step), 1)
+        # error estimate of the last advance, ticks done as single per tick updates
+        self.error = 0.0
+        self.exact_ticks = 0
+        # decay weights of _linear by number of ticks
+        self._weights = {}
+
+    def rates(self, pop : np.ndarray = None, food : np.ndarray = None) -> tuple:
+        """
+        Time derivatives of the colony populations and of the food, colonies in speed order.
+
+        Return:\n
+            d_pop = (ndarray) (..., no_bacteria)\n
+            d_food = (ndarray) (..., no_components)\n
+            switches = (ndarray) state of every switch of the per tick model, a step is only
+                       continuous while they all stay the same
+        """
+        population = self.population
+        eat_rate = population.eat_rate
+        total_pop = np.sum(pop, axis=-1, keepdims=True)
+        consumed = population.comp_mask*(pop*eat_rate)[..., None]
+        if population.food_access == "sequential":
+            # colony i sees the pool left by the colonies before it
+            seen = food[..., None, :] - (np.cumsum(consumed, axis=-2) - consumed)
+        else:
+            seen = np.repeat(food[..., None, :], pop.shape[-1], axis=-2)
+        total_food = 0.01 + np.sum(population.comp_like*np.maximum(seen, 0), axis=-1)
+        # pop/capacity of Bacteria.growth, capacity = (pop/total_pop)*total_food/eat_rate
+        d_pop = eat_rate*pop*(1 - eat_rate*total_pop/total_food)
+        if population.interaction != None:
+            d_pop = d_pop + eat_rate*pop*population.interaction.effect(pop, total_pop, population.index)
+        # a colony on the floor stays there while it shrinks, as the per tick model clips it
+        floored = (pop <= 0.01) & (d_pop < 0)
+        d_pop = np.where(floored, 0, d_pop)
+        # an empty pool stays empty
+        d_food = np.where(food > 0, -np.sum(consumed, axis=-2), 0)
+        switches = np.concatenate([floored.ravel(), (food > 0).ravel(), (seen[population.comp_mask] > 0).ravel()])
+        return d_pop, d_food, switches
+
+    def _tick(self, pop : np.ndarray = None, food : np.ndarray = None, k1 : tuple = None) -> tuple:
+        """
+        One per tick update (the discrete model), k1 = rates(pop, food).
+        """
+        return np.maximum(pop + k1[0], 0.01), np.maximum(food + k1[1], 0)
+
+    def _ticks(self, pop : np.ndarray = None, food : np.ndarray = None, ticks : int = 1) -> tuple:
+        """
+        ticks per tick updates in the current colony order (the growth of Population.growth). Once the colonies
+        ate all they can only the populations change, once they stop changing too the rest of the ticks are copies.
+
+        Return:\n
+            pops, foods = (ndarray) (ticks, ..., no_bacteria) and (ticks, ..., no_components) state after every tick
+        """
+        population = self.population
+        eat_rate = population.eat_rate
+        sequential = population.food_access == "sequential"
+        add = np.add.reduce
+        pops = np.empty((ticks,) + pop.shape)
+        foods = np.empty((ticks,) + food.shape)
+        # food no colony eats stays, once the rest is gone the colonies only see the 0.01 of food
+        edible = np.any(population.comp_mask, axis=-2)
+        empty = not (edible*food).any()
+        if empty:
+            foods[:] = food
+        for tick in range(ticks):
+            eaten_pop = eat_rate*pop
+            total_pop = add(pop, axis=-1, keepdims=True)
+            if empty:
+                change_pop = eaten_pop*(1 - eat_rate*total_pop/0.01)
+            else:
+                consumed = population.comp_mask*eaten_pop[..., None]
+                eaten = consumed.cumsum(axis=-2)
+                # colony i sees the pool left by the colonies before it
+                seen = np.maximum(food[..., None, :] - (eaten - consumed), 0) if sequential else food[..., None, :]
+                change_pop = eaten_pop*(1 - eat_rate*total_pop/(0.01 + add(population.comp_like*seen, axis=-1)))
+            if population.interaction != None:
+                change_pop = change_pop + eaten_pop*population.interaction.effect(pop, total_pop, population.index)
+            new_pop = np.maximum(pop + change_pop, 0.01)
+            if empty:
+                if (new_pop == pop).all():
+                    # fixed point, every later tick is the same
+                    pops[tick:] = pop
+                    break
+            else:
+                food = foods[tick] = np.maximum(food - eaten[..., -1, :], 0)
+                if not (edible*food).any():
+                    empty = True
+                    foods[tick + 1:] = food
+            pops[tick] = pop = new_pop
+        return pops, foods
+
+    def _step(self, pop : np.ndarray = None, food : np.ndarray = None, h : float = 1, k1 : tuple = None,
+              method : str = None) -> tuple:
+        """
+        One continuous step of h ticks, k1 = rates(pop, food), method defaults to the method of the integrator.
+
+        Return:\n
+            pop, food = (ndarray) state after the step\n
+            smooth = (bool) no switch changed at the stages of the step
+        """
+        if (self.method if method == None else method) == "euler":
+            new_pop, new_food = pop + h*k1[0], food + h*k1[1]
+            return new_pop, new_food, bool(np.all(new_pop >= 0.01) and np.all(new_food >= 0))
+        smooth = True
+        stages = [k1]
+        for weight in (h/2, h/2, h):
+            stage_pop, stage_food = pop + weight*stages[-1][0], food + weight*stages[-1][1]
+            stages.append(self.rates(stage_pop, stage_food))
+            smooth = smooth and np.array_equal(stages[-1][2], k1[2])
+        k1, k2, k3, k4 = stages
+        new_pop = pop + h/6*(k1[0] + 2*k2[0] + 2*k3[0] + k4[0])
+        new_food = food + h/6*(k1[1] + 2*k2[1] + 2*k3[1] + k4[1])
+        return new_pop, new_food, smooth and bool(np.all(new_pop >= 0.01) and np.all(new_food >= 0))
+
+    def _relative(self, a : np.ndarray = None, b : np.ndarray = None) -> float:
+        return float(np.max(np.abs(a - b)/(self.atol + np.abs(b)), initial=0))
+
+    def _linear(self, chemicals : np.ndarray = None, speed : np.ndarray = None, pops : np.ndarray = None) -> tuple:
+        """
+        Chemicals and speed over len(pops) ticks, pops[k] being the populations after the growth of tick k.\n
+        Per tick : colony i reacts to the chemicals plus the production of itself and of the colonies
+        before it, then chemicals = rate*(chemicals + everything produced).
+
+        Return:\n
+            chemicals = (ndarray) (ticks + 1, ..., no_chemical) chemicals at the start of every tick, the last row after the ticks\n
+            speeds = (ndarray) (ticks, ..., no_bacteria) speed after every tick\n
+            induced = (ndarray) (..., no_bacteria) sum over the ticks of |chemical_inducer| @ chemicals seen
+        """
+        rate = self.decay_rate
+        ticks = len(pops)
+        total = np.matmul(pops[..., None, :], self.produce)[..., 0, :]
+        # chemicals at the start of tick k (k = ticks : after the last one), closed form of the recurrence
+        k = np.arange(ticks + 1)
+        weights = self._weights.get(ticks)
+        if weights is None:
+            lags = k[:, None] - k[None, :-1]
+            weights = self._weights[ticks] = np.where(lags > 0, rate**np.maximum(lags, 0), 0)
+        before = (decayChemicals(chemicals, rate, k.reshape((-1,) + (1,)*chemicals.ndim))
+                  + np.tensordot(weights, total, axes=(1, 0)))
+        # inducer @ (chemicals + production of the colonies up to i), the second term as pops @ triangular matrix
+        induced = (np.matmul(before[:-1, ..., None, :], self.inducer_t)[..., 0, :]
+                   + np.matmul(pops[..., None, :], self.cross)[..., 0, :])
+        speeds = speed + np.cumsum(induced, axis=0)
+        seen_abs = (np.matmul(np.sum(before[:-1], axis=0)[..., None, :], np.abs(self.inducer_t))[..., 0, :]
+                    + np.matmul(np.sum(pops, axis=0)[..., None, :], self.cross_abs)[..., 0, :])
+        return before, speeds, seen_abs
+
+    def _orderMatrices(self) -> None:
+        """
+        Production / inducer matrices of the current colony order.
+        """
+        population = self.population
+        # chemicals produced per tick per unit of colony population
+        self.produce = population.chemical_produce*population.chemical_produce_rate[..., None]
+        self.inducer_t = np.swapaxes(population.chemical_inducer, -1, -2)
+        # cross[j, i] = produce[j] @ inducer[i] for the colonies j up to i
+        self.cross = np.triu(np.matmul(self.produce, self.inducer_t))
+        self.cross_abs = np.triu(np.matmul(self.produce, np.abs(self.inducer_t)))
+
+    def _interpolate(self, pop : np.ndarray = None, d_pop : np.ndarray = None, new_pop : np.ndarray = None,
+                     new_d_pop : np.ndarray = None, h : int = 1) -> np.ndarray:
+        """
+        Populations after every tick of a step of h ticks (cubic Hermite, the last one is new_pop).
+        """
+        s = (np.arange(1, h + 1)/h).reshape((-1,) + (1,)*pop.ndim)
+        pops = ((2*s**3 - 3*s**2 + 1)*pop + (s**3 - 2*s**2 + s)*h*d_pop
+                + (-2*s**3 + 3*s**2)*new_pop + (s**3 - s**2)*h*new_d_pop)
+        pops[-1] = new_pop
+        return np.maximum(pops, 0.01)
+
+    def advance(self, comp_pop : np.ndarray = None, chemicals : np.ndarray = None, ticks : int = 1, observer = None) -> tuple:
+        """
+        Advance the colonies, food and chemicals ticks steps (population pop, pre_pop and speed are
+        replaced, colonies end up in speed order), error is set to the error estimate.
+
+        Parameters:\n
+            comp_pop = (ndarray) (..., no_components) amount of each component in gut\n
+            chemicals = (ndarray) (..., no_chemical) chemicals in gut\n
+            ticks = (int) time to advance\n
+            observer = (function) "discrete" only, called after every block with the state at the start of each
+                       of its ticks : observer(pre_pop, pop, speed, comp_pop, chemicals), arrays with a leading tick axis\n
+        Return:\n
+            comp_pop, chemicals = (ndarray) state after ticks\n
+        """
+        population = self.population
+        food = comp_pop
+        time = 0
+        h = self.dt
+        self.error = 0.0
+        self.exact_ticks = 0
+        # error of the state so far and error of the speed it caused
+        state_error = 0.0
+        speed_error = 0.0
+        # single ticks left before trying a longer step again, and the length of the next such run
+        exact_run, backoff = 0, 1
+        population.sortBySpeed()
+        self._orderMatrices()
+        if self.method == "discrete":
+            return self._advanceDiscrete(food, chemicals, ticks, observer)
+        k1 = self.rates(population.pop, food)
+        while time < ticks:
+            pop, speed = population.pop, population.speed
+            h = 1 if exact_run > 0 else max(min(h, ticks - time, self.max_step), 1)
+            if h == 1:
+                exact_run = max(exact_run - 1, 0)
+                new_pop, new_food = self._tick(pop, food, k1)
+                pops = new_pop[None]
+                step_error = 0.0
+            else:
+                new_pop, new_food, smooth = self._step(pop, food, h, k1)
+                if smooth:
+                    # one step of h against two of h/2
+                    half_pop, half_food, smooth_1 = self._step(pop, food, h/2, k1)
+                    k_half = self.rates(half_pop, half_food)
+                    half_pop, half_food, smooth_2 = self._step(half_pop, half_food, h/2, k_half)
+                    smooth = smooth_1 and smooth_2 and np.array_equal(k_half[2], k1[2])
+                if not smooth:
+                    # a switch inside the step
+                    h = h//2
+                    continue
+                error = max(self._relative(new_pop, half_pop), self._relative(new_food, half_food))
+                error /= 1 if self.method == "euler" else 15
+                # gap between one continuous and one discrete tick, taken again every tick of the step
+                tick_pop, tick_food = self._tick(pop, food, k1)
+                flow_pop, flow_food, _ = self._step(pop, food, 1, k1, method="rk4")
+                model_error = h*max(self._relative(flow_pop, tick_pop), self._relative(flow_food, tick_food))
+                if self.method == "adaptive" and error + model_error > self.rtol*h/ticks:
+                    # the integration error shrinks with h, the model error only with single ticks
+                    if model_error > self.rtol*h/ticks:
+                        h, exact_run, backoff = 1, backoff, 2*backoff
+                    else:
+                        h = max(int(h*max(0.1, 0.9*(error/(self.rtol*h/ticks))**-0.2)), 1)
+                    continue
+                new_pop, new_food = half_pop, half_food
+                k_end = self.rates(new_pop, new_food)
+                if not np.array_equal(k_end[2], k1[2]):
+                    h = h//2
+                    continue
+                pops = self._interpolate(pop, k1[0], new_pop, k_end[0], h)
+                step_error = error + model_error
+                backoff = 1
+            before, speeds, seen_abs = self._linear(chemicals, speed, pops)
+            # colonies are sorted by speed again before every tick, the step ends where the order changes
+            unsorted = np.flatnonzero(np.any(speeds[:-1, ..., :-1] < speeds[:-1, ..., 1:], axis=tuple(range(1, speeds.ndim))))
+            if len(unsorted) > 0:
+                h = int(unsorted[0]) + 1
+                continue
+            state_error += step_error
+            speed_error = speed_error + state_error*seen_abs
+            self.exact_ticks += h if h == 1 else 0
+            population.pre_pop = pops[-2] if h > 1 else pop
+            population.pop = new_pop
+            population.speed = speeds[-1]
+            food, chemicals = new_food, before[-1]
+            time += h
+            # fixed steps go back to dt after a cut, adaptive ones try a longer step
+            h = 2*h if self.method == "adaptive" else self.dt
+            if np.any(population.sortBySpeed() != np.arange(population.pop.shape[-1])):
+                self._orderMatrices()
+            k1 = self.rates(population.pop, food)
+        self.error = max(state_error, float(np.max(speed_error/(self.atol + np.abs(population.speed)), initial=0)))
+        return food, chemicals
+
+    def _advanceDiscrete(self, food : np.ndarray = None, chemicals : np.ndarray = None, ticks : int = 1,
+                         observer = None) -> tuple:
+        """
+        advance of the "discrete" method, blocks cut where the speed order changes. A block is at most
+        twice as long as the last one (up to max_step), the ticks after a cut are computed again.
+        """
+        population = self.population
+        time = 0
+        h = 8
+        while time < ticks:
+            pre_pop, pop, speed = population.pre_pop, population.pop, population.speed
+            h = min(2*h, self.max_step, ticks - time)
+            pops, foods = self._ticks(pop, food, h)
+            before, speeds, _ = self._linear(chemicals, speed, pops)
+            # colonies are sorted by speed again before every tick, the block ends where the order changes
+            unsorted = np.flatnonzero(np.any(speeds[:-1, ..., :-1] < speeds[:-1, ..., 1:], axis=tuple(range(1, speeds.ndim))))
+            if len(unsorted) > 0:
+                h = int(unsorted[0]) + 1
+                pops, foods, before, speeds = pops[:h], foods[:h], before[:h + 1], speeds[:h]
+            if observer != None:
+                observer(np.concatenate([pre_pop[None], pop[None], pops[:-2]])[:h], np.concatenate([pop[None], pops[:-1]]),
+                         np.concatenate([speed[None], speeds[:-1]]), np.concatenate([food[None], foods[:-1]]), before[:-1])
+            population.pre_pop = pops[-2] if h > 1 else pop
+            population.pop = pops[-1]
+            population.speed = speeds[-1]
+            food, chemicals = foods[-1], before[-1]
+            time += h
+            self.exact_ticks += h
+            if np.any(population.sortBySpeed() != np.arange(population.pop.shape[-1])):
+                self._orderMatrices()
+        return food.copy(), chemicals.copy()
+
+def compareDiscrete(world = None, ticks : int = 100, dt : int = 1, method : str = "rk4", **integrate_data) -> dict:
+    """
+    Exactness check of the integration against the per tick model, both run on copies of world
+    (World.fastForward and World.integrate, colonies don't decide). The integration is kept whatever
+    its error estimate (rtol defaults to inf, no fall back to stepping).
+
+    Return:\n
+        errors = (dict) {"decay" : (float), "pop" : (float), "components" : (float), "chemicals" : (float),
+                         "speed" : (float), "estimate" : (float)} max relative error of every quantity and the
+                         error estimate of GutODE, "decay" compares the closed form with ticks decays of the
+                         current chemicals
+    """
+    discrete = copy.deepcopy(world)
+    continuous = copy.deepcopy(world)
+    # per tick decay against the closed form
+    chemicals = world.agent.chemicals_array.copy()
+    for _ in range(ticks):
+        chemicals = chemicals*world.agent.chemical_decay_rate
+    closed = decayChemicals(world.agent.chemicals_array, world.agent.chemical_decay_rate, ticks)
+
+    discrete.fastForward(ticks=ticks)
+    integrate_data.setdefault("rtol", float("inf"))
+    estimate = continuous.integrate(ticks=ticks, dt=dt, method=method, **integrate_data)
+    def error(a, b):
+        a, b = np.asarray(a, dtype=float), np.asarray(b, dtype=float)
+        return float(np.max(np.abs(a - b)/np.maximum(np.abs(a), 1e-12), initial=0))
+    # colonies compared by id, both worlds sort their list
+    colonies = lambda w: sorted(w.bacterias, key=lambda bacteria: bacteria.id)
+    return {
+        "decay" : error(chemicals, closed),
+        "pop" : error([b.pop for b in colonies(discrete)], [b.pop for b in colonies(continuous)]),
+        "components" : error(discrete.agent.component_pop_array, continuous.agent.component_pop_array),
+        "chemicals" : error(discrete.agent.chemicals_array, continuous.agent.chemicals_array),
+        "speed" : error([b.speed for b in colonies(discrete)], [b.speed for b in colonies(continuous)]),
+        "estimate" : estimate,
+    }
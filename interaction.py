@@ -0,0 +1,193 @@
+import csv
+import json
+import re
+import sys
+import numpy as np
+
+# InteractionGraph class
+class InteractionGraph:
+    def __init__(self, ids : list = None, sources : list = None, targets : list = None,
+                 weights : list = None, strength : float = 1.0) -> None:
+        """
+        Sparse colony interaction matrix in CSR form (numpy only).\n
+        Row j holds the weights of the edges pointing at colony j, so matvec(x) gives for every
+        colony the weighted sum of x over the colonies acting on it. Memory is O(edges), never
+        O(colonies**2).
+
+        Parameters:\n
+            ids = (list) colony ids, position in the list is the node index\n
+            sources, targets = (list) colony ids of the edge ends\n
+            weights = (list) weight of every edge\n
+            strength = (float) scale of every weight\n
+        """
+        self.ids = list(ids)
+        self.size = len(self.ids)
+        node = {id : idx for idx, id in enumerate(self.ids)}
+        rows = np.array([node[target] for target in targets], dtype=np.int64)
+        cols = np.array([node[source] for source in sources], dtype=np.int64)
+        data = np.asarray(weights, dtype=float)*strength
+        keep = data != 0
+        rows, cols, data = rows[keep], cols[keep], data[keep]
+        order = np.lexsort((cols, rows))
+        # CSR arrays, rows keeps the row of every stored weight for matvec
+        self.rows = rows[order]
+        self.indices = cols[order]
+        self.data = data[order]
+        self.indptr = np.concatenate([[0], np.cumsum(np.bincount(self.rows, minlength=self.size))])
+
+    @property
+    def nnz(self) -> int:
+        return len(self.data)
+
+    def matvec(self, x : np.ndarray = None) -> np.ndarray:
+        """
+        Parameter:\n
+            x = (ndarray) (..., size) value of every colony, in ids order\n
+        Return:\n
+            y = (ndarray) (..., size) y[..., j] = sum of weight(i -> j)*x[..., i]
+        """
+        x = np.asarray(x, dtype=float)
+        flat = x.reshape(-1, self.size)
+        # one bincount over every (world, row) pair
+        bins = (self.rows[None, :] + self.size*np.arange(len(flat))[:, None]).ravel()
+        y = np.bincount(bins, weights=(flat[:, self.indices]*self.data).ravel(), minlength=len(flat)*self.size)
+        return y.reshape(x.shape)
+
+    def neighbours(self, idx : int = 0) -> tuple:
+        """
+        Colonies acting on colony idx.
+
+        Return:\n
+            indices = (ndarray) node index of the sources\n
+            weights = (ndarray) weight of every edge
+        """
+        start, end = self.indptr[idx], self.indptr[idx + 1]
+        return self.indices[start:end], self.data[start:end]
+
+    def effect(self, pop : np.ndarray = None, total_pop : np.ndarray = None, index : np.ndarray = None) -> np.ndarray:
+        """
+        Growth change of every colony from the others, weighted sum of their share of the total population.
+
+        Parameters:\n
+            pop = (ndarray) (..., size) colony population, in the current colony order\n
+            total_pop = (ndarray) (..., 1) total population\n
+            index = (ndarray) (..., size) node index of every colony in that order\n
+        Return:\n
+            effect = (ndarray) (..., size) in the same order as pop
+        """
+        share = np.zeros(np.shape(pop))
+        np.put_along_axis(share, index, pop/total_pop, axis=-1)
+        return np.take_along_axis(self.matvec(share), index, axis=-1)
+
+def _colonyId(name : str = None) -> int:
+    """
+    "bac12" -> 12
+    """
+    match = re.search(r"\d+$", name)
+    if match == None:
+        raise ValueError(f"no colony id in node name : {name}")
+    return int(match.group())
+
+def readEdges(filename : str = "./data/csv/Bacteria.csv") -> list:
+    """
+    Edge list of a Source,Target,Type,Weight csv, undirected edges give both directions.
+
+    Return:\n
+        edges = (list) [(source id, target id, weight, directed), ...] as written in the file
+    """
+    edges = []
+    with open(filename, newline="") as csvfile:
+        for row in csv.DictReader(csvfile):
+            directed = row.get("Type", "undirected").strip().lower() == "directed"
+            edges.append((_colonyId(row["Source"]), _colonyId(row["Target"]), float(row["Weight"]), directed))
+    return edges
+
+def loadInteractions(filename : str = "./data/csv/Bacteria.csv", ids : list = None, strength : float = 1.0,
+                     self_loops : bool = False) -> InteractionGraph:
+    """
+    InteractionGraph of the colonies ids from an edge list csv, edges of other colonies are dropped.
+
+    Parameters:\n
+        filename = (str) Source,Target,Type,Weight csv, nodes named like "bac1"\n
+        ids = (list) colony ids, None takes every node of the file\n
+        strength = (float) scale of every weight\n
+        self_loops = (bool) keep i -> i edges (the logistic term already is the self interaction)\n
+    """
+    edges = readEdges(filename)
+    if ids == None:
+        ids = sorted({id for source, target, _, _ in edges for id in (source, target)})
+    known = set(ids)
+    sources, targets, weights = [], [], []
+    for source, target, weight, directed in edges:
+        if source not in known or target not in known or (source == target and not self_loops):
+            continue
+        sources.append(source)
+        targets.append(target)
+        weights.append(weight)
+        if not directed and source != target:
+            sources.append(target)
+            targets.append(source)
+            weights.append(weight)
+    return InteractionGraph(ids=ids, sources=sources, targets=targets, weights=weights, strength=strength)
+
+# vis-network page, same layout as the pyvis export it replaces
+HTML_TEMPLATE = """<html>
+    <head>
+        <meta charset="utf-8">
+        <script src="lib/bindings/utils.js"></script>
+        <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/vis-network/9.1.2/dist/dist/vis-network.min.css" integrity="sha512-WgxfT5LWjfszlPHXRmBWHkV2eceiWTOBvrKCNbdgDYTHrT2AeLCGbF4sZlZw3UMN3WtL0tGUoIAKsu8mllg/XA==" crossorigin="anonymous" referrerpolicy="no-referrer" />
+        <script src="https://cdnjs.cloudflare.com/ajax/libs/vis-network/9.1.2/dist/vis-network.min.js" integrity="sha512-LnvoEWDFrqGHlHmDD2101OrLcbsfkrzoSpvtSQtxK3RMnRV0eOkhhBN2dXHKRrUU8p2DGRTk35n4O8nWSVe1mQ==" crossorigin="anonymous" referrerpolicy="no-referrer"></script>
+        <style type="text/css">
+             #mynetwork {
+                 width: 100%;
+                 height: 600px;
+                 background-color: #ffffff;
+                 border: 1px solid lightgray;
+                 position: relative;
+                 float: left;
+             }
+        </style>
+    </head>
+    <body>
+        <div class="card" style="width: 100%">
+            <div id="mynetwork" class="card-body"></div>
+        </div>
+        <script type="text/javascript">
+              var nodes = new vis.DataSet(__NODES__);
+              var edges = new vis.DataSet(__EDGES__);
+              var options = __OPTIONS__;
+              var network = new vis.Network(document.getElementById('mynetwork'), {nodes: nodes, edges: edges}, options);
+        </script>
+    </body>
+</html>
+"""
+
+HTML_OPTIONS = {
+    "configure" : {"enabled" : False},
+    "edges" : {"color" : {"inherit" : True}, "smooth" : {"enabled" : True, "type" : "dynamic"}},
+    "interaction" : {"dragNodes" : True, "hideEdgesOnDrag" : False, "hideNodesOnDrag" : False},
+    "physics" : {"enabled" : True, "stabilization" : {"enabled" : True, "fit" : True, "iterations" : 1000,
+                                                      "onlyDynamicEdges" : False, "updateInterval" : 50}},
+}
+
+def writeHtml(filename : str = "./data/csv/Bacteria.csv", html_file : str = "bacteria.html") -> None:
+    """
+    Rebuild the vis-network page of an edge list csv (every edge as written in the file).
+    """
+    edges = readEdges(filename)
+    ids = sorted({id for source, target, _, _ in edges for id in (source, target)})
+    nodes = [{"color" : "#97c2fc", "id" : f"bac{id}", "label" : f"bac{id}", "shape" : "dot", "size" : 10} for id in ids]
+    links = []
+    for source, target, weight, directed in edges:
+        link = {"Weight" : weight, "from" : f"bac{source}", "to" : f"bac{target}", "title" : f"{weight:g}", "width" : 1}
+        if directed:
+            link["arrows"] = "to"
+        links.append(link)
+    page = (HTML_TEMPLATE.replace("__NODES__", json.dumps(nodes))
+            .replace("__EDGES__", json.dumps(links))
+            .replace("__OPTIONS__", json.dumps(HTML_OPTIONS, indent=4)))
+    with open(html_file, "w") as file:
+        file.write(page)
+
+if __name__=="__main__":
+    writeHtml(*sys.argv[1:])
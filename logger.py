@@ -0,0 +1,201 @@
+import io
+import os
+import zipfile
+import numpy as np
+
+# RunLogger class
+class RunLogger:
+    def __init__(self, filename : str = None, no_bacteria : int = 5, component_list : list = None,
+                 chemical_list : list = None, file_format : str = None, chunk_size : int = 1000,
+                 verbosity : int = 2) -> None:
+        """
+        Buffered columnar log of a World run.\n
+        Every step is written into a preallocated row of an in memory array, full chunks are
+        flushed to the file in one go.
+
+        Parameters:\n
+            filename = (str) output file, eg : "001.csv"\n
+            no_bacteria = (int) Total varity of bacterias\n
+            component_list = (list) ["comp_1", ... ] List of component names\n
+            chemical_list = (list) ["chem_1", ... ] List of chemical names\n
+            file_format = (str) "csv", "parquet" or "npz", None picks it from the file extension\n
+            chunk_size = (int) rows kept in memory before a flush\n
+            verbosity = (int) 0 : no console output, 1 : one line per step, 2 : full dump of every step\n
+        """
+        if file_format == None:
+            file_format = os.path.splitext(filename)[1].lstrip(".") or "csv"
+        if file_format not in ("csv", "parquet", "npz"):
+            raise ValueError(f"unknown file_format : {file_format}")
+        self.filename = filename
+        self.no_bacteria = no_bacteria
+        self.component_list = component_list
+        self.chemical_list = chemical_list
+        self.file_format = file_format
+        self.chunk_size = chunk_size
+        self.verbosity = verbosity
+        self.header = self._header()
+        self.columns = np.zeros((chunk_size, len(self.header)))
+        self.rows = 0
+        self.chunks = 0
+        self._parquet_writer = None
+        if file_format == "parquet":
+            # optional dependency, fail before the run rather than at the first flush
+            import pyarrow.parquet
+        # start a fresh file
+        if file_format == "csv":
+            with open(filename, "w") as csvfile:
+                csvfile.write(",".join(self.header) + "\n")
+        elif os.path.exists(filename):
+            os.remove(filename)
+
+    def _header(self) -> list:
+        """
+        Column names built from the world config.
+        """
+        header = ["Time"]
+        for i in range(self.no_bacteria):
+            header += [f"B{i+1}_id", f"B{i+1}_pop", f"B{i+1}_speed", f"B{i+1}_reward"]
+        header += [f"{comp}_pop" for comp in self.component_list]
+        header += [f"{chem}_pop" for chem in self.chemical_list]
+        header += ["time_till_eat", "exploration", "reward", "action"]
+        return header
+
+    def record(self, world) -> None:
+        """
+        Log the current state of the world.
+
+        Parameter:\n
+            world = (World) world being simulated
+        """
+        row = self.columns[self.rows]
+        row[0] = world.time
+        col = 1
+        if world.population != None:
+            population = world.population
+            row[col:col + 4*self.no_bacteria] = np.stack([population.id, population.pop, population.speed, population.reward], axis=1).ravel()
+        else:
+            row[col:col + 4*self.no_bacteria] = [value for bacteria in world.bacterias
+                                                 for value in (bacteria.id, bacteria.pop, bacteria.speed, bacteria.reward)]
+        col += 4*self.no_bacteria
+        agent = world.agent
+        row[col:col + len(self.component_list)] = agent.component_pop_array
+        col += len(self.component_list)
+        row[col:col + len(self.chemical_list)] = agent.chemicals_array
+        col += len(self.chemical_list)
+        row[col:] = (agent.eat_time, agent.ai.exploration, agent.reward, agent.action)
+        self._print(world)
+
+        self.rows += 1
+        if self.rows == self.chunk_size:
+            self.flush()
+
+    def _print(self, world) -> None:
+        """
+        Console output of a step.
+        """
+        if self.verbosity == 0:
+            return
+        agent = world.agent
+        if self.verbosity == 1:
+            print(f"Time : {world.time} Exploration : {agent.ai.exploration} Reward : {agent.reward}")
+            return
+        print("############################################")
+        print(f"Time : {world.time}")
+        print("Bacterias:")
+        for bacteria in world.bacterias:
+            print("------------------------------")
+            print(f"id : {bacteria.id}")
+            print(f"population : {bacteria.pop}")
+            print(f"speed : {bacteria.speed}")
+            print(f"reward : {bacteria.reward}")
+        print("------------------------------")
+        print("Agent:")
+        print(f"Component in guts :{dict(agent.component_pop)}")
+        print(f"Chemicals in system: {dict(agent.chemicals)}")
+        print(f"Time till eat time : {agent.eat_time}")
+        print(f"Exploration : {agent.ai.exploration}")
+        print(f"Reward : {agent.reward}")
+        print("############################################")
+
+    def flush(self) -> None:
+        """
+        Write the buffered rows to the file.
+        """
+        if self.rows == 0:
+            return
+        chunk = self.columns[:self.rows]
+        if self.file_format == "csv":
+            with open(self.filename, "a") as csvfile:
+                np.savetxt(csvfile, chunk, delimiter=",", fmt="%.17g")
+        elif self.file_format == "npz":
+            # every chunk is one more .npy member of the zip, np.load(filename) reads them back
+            with zipfile.ZipFile(self.filename, "a") as npzfile:
+                if self.chunks == 0:
+                    self._writeArray(npzfile, "header", np.array(self.header))
+                self._writeArray(npzfile, f"chunk_{self.chunks:06d}", chunk)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.table({name : chunk[:, idx] for idx, name in enumerate(self.header)})
+            if self._parquet_writer == None:
+                self._parquet_writer = pq.ParquetWriter(self.filename, table.schema)
+            self._parquet_writer.write_table(table)
+        self.chunks += 1
+        self.rows = 0
+
+    def _writeArray(self, npzfile : zipfile.ZipFile = None, name : str = None, array : np.ndarray = None) -> None:
+        buffer = io.BytesIO()
+        np.lib.format.write_array(buffer, array)
+        npzfile.writestr(f"{name}.npy", buffer.getvalue())
+
+    def __getstate__(self) -> dict:
+        """
+        Pickle support (checkpoints) : the open parquet writer is dropped and the size of the
+        file is kept so reopen can cut off what was written after the checkpoint.
+        """
+        state = self.__dict__.copy()
+        state["_parquet_writer"] = None
+        state["_file_size"] = os.path.getsize(self.filename) if os.path.exists(self.filename) else 0
+        return state
+
+    def reopen(self) -> None:
+        """
+        Continue a log restored from a checkpoint, rows written after the checkpoint are dropped.
+        """
+        if self.file_format == "parquet" and self.chunks > 0:
+            raise ValueError("a parquet log can't be continued, use csv or npz for resumable runs")
+        if self.file_format == "csv":
+            with open(self.filename, "r+") as csvfile:
+                csvfile.truncate(self._file_size)
+        elif self.chunks > 0:
+            # keep the header and the chunks flushed before the checkpoint
+            names = ["header.npy"] + [f"chunk_{idx:06d}.npy" for idx in range(self.chunks)]
+            tmp_file = self.filename + ".tmp"
+            with zipfile.ZipFile(self.filename) as old, zipfile.ZipFile(tmp_file, "w") as new:
+                for name in names:
+                    new.writestr(name, old.read(name))
+            os.replace(tmp_file, self.filename)
+        elif os.path.exists(self.filename):
+            os.remove(self.filename)
+
+    def close(self) -> None:
+        """
+        Flush what is left and close the file.
+        """
+        self.flush()
+        if self._parquet_writer != None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+
+def loadNpzLog(filename : str = None) -> tuple:
+    """
+    Read a log written with file_format "npz".
+
+    Return:\n
+        (header, data) = (list, ndarray) column names and all logged rows
+    """
+    with np.load(filename) as npzfile:
+        header = list(npzfile["header"])
+        chunks = sorted(name for name in npzfile.files if name.startswith("chunk_"))
+        data = np.concatenate([npzfile[name] for name in chunks], axis=0)
+    return header, data
@@ -1,35 +1,69 @@
 from world import World
-from tqdm import tqdm
-import pandas as pd
-from plot import plotFig
-import csv
+import copy
 
-def start(data, total_time, filename):
+def start(data, total_time, filename, checkpoint_data : dict = None):
     # plot data
     world = World(**data)
-    createLogFile(filename)
-    
-    for time in range(total_time):
-        world.step(filename)
-
-def createLogFile(filename):
-    # field names 
-    fields = ['Time', 'B1_id', 'B1_pop', 'B1_speed', 'B1_reward',
-               'B2_id', 'B2_pop', 'B2_speed', 'B2_reward',
-               'comp1_pop', 'comp2_pop', 'comp3_pop', 'comp4_pop',
-               'chem1_pop', 'chem2_pop',
-               'time_till_eat', 'exploration', 'reward']
-        
-    # writing to csv file 
-    with open(filename, 'w') as csvfile: 
-        # creating a csv writer object 
-        csvwriter = csv.writer(csvfile)
-            
-        # writing the fields
-        csvwriter.writerow(fields)
 
-# main function
-def main():
+    return run(world, total_time, filename, checkpoint_data)
+
+def resume(checkpoint_file : str = "./data/checkpoint.ckpt", total_time : int = 2000, filename : str = None,
+           checkpoint_data : dict = None) -> dict:
+    """
+    Continue a run from its last checkpoint up to total_time steps.
+
+    Parameters:\n
+        checkpoint_file = (str) file written by a Checkpointer\n
+        total_time = (int) total steps of the run (steps before the checkpoint included)\n
+        filename = (str) log file, None keeps logging where the checkpointed run did\n
+        checkpoint_data = (dict) Checkpointer options, None keeps checkpointing to checkpoint_file
+    """
+    from checkpoint import loadCheckpoint
+    world = loadCheckpoint(checkpoint_file)
+    if filename == None and world.logger != None:
+        filename = world.logger.filename
+    checkpoint_data = {"filename" : checkpoint_file} if checkpoint_data == None else checkpoint_data
+
+    return run(world, total_time, filename, checkpoint_data)
+
+def run(world, total_time, filename, checkpoint_data : dict = None) -> dict:
+    """
+    Step world until world.time reaches total_time.
+
+    Parameters:\n
+        checkpoint_data = (dict) {"filename" : (str), "every" : (int), "compress_level" : (int)} Checkpointer options, None never checkpoints\n
+    """
+    checkpointer = None
+    if checkpoint_data != None:
+        from checkpoint import Checkpointer
+        checkpointer = Checkpointer(**checkpoint_data)
+
+    while world.time < total_time:
+        # quiet stretches are fast-forwarded, stopping on every checkpoint
+        stop = total_time
+        if checkpointer != None and checkpointer.every > 0:
+            stop = min(stop, (world.time//checkpointer.every + 1)*checkpointer.every)
+        world.advance(stop - world.time, filename)
+        if checkpointer != None and checkpointer.due(world):
+            checkpointer.save(world)
+        if world.stop_reason != None:
+            # converged, the rest of the run would repeat the steady state
+            break
+    if checkpointer != None:
+        checkpointer.wait()
+    if world.pipeline != None:
+        world.pipeline.close()
+    # write what is still buffered
+    world.closeLog()
+    if world.profiler != None:
+        world.profiler.save()
+
+    return world.summary()
+
+def defaultData() -> dict:
+    """
+    World data of the default two bacteria setup.
+    """
     # system
     bacteria_num = 2
     component_num = 4
@@ -91,13 +125,69 @@ def main():
             },
     }
 
+    return data
+
+def noLearningData(data : dict = None, policy : str = "random") -> dict:
+    """
+    Copy of data where the agent and every bacteria use a no-learning policy,
+    such a world never imports tensorflow.
+
+    Parameters:\n
+        data = (dict) World data\n
+        policy = (str) "random" or "scripted"\n
+    """
+    data = copy.deepcopy(data)
+    for AI_data in [data["agent_data"]["AI_data"]] + [bacteria["AI_data"] for bacteria in data["bacteria_data"]]:
+        if AI_data != None:
+            AI_data["NN_data"] = {"type" : policy}
+    return data
+
+def applyHyperParams(data : dict = None, kick_satisfaction : float = None, eat_time : int = None,
+                     learning_rate : float = None, alpha : float = None, gamma : float = None,
+                     exp_decay : float = None) -> dict:
+    """
+    Copy of data with the agent hyper parameters replaced (None keeps the value in data).
+
+    Parameters:\n
+        data = (dict) World data\n
+        kick_satisfaction = (float) agent kick_satisfaction\n
+        eat_time = (int) agent eat_default_time, rounded to a whole number of steps (at least 1)\n
+        learning_rate = (float) agent NN learning rate\n
+        alpha = (float) agent RL learning rate\n
+        gamma = (float) agent discount\n
+        exp_decay = (float) agent exploration_decay\n
+    """
+    data = copy.deepcopy(data)
+    agent_data = data["agent_data"]
+    if kick_satisfaction != None:
+        agent_data["kick_satisfaction"] = kick_satisfaction
+    if eat_time != None:
+        # the world counts eat_time down to exactly 0
+        agent_data["eat_default_time"] = max(int(round(eat_time)), 1)
+    for key, value in (("learning_rate", learning_rate), ("alpha", alpha), ("gamma", gamma), ("exploration_decay", exp_decay)):
+        if value != None:
+            agent_data["AI_data"][key] = value
+    return data
+
+# main function
+def main(kick_satisfaction : float = None, eat_time : int = None, learning_rate : float = None,
+         alpha : float = None, gamma : float = None, exp_decay : float = None,
+         total_time : int = 2000, filename : str = "001.csv", checkpoint_data : dict = None) -> float:
+    """
+    Run the default world, hyper parameters left as None keep their default.\n
+    checkpoint_data = (dict) Checkpointer options, eg : {"filename" : "./data/checkpoint.ckpt", "every" : 100}
+
+    Return:\n
+        total_reward = (float) agent reward summed over the run
+    """
+    data = applyHyperParams(defaultData(), kick_satisfaction=kick_satisfaction, eat_time=eat_time,
+                            learning_rate=learning_rate, alpha=alpha, gamma=gamma, exp_decay=exp_decay)
+
     # simulation start
-    total_time = 2000
-    filename = "001.csv"
-    start(data, total_time, filename)
-    
-    # system.agent.model.save("./data/model.h5")
+    summary = start(data, total_time, filename, checkpoint_data)
+
     print("done")
+    return summary["total_reward"]
 
 # Start
 if __name__=="__main__":
@@ -0,0 +1,255 @@
+import math
+import numpy as np
+
+# MetricsRecorder class
+class MetricsRecorder:
+    def __init__(self, bacteria_ids : list = None, component_list : list = None, chemical_list : list = None,
+                 action_size : int = 5, window : int = 1000, buckets : int = 512, chunk_size : int = 256,
+                 quantile_columns : list = ("reward",), relative_accuracy : float = 0.01) -> None:
+        """
+        Bounded memory metrics of a World run, for plots of runs of any length.\n
+        The last window steps are kept as they are in a float32 ring buffer. The whole run is kept
+        downsampled : at most buckets buckets of bucket_size steps with the min, max and mean of
+        every column (and the actions taken), two neighbouring buckets are merged and bucket_size
+        doubles whenever they are all full. Running mean / std of every column and a quantile sketch
+        of the quantile_columns are updated on the fly. Rows are folded into these aggregates
+        chunk_size at a time.
+
+        Parameters:\n
+            bacteria_ids = (list) colony ids, one "B<id>_pop" column each\n
+            component_list = (list) ["comp_1", ... ] List of component names\n
+            chemical_list = (list) ["chem_1", ... ] List of chemical names\n
+            action_size = (int) possible action size of the agent\n
+            window = (int) recent steps kept at full resolution\n
+            buckets = (int) max number of buckets of the downsampled history (even)\n
+            chunk_size = (int) steps folded into the aggregates at once (at most window)\n
+            quantile_columns = (list) columns with a quantile sketch\n
+            relative_accuracy = (float) relative error of the sketched quantiles\n
+        """
+        if buckets < 2 or buckets % 2 != 0:
+            raise ValueError(f"buckets must be even : {buckets}")
+        self.header = (["Time"] + [f"B{id}_pop" for id in bacteria_ids] + [f"{comp}_pop" for comp in component_list]
+                       + [f"{chem}_pop" for chem in chemical_list] + ["action", "reward"])
+        self.column_index = {name : idx for idx, name in enumerate(self.header)}
+        self.bacteria_ids = list(bacteria_ids)
+        self.action_size = action_size
+        self.window = window
+        self.chunk_size = min(chunk_size, window)
+        columns = len(self.header)
+        # recent rows, steps is the number of recorded steps and pending the ones not folded yet
+        self.recent = np.zeros((window, columns), dtype=np.float32)
+        self.steps = 0
+        self.pending = 0
+        # downsampled history, step k falls in bucket k//bucket_size
+        self.buckets = buckets
+        self.bucket_size = 1
+        self.bucket_min = np.full((buckets, columns), np.inf, dtype=np.float32)
+        self.bucket_max = np.full((buckets, columns), -np.inf, dtype=np.float32)
+        self.bucket_sum = np.zeros((buckets, columns))
+        self.bucket_count = np.zeros(buckets, dtype=np.int64)
+        self.bucket_actions = np.zeros((buckets, action_size), dtype=np.int64)
+        # running moments (Chan et al. parallel update)
+        self.count = 0
+        self.mean = np.zeros(columns)
+        self.m2 = np.zeros(columns)
+        self.sketches = {name : QuantileSketch(relative_accuracy=relative_accuracy) for name in quantile_columns}
+
+    def record(self, world) -> None:
+        """
+        Add the current state of the world.
+
+        Parameter:\n
+            world = (World) world being simulated
+        """
+        row = self.recent[self.steps % self.window]
+        row[0] = world.time
+        col = 1
+        if world.population != None:
+            population = world.population
+            # colonies are kept sorted by speed, columns are in id order
+            row[col:col + len(self.bacteria_ids)] = population.pop[np.argsort(population.id, kind="stable")]
+        else:
+            row[col:col + len(self.bacteria_ids)] = [bacteria.pop for bacteria in sorted(world.bacterias, key=lambda x: x.id)]
+        col += len(self.bacteria_ids)
+        agent = world.agent
+        row[col:col + len(agent.component_pop_array)] = agent.component_pop_array
+        col += len(agent.component_pop_array)
+        row[col:col + len(agent.chemicals_array)] = agent.chemicals_array
+        row[-2:] = (agent.action, agent.reward)
+        self.steps += 1
+        self.pending += 1
+        if self.pending == self.chunk_size:
+            self.fold()
+
+    def fold(self) -> None:
+        """
+        Fold the pending rows into the history, the moments and the sketches.
+        """
+        if self.pending == 0:
+            return
+        first = self.steps - self.pending
+        slots = np.arange(first, self.steps) % self.window
+        block = self.recent[slots]
+        self.pending = 0
+        # make room for the last step of the block
+        while (self.steps - 1)//self.bucket_size >= self.buckets:
+            self._compact()
+        # one segment per bucket touched by the block
+        index = np.arange(first, self.steps)//self.bucket_size
+        starts = np.flatnonzero(np.r_[True, index[1:] != index[:-1]])
+        touched = index[starts]
+        self.bucket_min[touched] = np.minimum(self.bucket_min[touched], np.minimum.reduceat(block, starts, axis=0))
+        self.bucket_max[touched] = np.maximum(self.bucket_max[touched], np.maximum.reduceat(block, starts, axis=0))
+        self.bucket_sum[touched] += np.add.reduceat(block.astype(float), starts, axis=0)
+        self.bucket_count[touched] += np.diff(np.r_[starts, len(block)])
+        actions = block[:, self.column_index["action"]].astype(np.int64)
+        np.add.at(self.bucket_actions, (index, actions), 1)
+        # merge the block moments into the running ones
+        values = block.astype(float)
+        count = len(values)
+        mean = values.mean(axis=0)
+        m2 = ((values - mean)**2).sum(axis=0)
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta*count/total
+        self.m2 += m2 + delta**2*self.count*count/total
+        self.count = total
+        for name, sketch in self.sketches.items():
+            sketch.addMany(values[:, self.column_index[name]])
+
+    def _compact(self) -> None:
+        """
+        Merge every pair of neighbouring buckets, bucket_size doubles.
+        """
+        half = self.buckets//2
+        for array, merge, empty in ((self.bucket_min, np.minimum, np.inf), (self.bucket_max, np.maximum, -np.inf),
+                                    (self.bucket_sum, np.add, 0), (self.bucket_count, np.add, 0),
+                                    (self.bucket_actions, np.add, 0)):
+            array[:half] = merge(array[0::2], array[1::2])
+            array[half:] = empty
+        self.bucket_size *= 2
+
+    def recentData(self) -> dict:
+        """
+        Full resolution rows of the last window steps, oldest first.
+
+        Return:\n
+            recent = (dict) {"column" : (ndarray) float32, ...}
+        """
+        kept = min(self.steps, self.window)
+        rows = self.recent[np.arange(self.steps - kept, self.steps) % self.window]
+        return {name : rows[:, idx] for idx, name in enumerate(self.header)}
+
+    def history(self) -> dict:
+        """
+        Downsampled whole run, one row per bucket.
+
+        Return:\n
+            history = (dict) {"time" : (ndarray) first step time of every bucket, "count" : (ndarray) steps in every bucket,
+                              "min", "max", "mean" : (dict) {"column" : (ndarray), ...}, "actions" : (ndarray) (buckets, action_size)}
+        """
+        self.fold()
+        used = self.bucket_count > 0
+        count = self.bucket_count[used]
+        mean = self.bucket_sum[used]/count[:, None]
+        history = {"time" : self.bucket_min[used, 0], "count" : count, "actions" : self.bucket_actions[used]}
+        for stat, rows in (("min", self.bucket_min[used]), ("max", self.bucket_max[used]), ("mean", mean)):
+            history[stat] = {name : rows[:, idx] for idx, name in enumerate(self.header)}
+        return history
+
+    def quantile(self, q : float = 0.5, column : str = "reward") -> float:
+        """
+        Sketched q quantile of a column over the whole run.
+        """
+        self.fold()
+        return self.sketches[column].quantile(q)
+
+    def summary(self, quantiles : tuple = (0.05, 0.25, 0.5, 0.75, 0.95)) -> dict:
+        """
+        Streaming summary of the whole run.
+
+        Return:\n
+            summary = (dict) {"steps" : (int), "mean" : (dict), "std" : (dict), "min" : (dict), "max" : (dict),
+                              "quantiles" : (dict) {"column" : {q : value, ...}, ...}}
+        """
+        self.fold()
+        std = np.sqrt(self.m2/self.count) if self.count > 0 else np.zeros(len(self.header))
+        used = self.bucket_count > 0
+        low, high = self.bucket_min[used].min(axis=0, initial=np.inf), self.bucket_max[used].max(axis=0, initial=-np.inf)
+        summary = {"steps" : self.steps}
+        for stat, values in (("mean", self.mean), ("std", std), ("min", low), ("max", high)):
+            summary[stat] = {name : float(values[idx]) for idx, name in enumerate(self.header)}
+        summary["quantiles"] = {name : {q : sketch.quantile(q) for q in quantiles} for name, sketch in self.sketches.items()}
+        return summary
+
+    def nbytes(self) -> int:
+        """
+        Memory held by the arrays, independent of the number of steps.
+        """
+        arrays = (self.recent, self.bucket_min, self.bucket_max, self.bucket_sum, self.bucket_count,
+                  self.bucket_actions, self.mean, self.m2)
+        return sum(array.nbytes for array in arrays) + sum(sketch.nbytes() for sketch in self.sketches.values())
+
+# QuantileSketch class
+class QuantileSketch:
+    def __init__(self, relative_accuracy : float = 0.01) -> None:
+        """
+        Relative error quantile sketch (DDSketch style) : values are counted in logarithmic bins,
+        so the memory grows with the log of the value range and never with the number of values.
+
+        Parameter:\n
+            relative_accuracy = (float) relative error of the returned quantiles\n
+        """
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy)/(1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        # bin key -> count of positive and negative (by magnitude) values
+        self.positive = {}
+        self.negative = {}
+        self.zeros = 0
+        self.count = 0
+
+    def addMany(self, values : np.ndarray = None) -> None:
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values)]
+        self.count += len(values)
+        # values too small for a log bin count as 0
+        tiny = np.abs(values) < 1e-300
+        self.zeros += int(tiny.sum())
+        for store, part in ((self.positive, values[(values > 0) & ~tiny]), (self.negative, -values[(values < 0) & ~tiny])):
+            if len(part) == 0:
+                continue
+            keys, counts = np.unique(np.ceil(np.log(part)/self.log_gamma).astype(np.int64), return_counts=True)
+            for key, count in zip(keys.tolist(), counts.tolist()):
+                store[key] = store.get(key, 0) + count
+
+    def add(self, value : float = 0) -> None:
+        self.addMany([value])
+
+    def _value(self, key : int = 0) -> float:
+        return 2*self.gamma**key/(self.gamma + 1)
+
+    def quantile(self, q : float = 0.5) -> float:
+        """
+        q quantile (0 <= q <= 1), nan while empty.
+        """
+        if self.count == 0:
+            return float("nan")
+        rank = q*(self.count - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._value(key)
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._value(key)
+        return self._value(max(self.positive))
+
+    def nbytes(self) -> int:
+        # a key and a count per bin
+        return 16*(len(self.positive) + len(self.negative))
@@ -0,0 +1,346 @@
+import collections
+import os
+import threading
+import numpy as np
+
+# ModelFactory class
+class ModelFactory:
+    def __init__(self, max_files : int = 8, pooled : bool = True) -> None:
+        """
+        Builds the keras models of the AIs.\n
+        The first model of an architecture, keyed by (type, state_size, action_size, extra, learning_rate),
+        is built and compiled once and shared : every AI gets a PooledModel holding its own fresh weights
+        and optimizer state, swapped into the shared model when the AI uses it. Building, compiling and
+        tracing the predict / train functions is done once per architecture instead of once per AI.\n
+        Model files are loaded once and kept in memory, the max_files most recently used ones are kept.
+
+        Parameters:\n
+            max_files = (int) loaded model files kept in memory\n
+            pooled = (bool) False gives every AI a keras model of its own (cloned from the config, slow for many AIs)\n
+        """
+        self.max_files = max_files
+        self.pooled = pooled
+        self.templates = {}
+        self.files = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def build(self, key : tuple = None, builder = None):
+        """
+        New model of the architecture key, with fresh weights.
+
+        Parameters:\n
+            key = (tuple) (type, state_size, action_size, extra, learning_rate)\n
+            builder = (function) builds and compiles the model, only called once per key\n
+        """
+        with self.lock:
+            shared = self.templates.get(key)
+            if shared == None:
+                shared = SharedModel(builder())
+                self.templates[key] = shared
+        if not self.pooled:
+            return self._clone(shared.model)
+        return PooledModel(shared=shared, weights=shared.freshWeights())
+
+    def load(self, model_loc : str = None):
+        """
+        New model with the architecture and weights stored in model_loc (the file is read once
+        while it stays among the max_files most recently used) and a fresh optimizer state.
+        """
+        import tensorflow as tf
+        # a rewritten file is loaded again
+        key = (os.path.abspath(model_loc), os.path.getmtime(model_loc))
+        with self.lock:
+            shared = self.files.pop(key, None)
+            if shared == None:
+                shared = SharedModel(tf.keras.models.load_model(model_loc))
+            self.files[key] = shared
+            while len(self.files) > self.max_files:
+                self.files.popitem(last=False)
+        if not self.pooled:
+            model = self._clone(shared.model)
+            model.set_weights(shared.initial_weights)
+            return model
+        return PooledModel(shared=shared, weights=[weights.copy() for weights in shared.initial_weights])
+
+    def _clone(self, model = None) -> "tf.keras.Model":
+        clone = model.__class__.from_config(model.get_config())
+        compile_config = model.get_compile_config()
+        if compile_config != None:
+            # deserializes a new optimizer, clones never share optimizer state
+            clone.compile_from_config(compile_config)
+        return clone
+
+    def clear(self) -> None:
+        """
+        Drop every template and loaded file (models already made keep theirs).
+        """
+        with self.lock:
+            self.templates.clear()
+            self.files.clear()
+
+# SharedModel class
+class SharedModel:
+    def __init__(self, model = None) -> None:
+        """
+        Compiled keras model shared by the PooledModels of one architecture, owner is the
+        PooledModel whose weights it currently holds.
+
+        Parameters:\n
+            model = (tf.keras.Model) built and compiled model\n
+        """
+        self.model = model
+        self.lock = threading.RLock()
+        self.owner = None
+        self.initial_weights = model.get_weights()
+        self.initializers = _initializers(model)
+        # traced read / write of every variable (rebuilt once the optimizer variables exist)
+        self._variables = None
+        self._read = None
+        self._write = None
+
+    def freshWeights(self) -> list:
+        """
+        New weights drawn from the initializers of the layers (weights without one copy the
+        initial weights of the model).
+        """
+        weights = []
+        with self.lock:
+            for (initializer, forget_units), initial in zip(self.initializers, self.initial_weights):
+                if initializer == None:
+                    weights.append(initial.copy())
+                    continue
+                config = initializer.get_config()
+                if "seed" in config:
+                    # a keras initializer draws the same values for the same seed, seeded from the numpy random state
+                    initializer = initializer.__class__.from_config(dict(config, seed=np.random.randint(2**31)))
+                value = np.array(initializer(initial.shape, dtype=str(initial.dtype)), dtype=initial.dtype)
+                if forget_units:
+                    # LSTM unit_forget_bias
+                    value[forget_units:2*forget_units] = 1
+                weights.append(value)
+        return weights
+
+    def optimizerVariables(self) -> list:
+        """
+        State variables of the optimizer (the learning rate is part of the architecture key),
+        empty until the first training step builds the optimizer.
+        """
+        return _optimizerVariables(self.model)
+
+    def _swapFunctions(self) -> tuple:
+        """
+        Variables (weights then optimizer state) with a read and a write of all of them in one traced call,
+        one eager op per variable made a swap cost more than the training step itself.
+        """
+        import tensorflow as tf
+        variables = list(self.model.weights) + self.optimizerVariables()
+        if self._variables == None or len(self._variables) != len(variables):
+            self._variables = variables
+            self._read = tf.function(lambda: [variable.value for variable in variables])
+            def write(values):
+                for variable, value in zip(variables, values):
+                    variable.value.assign(value)
+            self._write = tf.function(write)
+        return self._variables, self._read, self._write
+
+    def readVariables(self) -> tuple:
+        """
+        Return:\n
+            (weights, optimizer_state) = (tuple) lists of ndarrays, optimizer_state is empty before the first training step
+        """
+        variables, read, _ = self._swapFunctions()
+        values = [np.array(value) for value in read()]
+        no_weights = len(self.model.weights)
+        return values[:no_weights], values[no_weights:]
+
+    def writeVariables(self, weights : list = None, optimizer_state : list = None) -> None:
+        """
+        Load weights and optimizer state (None : fresh optimizer) into the model.
+        """
+        variables, _, write = self._swapFunctions()
+        if optimizer_state and len(variables) == len(weights):
+            # state restored from a checkpoint before any training step built the optimizer
+            self.model.optimizer.build(self.model.trainable_variables)
+            variables, _, write = self._swapFunctions()
+        state = variables[len(weights):]
+        if optimizer_state == None or len(optimizer_state) != len(state):
+            # fresh, or pulled before the optimizer was built
+            optimizer_state = [np.zeros(variable.shape, dtype=variable.dtype) for variable in state]
+        write(list(weights) + list(optimizer_state))
+
+# PooledModel class
+class PooledModel:
+    def __init__(self, shared : SharedModel = None, weights : list = None) -> None:
+        """
+        Model of one AI run on the SharedModel of its architecture : the AI keeps its own weights
+        and optimizer state, they are swapped into the shared model only when another AI used it
+        last. Same predict / fit / train_on_batch / get_weights / set_weights / save interface as a
+        keras model.
+
+        Parameters:\n
+            shared = (SharedModel) compiled model of the architecture\n
+            weights = (list) weights of this model\n
+        """
+        self.shared = shared
+        self._weights = weights
+        # None : fresh optimizer
+        self._optimizer_state = None
+        # the shared model holds newer weights than _weights
+        self._dirty = False
+
+    @property
+    def layers(self) -> list:
+        return self.shared.model.layers
+
+    def _acquire(self) -> None:
+        """
+        Make the shared model hold this model's weights and optimizer state, called with the lock held.
+        """
+        shared = self.shared
+        if shared.owner is self:
+            return
+        if shared.owner != None:
+            shared.owner._pull()
+        shared.writeVariables(weights=self._weights, optimizer_state=self._optimizer_state)
+        shared.owner = self
+
+    def _pull(self) -> None:
+        """
+        Copy back what training changed in the shared model, called with the lock held.
+        """
+        if self._dirty:
+            self._weights, self._optimizer_state = self.shared.readVariables()
+            self._dirty = False
+
+    def predict(self, *args, **kwargs) -> np.ndarray:
+        with self.shared.lock:
+            self._acquire()
+            return self.shared.model.predict(*args, **kwargs)
+
+    def predict_on_batch(self, *args, **kwargs) -> np.ndarray:
+        with self.shared.lock:
+            self._acquire()
+            return self.shared.model.predict_on_batch(*args, **kwargs)
+
+    def fit(self, *args, **kwargs):
+        with self.shared.lock:
+            self._acquire()
+            self._dirty = True
+            return self.shared.model.fit(*args, **kwargs)
+
+    def train_on_batch(self, *args, **kwargs):
+        with self.shared.lock:
+            self._acquire()
+            self._dirty = True
+            return self.shared.model.train_on_batch(*args, **kwargs)
+
+    def get_weights(self) -> list:
+        with self.shared.lock:
+            if self.shared.owner is self:
+                self._pull()
+            return [weights.copy() for weights in self._weights]
+
+    def set_weights(self, weights : list = None) -> None:
+        with self.shared.lock:
+            if self.shared.owner is self:
+                self._pull()
+                self.shared.model.set_weights(weights)
+            self._weights = [np.array(value) for value in weights]
+
+    def getState(self) -> dict:
+        """
+        Copy of the weights and optimizer state (None : fresh optimizer), see modelState.
+        """
+        with self.shared.lock:
+            if self.shared.owner is self:
+                self._pull()
+            optimizer_state = None if self._optimizer_state == None else [value.copy() for value in self._optimizer_state]
+            return {"weights" : [weights.copy() for weights in self._weights], "optimizer_state" : optimizer_state}
+
+    def setState(self, state : dict = None) -> None:
+        """
+        Inverse of getState.
+        """
+        with self.shared.lock:
+            self._weights = [np.array(value) for value in state["weights"]]
+            self._optimizer_state = state["optimizer_state"]
+            self._dirty = False
+            if self.shared.owner is self:
+                self.shared.writeVariables(weights=self._weights, optimizer_state=self._optimizer_state)
+
+    def save(self, *args, **kwargs) -> None:
+        """
+        Save as a keras model (architecture, weights and optimizer state).
+        """
+        with self.shared.lock:
+            self._acquire()
+            self.shared.model.save(*args, **kwargs)
+
+    def __deepcopy__(self, memo : dict = None) -> "PooledModel":
+        with self.shared.lock:
+            if self.shared.owner is self:
+                self._pull()
+            copy = PooledModel(shared=self.shared, weights=[weights.copy() for weights in self._weights])
+            if self._optimizer_state != None:
+                copy._optimizer_state = [value.copy() for value in self._optimizer_state]
+        return copy
+
+def modelState(model = None) -> dict:
+    """
+    In memory copy of the weights and optimizer state of a factory model (PooledModel or keras model),
+    cheap next to serializing the model, restored with setModelState on a model of the same architecture.
+
+    Return:\n
+        state = (dict) {"weights" : [(ndarray), ...], "optimizer_state" : [(ndarray), ...] or None before the first training step}
+    """
+    if isinstance(model, PooledModel):
+        return model.getState()
+    variables = _optimizerVariables(model)
+    return {"weights" : model.get_weights(),
+            "optimizer_state" : [np.array(variable.value) for variable in variables] if len(variables) > 0 else None}
+
+def setModelState(model = None, state : dict = None) -> None:
+    """
+    Load a modelState into model.
+    """
+    if isinstance(model, PooledModel):
+        model.setState(state)
+        return
+    model.set_weights(state["weights"])
+    if state["optimizer_state"] != None:
+        model.optimizer.build(model.trainable_variables)
+        for variable, value in zip(_optimizerVariables(model), state["optimizer_state"]):
+            variable.assign(value)
+
+def _optimizerVariables(model = None) -> list:
+    """
+    State variables of the optimizer of model (the learning rate is part of the architecture key),
+    empty until the first training step builds the optimizer.
+    """
+    optimizer = getattr(model, "optimizer", None)
+    if optimizer == None or not optimizer.built:
+        return []
+    return [variable for variable in optimizer.variables if not variable.path.endswith("learning_rate")]
+
+def _initializers(model = None) -> list:
+    """
+    (initializer, forget_units) of every weight of model in get_weights order, found on the layer
+    owning the weight (eg : kernel -> kernel_initializer), None when the layer has none.
+    """
+    owners = {}
+    for layer in model._flatten_layers(include_self=False):
+        for variable in layer._trainable_variables + layer._non_trainable_variables:
+            owners[id(variable)] = (layer, variable.name)
+    initializers = []
+    for variable in model.weights:
+        layer, name = owners.get(id(variable), (None, None))
+        attribute = "recurrent_initializer" if name == "recurrent_kernel" else f"{name}_initializer"
+        initializer = getattr(layer, attribute, None)
+        forget_units = 0
+        if name == "bias" and getattr(layer, "unit_forget_bias", False):
+            forget_units = layer.units
+        initializers.append((initializer if callable(initializer) else None, forget_units))
+    return initializers
+
+# factory used by every AI
+factory = ModelFactory()
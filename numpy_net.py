@@ -0,0 +1,57 @@
+import numpy as np
+
+# NumpyNet class
+class NumpyNet:
+    def __init__(self, model = None) -> None:
+        """
+        Numpy copy of a Sequential model made of Dense layers, used for inference only.
+
+        Parameters:\n
+            model = (tf.keras.Model) dense model to mirror\n
+        """
+        self.layers = []
+        for layer in model.layers:
+            if layer.__class__.__name__ != "Dense":
+                raise ValueError(f"numpy inference only supports Dense layers, got {layer.__class__.__name__}")
+            activation = layer.get_config()["activation"]
+            if activation not in ACTIVATIONS:
+                raise ValueError(f"unsupported activation : {activation}")
+            self.layers.append([None, None, activation])
+        self.sync(model)
+
+    def sync(self, model = None) -> None:
+        """
+        Copy the current weights of the model.
+
+        Parameters:\n
+            model = (tf.keras.Model) or (PooledModel) model mirrored in __init__\n
+        """
+        # kernel and bias of every Dense layer, in layer order
+        weights = model.get_weights()
+        for idx, layer in enumerate(self.layers):
+            layer[0] = np.array(weights[2*idx], dtype=np.float32)
+            layer[1] = np.array(weights[2*idx + 1], dtype=np.float32)
+
+    def predict(self, states : np.ndarray = None) -> np.ndarray:
+        """
+        Forward pass.
+
+        Parameters:\n
+            states = (ndarray) (batch, state_size)\n
+        Return:\n
+            q_values = (ndarray) (batch, action_size)\n
+        """
+        x = np.asarray(states, dtype=np.float32)
+        for weights, bias, activation in self.layers:
+            x = ACTIVATIONS[activation](x @ weights + bias)
+        return x
+
+def _softmax(x : np.ndarray) -> np.ndarray:
+    e = np.exp(x - np.max(x, axis=-1, keepdims=True))
+    return e/np.sum(e, axis=-1, keepdims=True)
+
+ACTIVATIONS = {
+    "linear" : lambda x : x,
+    "relu" : lambda x : np.maximum(x, 0),
+    "softmax" : _softmax,
+}
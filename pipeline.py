@@ -0,0 +1,215 @@
+import collections
+import copy
+import queue
+import threading
+import numpy as np
+
+# TrainPipeline class
+class TrainPipeline:
+    def __init__(self, staleness : int = 1) -> None:
+        """
+        Background trainer of the learners of a World.\n
+        train calls of the wrapped learners are queued to one worker thread (tensorflow and numpy
+        release the GIL, so training overlaps the simulation on a multi-core machine) while the
+        simulation decides with a copy of the weights. The worker publishes the weights once they
+        changed (every sync_every updates of an AI), the copy picks them up on its next decision
+        (double buffer).\n
+        endStep bounds the staleness : at time t every job queued before time t - staleness is done.
+        Runs are not bit-reproducible (the worker draws from the shared random state).
+
+        Parameter:\n
+            staleness = (int) steps the training may lag behind, 0 waits for the training of a step at its end\n
+        """
+        self.staleness = staleness
+        self.time = 0
+        self._setup()
+
+    def _setup(self) -> None:
+        self.jobs = queue.Queue()
+        # time of every queued job, oldest first (the worker runs them in order)
+        self.pending = collections.deque()
+        self.changed = threading.Condition()
+        self.error = None
+        self.thread = None
+
+    def wrap(self, learner = None):
+        """
+        PipelinedLearner of learner, learners without weights of their own (None, no-learning policies,
+        shared policy members) are returned as they are.
+        """
+        if learner == None or not (hasattr(learner, "_model") or isinstance(getattr(learner, "weights", None), np.ndarray)):
+            return learner
+        return PipelinedLearner(learner=learner, pipeline=self)
+
+    def submit(self, learner = None, method : str = "train", kwargs : dict = None) -> None:
+        """
+        Queue learner.learner.method(**kwargs), the arrays in kwargs must not change afterwards.
+        """
+        if self.thread == None:
+            self.thread = threading.Thread(target=self._work, daemon=True)
+            self.thread.start()
+        with self.changed:
+            self.pending.append(self.time)
+        self.jobs.put((learner, method, kwargs))
+
+    def _work(self) -> None:
+        while True:
+            job = self.jobs.get()
+            if job == None:
+                return
+            learner, method, kwargs = job
+            try:
+                getattr(learner.learner, method)(**kwargs)
+                learner._publish()
+            except Exception as error:
+                self.error = error
+            finally:
+                with self.changed:
+                    self.pending.popleft()
+                    self.changed.notify_all()
+
+    def _waitUntil(self, time : float = None) -> None:
+        """
+        Block until every job queued before time is done, re-raise a training error.
+        """
+        with self.changed:
+            while len(self.pending) > 0 and self.pending[0] < time:
+                self.changed.wait()
+        if self.error != None:
+            error, self.error = self.error, None
+            raise error
+
+    def endStep(self, time : int = 0) -> None:
+        """
+        Called by the world at the end of a step, time is the world time after the step.
+        """
+        self.time = time
+        self._waitUntil(time - self.staleness)
+
+    def drain(self) -> None:
+        """
+        Block until every queued job is done.
+        """
+        self._waitUntil(float("inf"))
+
+    def close(self) -> None:
+        """
+        Finish the queued jobs and stop the worker.
+        """
+        self.drain()
+        if self.thread != None:
+            self.jobs.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def __getstate__(self) -> dict:
+        """
+        Pickle support (checkpoints, drain first) : the worker is started again on the next job.
+        """
+        return {"staleness" : self.staleness, "time" : self.time}
+
+    def __setstate__(self, state : dict) -> None:
+        self.__dict__.update(state)
+        self._setup()
+
+# PipelinedLearner class
+class PipelinedLearner:
+    def __init__(self, learner = None, pipeline : TrainPipeline = None) -> None:
+        """
+        Learner trained by a TrainPipeline, decisions use a copy of its weights.
+
+        Parameters:\n
+            learner = (AI) or (TileQ) learner trained in the background\n
+            pipeline = (TrainPipeline) pipeline running the training\n
+        """
+        if hasattr(learner, "_model"):
+            # build a lazy model first so both copies start from the same weights
+            learner.model
+        self.learner = learner
+        self.pipeline = pipeline
+        self.acting = copy.deepcopy(learner)
+        self.published = None
+        # weight updates of learner already handed to the acting copy
+        self.published_updates = getattr(learner, "updates", 0)
+        self.lock = threading.Lock()
+
+    @property
+    def exploration(self) -> float:
+        return self.acting.exploration
+
+    @exploration.setter
+    def exploration(self, value : float) -> None:
+        self.acting.exploration = value
+
+    @property
+    def action_size(self) -> int:
+        return self.acting.action_size
+
+    def _publish(self) -> None:
+        """
+        Worker side : hand the trained weights to the acting copy, an AI only every sync_every
+        weight updates (a job that only fills the replay buffer changes nothing).
+        """
+        updates = getattr(self.learner, "updates", None)
+        if updates != None:
+            if updates - self.published_updates < getattr(self.learner, "sync_every", 1):
+                return
+            self.published_updates = updates
+        weights = _getWeights(self.learner)
+        with self.lock:
+            self.published = weights
+
+    def _refresh(self) -> None:
+        """
+        Simulation side : take the last published weights.
+        """
+        with self.lock:
+            weights, self.published = self.published, None
+        if weights != None:
+            _setWeights(self.acting, weights)
+
+    def decide(self, state : np.ndarray = None) -> int:
+        self._refresh()
+        return self.acting.decide(state)
+
+    def _actBatch(self, states : np.ndarray = None) -> np.ndarray:
+        self._refresh()
+        return self.acting._actBatch(states)
+
+    def train(self, reward : float = 0, state : np.ndarray = None,
+              next_state : np.ndarray = None, action : int = 0) -> None:
+        """
+        Queue a train call, the states are copied (history windows are views that keep changing).
+        """
+        self.pipeline.submit(self, "train", {"reward" : reward, "state" : np.array(state), "next_state" : np.array(next_state),
+                                             "action" : action})
+
+    def trainBatch(self, rewards : np.ndarray = None, states : np.ndarray = None,
+                   next_states : np.ndarray = None, actions : np.ndarray = None) -> None:
+        self.pipeline.submit(self, "trainBatch", {"rewards" : np.array(rewards), "states" : np.array(states),
+                                                  "next_states" : np.array(next_states), "actions" : np.array(actions)})
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state : dict) -> None:
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+def _getWeights(learner = None) -> list:
+    """
+    Copy of the weights of an AI (keras model) or a TileQ.
+    """
+    if isinstance(getattr(learner, "weights", None), np.ndarray):
+        return [learner.weights.copy()]
+    return learner.model.get_weights()
+
+def _setWeights(learner = None, weights : list = None) -> None:
+    if isinstance(getattr(learner, "weights", None), np.ndarray):
+        learner.weights = weights[0]
+        return
+    learner.model.set_weights(weights)
+    if learner.numpy_model != None:
+        learner.numpy_model.sync(learner.model)
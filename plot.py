@@ -1,89 +1,295 @@
+import glob
+import multiprocessing
+import os
+import sys
+import matplotlib
+# headless, figures are only ever saved to files
+matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 
-def main():
-    filename = "001.csv"
-    df = pd.read_csv(filename)
-    print(df['B1_speed'])
-    # plt.plot(df['B1_speed'])
-    # plt.plot(df['B2_speed'])
-    # plt.show()
-
-    # df['B1_reward'].plot()
-    # df['B2_reward'].plot()
-    # df['reward'].plot()
-    # plt.show()
-    # plot speed
-    
-    # plot reward
+def main(path : str = "001.csv"):
+    # one log or a whole directory of logs
+    if os.path.isdir(path):
+        for save_locs in plotDirectory(path):
+            print(save_locs)
+    else:
+        print(plotLog(path))
 
-if __name__=="__main__":
-    main()
+def foodPerTurn(actions, action_size, turns : int = 10) -> np.ndarray:
+    """
+    How often each action was taken in every block of turns steps (an incomplete last block is dropped).
+
+    Parameters:\n
+        actions = (list) action of every step\n
+        action_size = (int) possible action size\n
+        turns = (int) steps in a block\n
+    Return:\n
+        food_per_turn = (ndarray) (len(actions)//turns, action_size)
+    """
+    actions = np.asarray(actions, dtype=int)
+    no_turns = len(actions)//turns
+    # bin of (block, action) pair
+    bins = np.repeat(np.arange(no_turns)*action_size, turns) + actions[:no_turns*turns]
+    return np.bincount(bins, minlength=no_turns*action_size).reshape(no_turns, action_size)
 
 def plotFig(bacteria_num, chemical_num, food_num, plot_time, plot_bacteria_pop, data,
-             plot_component_pop, plot_chemical_pop, total_time, action_size, plot_food_pop, plot_reward):
-    # bacteria plot
-    labels = [f"Bacteria{i+1}" for i in range(bacteria_num)]
-    xlabel = "Time"
-    ylabel = "Bacteria population"
-    title = "Bacteria population"
-    save_loc = f"./data/bacteriaPlot_bacterianum{bacteria_num}_chemicalnum{chemical_num}_foodnum{food_num}.png"
-    plotStack(plot_time, plot_bacteria_pop, xlabel, ylabel, title, labels, save_loc)
-    # food plot
-    labels = data["component_list"]
-    xlabel = "Time"
-    ylabel = "Component amount"
-    title = "Component amount"
-    save_loc = f"./data/componentPlot_bacterianum{bacteria_num}_chemicalnum{chemical_num}_foodnum{food_num}.png"
-    plotStack(plot_time, plot_component_pop, xlabel, ylabel, title, labels, save_loc)
-    # # chem plot
-    labels = data["chemical_list"]
-    xlabel = "Time"
-    ylabel = "Chemical amount"
-    title = "Chemical amount"
-    save_loc = f"./data/chemicalPlot_bacterianum{bacteria_num}_chemicalnum{chemical_num}_foodnum{food_num}.png"
-    plotStack(plot_time, plot_chemical_pop, xlabel, ylabel, title, labels, save_loc)
-    # # chem plot
-    xlabel = "Time"
-    ylabel = "Reward amount"
-    title = "Reward amount"
-    save_loc = f"./data/rewardPlot_bacterianum{bacteria_num}_chemicalnum{chemical_num}_foodnum{food_num}.png"
-    plotNormal(plot_time, plot_reward, xlabel, ylabel, title, save_loc)
-    # food/action plot
-    turns = 10
-    food_per_turn = np.zeros((total_time//turns, action_size))
-    for turn, actions in enumerate(food_per_turn):
-        for action, value in enumerate(actions):
-            startIdx = turn*turns
-            endIdx = startIdx + turns
-            food_per_turn[turn][action] = plot_food_pop[startIdx:endIdx].count(action)
-    labels = data["food_list"]
-    xlabel = "Time"
-    ylabel = f"Food in last {turns} turn"
-    title = "Food consumption"
-    save_loc = f"./data/foodPlot_bacterianum{bacteria_num}_chemicalnum{chemical_num}_foodnum{food_num}.png"
-    # plot_time = np.linspace(0, total_time, total_time//turns)
-    # plotStack(plot_time, food_per_turn, xlabel, ylabel, title, labels, save_loc)
-    print(food_per_turn)
+             plot_component_pop, plot_chemical_pop, total_time, action_size, plot_food_pop, plot_reward,
+             save_dir : str = "./data"):
+    suffix = f"bacterianum{bacteria_num}_chemicalnum{chemical_num}_foodnum{food_num}"
+    # one figure reused for every plot
+    fig, ax = plt.subplots()
+    try:
+        # bacteria plot
+        labels = [f"Bacteria{i+1}" for i in range(bacteria_num)]
+        save_loc = os.path.join(save_dir, f"bacteriaPlot_{suffix}.png")
+        plotStack(plot_time, plot_bacteria_pop, "Time", "Bacteria population", "Bacteria population", labels, save_loc, ax)
+        # food plot
+        save_loc = os.path.join(save_dir, f"componentPlot_{suffix}.png")
+        plotStack(plot_time, plot_component_pop, "Time", "Component amount", "Component amount", data["component_list"], save_loc, ax)
+        # chem plot
+        save_loc = os.path.join(save_dir, f"chemicalPlot_{suffix}.png")
+        plotStack(plot_time, plot_chemical_pop, "Time", "Chemical amount", "Chemical amount", data["chemical_list"], save_loc, ax)
+        # reward plot
+        save_loc = os.path.join(save_dir, f"rewardPlot_{suffix}.png")
+        plotNormal(plot_time, plot_reward, "Time", "Reward amount", "Reward amount", save_loc, ax)
+        # food/action plot
+        turns = 10
+        food_per_turn = foodPerTurn(plot_food_pop[:total_time], action_size, turns)
+        save_loc = os.path.join(save_dir, f"foodPlot_{suffix}.png")
+        plotStack(np.arange(len(food_per_turn))*turns, food_per_turn.T, "Time", f"Food in last {turns} turn",
+                  "Food consumption", data["food_list"], save_loc, ax)
+    finally:
+        plt.close(fig)
+    return food_per_turn
+
+def logHeader(filename : str = None) -> list:
+    """
+    Column names of a RunLogger log, read without loading its rows.
+    """
+    extension = os.path.splitext(filename)[1]
+    if extension == ".npz":
+        with np.load(filename) as npzfile:
+            return list(npzfile["header"])
+    if extension == ".parquet":
+        import pyarrow.parquet as pq
+        return list(pq.read_schema(filename).names)
+    return list(pd.read_csv(filename, nrows=0).columns)
+
+def iterLog(filename : str = None, columns : list = None, chunksize : int = 100000):
+    """
+    Some columns of a RunLogger log, one block of rows at a time.
+
+    Parameters:\n
+        filename = (str) .csv, .npz or .parquet log\n
+        columns = (list) column names, None reads every column\n
+        chunksize = (int) csv and parquet rows read at once (npz logs are read one written chunk at a time)\n
+    Return:\n
+        blocks = (generator) (ndarray) (rows, len(columns)) float arrays in columns order
+    """
+    header = logHeader(filename)
+    columns = header if columns == None else list(columns)
+    extension = os.path.splitext(filename)[1]
+    if extension == ".npz":
+        index = [header.index(name) for name in columns]
+        with np.load(filename) as npzfile:
+            for name in sorted(name for name in npzfile.files if name.startswith("chunk_")):
+                yield npzfile[name][:, index]
+    elif extension == ".parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(filename).iter_batches(batch_size=chunksize, columns=columns):
+            yield np.stack([batch.column(name).to_numpy() for name in columns], axis=1).astype(np.float64)
+    else:
+        for chunk in pd.read_csv(filename, usecols=columns, chunksize=chunksize, dtype=np.float64):
+            yield chunk[columns].to_numpy()
+
+def readLog(filename : str = None, columns : list = None, chunksize : int = 100000, every : int = 1) -> dict:
+    """
+    Read some columns of a RunLogger log as float arrays.\n
+    The log is read chunksize rows at a time, so only the kept columns (and rows) are ever held in memory.
+
+    Parameters:\n
+        filename = (str) .csv, .npz or .parquet log\n
+        columns = (list) column names, None reads every column\n
+        chunksize = (int) rows parsed at once\n
+        every = (int) keep one row in every (thins long runs)\n
+    Return:\n
+        log = (dict) {"column" : (ndarray), ...}
+    """
+    columns = logHeader(filename) if columns == None else list(columns)
+    parts = []
+    start = 0
+    for block in iterLog(filename, columns=columns, chunksize=chunksize):
+        # global row index of the first row kept in this block
+        first = (-start) % every
+        parts.append(block[first::every])
+        start += len(block)
+    data = np.concatenate(parts, axis=0) if len(parts) > 0 else np.zeros((0, len(columns)))
+    return {name : data[:, idx] for idx, name in enumerate(columns)}
+
+def foodPerTurnLog(filename : str = None, turns : int = 10, chunksize : int = 100000) -> np.ndarray:
+    """
+    foodPerTurn of the action column of a log, counted chunk by chunk (the unfinished turn of a
+    chunk is carried over to the next one), so only the counts are held in memory.
+
+    Return:\n
+        food_per_turn = (ndarray) (rows//turns, max action + 1)
+    """
+    counts = []
+    carry = np.zeros(0, dtype=int)
+    action_size = 0
+    for block in iterLog(filename, columns=["action"], chunksize=chunksize):
+        actions = np.concatenate([carry, block[:, 0].astype(int)])
+        no_turns = len(actions)//turns
+        carry = actions[no_turns*turns:]
+        if no_turns == 0:
+            continue
+        action_size = max(action_size, int(actions.max()) + 1)
+        counts.append(foodPerTurn(actions[:no_turns*turns], int(actions[:no_turns*turns].max()) + 1, turns))
+    # chunks that never saw the highest actions have fewer columns
+    counts = [np.pad(count, ((0, 0), (0, action_size - count.shape[1]))) for count in counts]
+    return np.concatenate(counts, axis=0) if len(counts) > 0 else np.zeros((0, action_size), dtype=int)
+
+def plotLog(filename : str = None, save_dir : str = None, turns : int = 10, every : int = 1,
+            chunksize : int = 100000) -> list:
+    """
+    Render the plots of a RunLogger log (bacteria, component, chemical, reward and food per turn).\n
+    The log is streamed : the line plots only hold every every-th row of the columns they draw and
+    the food plot only holds the counts of every turn.
+
+    Parameters:\n
+        filename = (str) log file\n
+        save_dir = (str) directory of the pngs, None puts them next to the log\n
+        turns = (int) steps in a block of the food plot\n
+        every = (int) keep one row in every for the line plots\n
+        chunksize = (int) rows read at once\n
+    Return:\n
+        save_locs = (list) png files written
+    """
+    save_dir = os.path.dirname(os.path.abspath(filename)) if save_dir == None else save_dir
+    name = os.path.splitext(os.path.basename(filename))[0]
+    # column groups from the RunLogger header
+    header = logHeader(filename)
+    bacteria = sorted([column for column in header if column.startswith("B") and column.endswith("_pop")],
+                      key=lambda column: int(column[1:-4]))
+    chemicals = [column for column in header if column.startswith("chem")]
+    components = [column for column in header if column.endswith("_pop") and column not in bacteria and column not in chemicals]
+    log = readLog(filename, columns=["Time"] + bacteria + components + chemicals + ["reward"], chunksize=chunksize, every=every)
+    time = log["Time"]
+    save_locs = []
+    fig, ax = plt.subplots()
+    try:
+        for title, ylabel, group in (("Bacteria population", "Bacteria population", bacteria),
+                                     ("Component amount", "Component amount", components),
+                                     ("Chemical amount", "Chemical amount", chemicals)):
+            save_loc = os.path.join(save_dir, f"{name}_{title.split()[0].lower()}.png")
+            plotStack(time, [log[column] for column in group], "Time", ylabel, title,
+                      [column[:-4] for column in group], save_loc, ax)
+            save_locs.append(save_loc)
+        save_loc = os.path.join(save_dir, f"{name}_reward.png")
+        plotNormal(time, log["reward"], "Time", "Reward amount", "Reward amount", save_loc, ax)
+        save_locs.append(save_loc)
+        if "action" in header:
+            food_per_turn = foodPerTurnLog(filename, turns, chunksize)
+            save_loc = os.path.join(save_dir, f"{name}_food.png")
+            plotStack(np.arange(len(food_per_turn))*turns, food_per_turn.T, "Time", f"Food in last {turns} turn",
+                      "Food consumption", [f"Food{i+1}" for i in range(food_per_turn.shape[1])], save_loc, ax)
+            save_locs.append(save_loc)
+    finally:
+        plt.close(fig)
+    return save_locs
+
+def plotMetrics(metrics = None, save_dir : str = "./data", name : str = "metrics") -> list:
+    """
+    Render the plots of a MetricsRecorder from its downsampled history (one point per bucket), the
+    reward plot shows the bucket mean between the bucket min and max.
+
+    Parameters:\n
+        metrics = (MetricsRecorder) recorder of a run (world.metrics)\n
+        save_dir = (str) directory of the pngs\n
+        name = (str) prefix of the png files\n
+    Return:\n
+        save_locs = (list) png files written
+    """
+    history = metrics.history()
+    mean = history["mean"]
+    time = history["time"]
+    bacteria = [column for column in metrics.header if column.startswith("B") and column.endswith("_pop")]
+    chemicals = [column for column in metrics.header if column.startswith("chem")]
+    components = [column for column in metrics.header[1:-2] if column not in bacteria and column not in chemicals]
+    save_locs = []
+    fig, ax = plt.subplots()
+    try:
+        for title, group in (("Bacteria population", bacteria), ("Component amount", components), ("Chemical amount", chemicals)):
+            save_loc = os.path.join(save_dir, f"{name}_{title.split()[0].lower()}.png")
+            plotStack(time, [mean[column] for column in group], "Time", title, title, [column[:-4] for column in group], save_loc, ax)
+            save_locs.append(save_loc)
+        ax.clear()
+        ax.fill_between(time, history["min"]["reward"], history["max"]["reward"], alpha=0.3, label="min - max")
+        ax.plot(time, mean["reward"], label="mean")
+        save_loc = os.path.join(save_dir, f"{name}_reward.png")
+        showPlot("Time", "Reward amount", "Reward amount", save_loc, ax)
+        save_locs.append(save_loc)
+        # share of every food in a bucket
+        food_share = history["actions"]/history["count"][:, None]
+        save_loc = os.path.join(save_dir, f"{name}_food.png")
+        plotStack(time, food_share.T, "Time", f"Food share in {metrics.bucket_size} turn", "Food consumption",
+                  [f"Food{i+1}" for i in range(food_share.shape[1])], save_loc, ax)
+        save_locs.append(save_loc)
+    finally:
+        plt.close(fig)
+    return save_locs
+
+def _plotLogJob(job : dict = None) -> list:
+    return plotLog(**job)
+
+def plotDirectory(directory : str = "./data/runs", save_dir : str = None, pattern : str = "*.csv",
+                  processes : int = None, **kwargs) -> list:
+    """
+    Render every log of a directory, one log per worker process.
+
+    Parameters:\n
+        directory = (str) directory of the logs\n
+        save_dir = (str) directory of the pngs, None puts them next to the logs\n
+        pattern = (str) glob of the log files\n
+        processes = (int) number of workers, None uses every core\n
+        kwargs = plotLog options\n
+    Return:\n
+        save_locs = (list) [(list) png files of a log, ...]
+    """
+    jobs = [dict(kwargs, filename=filename, save_dir=save_dir) for filename in sorted(glob.glob(os.path.join(directory, pattern)))]
+    if len(jobs) == 0:
+        return []
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(processes=min(processes or os.cpu_count(), len(jobs))) as pool:
+        return pool.map(_plotLogJob, jobs, chunksize=1)
 
 # Stack plotting graphs
-def plotStack(x, y, xlabel, ylabel, title, labels, save_loc):
+def plotStack(x, y, xlabel, ylabel, title, labels, save_loc, ax = None):
+    ax = plt.gca() if ax == None else ax
+    ax.clear()
     # Stackplot with X, Y, colors value
-    plt.stackplot(x, y, labels=labels)
-    showPlot(xlabel, ylabel, title, save_loc)
+    ax.stackplot(x, y, labels=labels)
+    showPlot(xlabel, ylabel, title, save_loc, ax)
 
-def plotNormal(x, y, xlabel, ylabel, title, save_loc):
-    plt.plot(x, y)
-    showPlot(xlabel, ylabel, title, save_loc)
+def plotNormal(x, y, xlabel, ylabel, title, save_loc, ax = None):
+    ax = plt.gca() if ax == None else ax
+    ax.clear()
+    ax.plot(x, y)
+    showPlot(xlabel, ylabel, title, save_loc, ax)
 
-def showPlot(xlabel, ylabel, title, save_loc):
-    plt.xlabel(xlabel)
+def showPlot(xlabel, ylabel, title, save_loc, ax = None):
+    ax = plt.gca() if ax == None else ax
+    ax.set_xlabel(xlabel)
     # No of hours
-    plt.ylabel(ylabel)
+    ax.set_ylabel(ylabel)
     # Title of Graph
-    plt.title(title)
-    plt.legend()
-    # Displaying Graph
-    plt.savefig(save_loc)
-    plt.show()
\ No newline at end of file
+    ax.set_title(title)
+    if len(ax.get_legend_handles_labels()[0]) > 0:
+        ax.legend()
+    # saved, never shown (Agg backend)
+    ax.figure.savefig(save_loc)
+
+if __name__=="__main__":
+    main(*sys.argv[1:])
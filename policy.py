@@ -0,0 +1,63 @@
+import numpy as np
+
+# RandomPolicy class
+class RandomPolicy:
+    def __init__(self, state_size : int = 5, action_size : int = 5, exploration : float = 1.0,
+                 exploration_decay : float = 0.94, NN_data : dict = None, **kwargs) -> None:
+        """
+        No-learning policy that picks actions uniformly at random.\n
+        Has the AI decide/train interface, learning parameters in AI_data are ignored.
+
+        Parameters:\n
+            state_size = (int) size of the state (unused)\n
+            action_size = (int) possible action size\n
+            exploration = (float) kept and decayed only so logs look the same as with an AI\n
+            exploration_decay = (float) rate of exploration decay\n
+            NN_data = (dict) {"type" : "random"}\n
+        """
+        self.state_size = state_size
+        self.action_size = action_size
+        self.exploration = exploration
+        self.exploration_decay = exploration_decay
+
+    def decide(self, state : np.ndarray = None) -> int:
+        """
+        Random action.
+        """
+        self.exploration *= self.exploration_decay
+        return np.random.randint(self.action_size)
+
+    def train(self, reward : float = 0, state : np.ndarray = None,
+              next_state : np.ndarray = None, action : int = 0) -> None:
+        """
+        Nothing to learn.
+        """
+        return
+
+# ScriptedPolicy class
+class ScriptedPolicy(RandomPolicy):
+    def __init__(self, state_size : int = 5, action_size : int = 5, exploration : float = 0.0,
+                 exploration_decay : float = 0.94, NN_data : dict = None, **kwargs) -> None:
+        """
+        No-learning policy that repeats a fixed sequence of actions.
+
+        Parameters:\n
+            state_size = (int) size of the state (unused)\n
+            action_size = (int) possible action size\n
+            exploration = (float) kept only so logs look the same as with an AI\n
+            exploration_decay = (float) rate of exploration decay\n
+            NN_data = (dict) {"type" : "scripted", "actions" : [(int), ... ]} actions taken in turn, default 0, 1, ...\n
+        """
+        super().__init__(state_size=state_size, action_size=action_size, exploration=exploration,
+                         exploration_decay=exploration_decay, NN_data=NN_data)
+        self.actions = NN_data.get("actions", list(range(action_size)))
+        self.turn = 0
+
+    def decide(self, state : np.ndarray = None) -> int:
+        """
+        Next action of the script.
+        """
+        action = self.actions[self.turn % len(self.actions)]
+        self.turn += 1
+        self.exploration *= self.exploration_decay
+        return action
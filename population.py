@@ -0,0 +1,207 @@
+import numpy as np
+
+# Population class
+class Population:
+    def __init__(self, bacterias : list = None, component_list : list = None,
+                 chemical_list : list = None, food_access : str = "sequential") -> None:
+        """
+        Struct-of-arrays view of all bacteria colonies.\n
+        Every per colony quantity is kept as a numpy array (one row per colony, in the
+        order of the bacterias list) so a whole step is done with batched array ops.
+
+        Parameters:\n
+            bacterias = (list) [(Bacteria), ... ] colonies, the objects keep owning their AI\n
+            component_list = (list) ["comp_1", ... ] List of component names\n
+            chemical_list = (list) ["chem_1", ... ] List of chemical names\n
+            food_access = (str) "sequential" : colonies eat one after the other in speed order (same as Bacteria.growth)\n
+                                "shared" : every colony sees the food available at the start of the step\n
+        """
+        if food_access not in ("sequential", "shared"):
+            raise ValueError(f"unknown food_access : {food_access}")
+        self.bacterias = bacterias
+        self.component_list = component_list
+        self.chemical_list = chemical_list
+        self.food_access = food_access
+        self.no_bacteria = len(bacterias)
+        comp_index = {comp : idx for idx, comp in enumerate(component_list)}
+        chem_index = {chem : idx for idx, chem in enumerate(chemical_list)}
+        # per colony scalars
+        self.id = np.array([bacteria.id for bacteria in bacterias])
+        # position of the colony in the original bacterias list
+        self.index = np.arange(self.no_bacteria)
+        self.pop = np.array([bacteria.pop for bacteria in bacterias], dtype=float)
+        self.pre_pop = np.array([bacteria.pre_pop for bacteria in bacterias], dtype=float)
+        self.speed = np.array([bacteria.speed for bacteria in bacterias], dtype=float)
+        self.eat_rate = np.array([bacteria.eat_rate for bacteria in bacterias], dtype=float)
+        self.chemical_produce_rate = np.array([bacteria.chemical_produce_rate for bacteria in bacterias], dtype=float)
+        self.increased_production_rate = np.array([bacteria.increased_chemical_production_rate for bacteria in bacterias], dtype=float)
+        self.reward = np.array([bacteria.reward for bacteria in bacterias], dtype=float)
+        self.action = np.array([bacteria.action for bacteria in bacterias], dtype=int)
+        self.has_ai = np.array([bacteria.ai != None for bacteria in bacterias], dtype=bool)
+        # InteractionGraph between colonies (node index = index), None : colonies only interact through food and chemicals
+        self.interaction = None
+        # comp_like matrix, the mask marks components listed in comp_like (even with a 0 rate)
+        self.comp_like = np.zeros((self.no_bacteria, len(component_list)))
+        self.comp_mask = np.zeros((self.no_bacteria, len(component_list)), dtype=bool)
+        # chemical_produce matrix (1 where produced) and action -> chemical index table
+        max_produce = max([len(bacteria.chemical_produce) for bacteria in bacterias] + [1])
+        self.chemical_produce = np.zeros((self.no_bacteria, len(chemical_list)))
+        self.produce_idx = np.zeros((self.no_bacteria, max_produce), dtype=int)
+        # chemical_inducer matrix
+        self.chemical_inducer = np.zeros((self.no_bacteria, len(chemical_list)))
+        for i, bacteria in enumerate(bacterias):
+            for comp, rate in bacteria.comp_like.items():
+                self.comp_like[i, comp_index[comp]] = rate
+                self.comp_mask[i, comp_index[comp]] = True
+            for j, chemical in enumerate(bacteria.chemical_produce):
+                self.chemical_produce[i, chem_index[chemical]] = 1
+                self.produce_idx[i, j] = chem_index[chemical]
+            for chemical, value in bacteria.chemical_inducer.items():
+                self.chemical_inducer[i, chem_index[chemical]] = value
+
+    # per colony arrays, (..., no_bacteria) and (..., no_bacteria, n) shaped
+    COLONY_ARRAYS = ("id", "index", "pop", "pre_pop", "speed", "eat_rate", "chemical_produce_rate",
+                     "increased_production_rate", "reward", "action", "has_ai")
+    MATRIX_ARRAYS = ("comp_like", "comp_mask", "chemical_produce", "produce_idx", "chemical_inducer")
+
+    def tile(self, no_worlds : int = 1):
+        """
+        Copy of the population repeated over a leading world axis, every array gets shape
+        (no_worlds, no_bacteria, ...). The copy has no Bacteria objects.
+
+        Parameter:\n
+            no_worlds = (int) number of independent worlds
+        """
+        population = Population.__new__(Population)
+        population.__dict__.update(self.__dict__)
+        population.bacterias = None
+        for name in self.COLONY_ARRAYS + self.MATRIX_ARRAYS:
+            array = getattr(self, name)
+            setattr(population, name, np.repeat(array[None], no_worlds, axis=0))
+        return population
+
+    def adopt(self, other = None) -> None:
+        """
+        Take the arrays of other, a copy of this population advanced on its own (see World.integrate),
+        the bacterias list follows its colony order.
+
+        Parameter:\n
+            other = (Population) copy made with copy.copy
+        """
+        for name in self.COLONY_ARRAYS + self.MATRIX_ARRAYS:
+            setattr(self, name, getattr(other, name))
+        if self.bacterias != None:
+            by_id = {bacteria.id : bacteria for bacteria in self.bacterias}
+            self.bacterias[:] = [by_id[id] for id in self.id.tolist()]
+
+    def sortBySpeed(self) -> np.ndarray:
+        """
+        Reorder colonies by decreasing speed (stable, same as sorting the bacterias list).
+
+        Return:\n
+            order = (ndarray) permutation applied to the colonies
+        """
+        order = np.argsort(-self.speed, axis=-1, kind="stable")
+        if np.all(order[..., :-1] < order[..., 1:]):
+            # already in speed order
+            return order
+        for name in self.COLONY_ARRAYS:
+            setattr(self, name, np.take_along_axis(getattr(self, name), order, axis=-1))
+        for name in self.MATRIX_ARRAYS:
+            setattr(self, name, np.take_along_axis(getattr(self, name), order[..., None], axis=-2))
+        if self.bacterias != None:
+            self.bacterias[:] = [self.bacterias[idx] for idx in order]
+        return order
+
+    def growth(self, comp_pop : np.ndarray = None) -> tuple:
+        """
+        Logistic growth of every colony, same model as Bacteria.growth.\n
+        Consumption only ever removes food and the pool is clipped at 0, so the pool seen by
+        colony i is max(pool - (food eaten by colonies before i), 0); a cumulative sum over the
+        colonies gives it for all of them at once.
+
+        Parameter:\n
+            comp_pop = (ndarray) (..., no_components) amount of each component in gut\n
+        Return:\n
+            comp_pop = (ndarray) component amount after every colony has eaten\n
+            snapshots = (ndarray) (..., no_bacteria + 1, no_components) pool before each colony ate, last row is the final pool\n
+        """
+        # summed left to right like sum() over the colonies
+        total_bacteria_pop = np.cumsum(self.pop, axis=-1)[..., -1:]
+        consumed = self.comp_mask*(self.pop*self.eat_rate)[..., None]
+        if self.food_access == "sequential":
+            snapshots = np.cumsum(np.concatenate([comp_pop[..., None, :], -consumed], axis=-2), axis=-2)
+            snapshots = np.maximum(snapshots, 0)
+        else:
+            final = np.maximum(comp_pop - np.sum(consumed, axis=-2), 0)
+            seen = np.repeat(comp_pop[..., None, :], self.pop.shape[-1], axis=-2)
+            snapshots = np.concatenate([seen, final[..., None, :]], axis=-2)
+        seen = snapshots[..., :-1, :]
+        # summed left to right (cumsum) as in the per colony loop
+        start_food = np.full(self.pop.shape + (1,), 0.01)
+        total_food = np.cumsum(np.concatenate([start_food, seen*self.comp_like], axis=-1), axis=-1)[..., -1]
+        access_to_food = self.pop/total_bacteria_pop
+        capacity = access_to_food*total_food/self.eat_rate
+        change_pop = self.eat_rate*self.pop*(1 - self.pop/capacity)
+        if self.interaction != None:
+            # one sparse mat-vec over the population shares
+            change_pop = change_pop + self.eat_rate*self.pop*self.interaction.effect(self.pop, total_bacteria_pop, self.index)
+
+        self.pre_pop = self.pop
+        # set to minimum of 0.01 to show that bacteria is never completely gone
+        self.pop = np.maximum(self.pop + change_pop, 0.01)
+
+        return snapshots[..., -1, :].copy(), snapshots
+
+    def produceChemicals(self, actions : np.ndarray = None) -> np.ndarray:
+        """
+        Chemicals produced by every colony.
+
+        Parameter:\n
+            actions = (ndarray) (..., no_bacteria) action of each colony, ignored for colonies without ai\n
+        Return:\n
+            produced = (ndarray) (..., no_bacteria, no_chemical) amount produced by each colony
+        """
+        rate = self.chemical_produce*self.chemical_produce_rate[..., None]
+        if actions is not None:
+            self.action = np.asarray(actions, dtype=int)
+            idx = np.take_along_axis(self.produce_idx, self.action[..., None], axis=-1)
+            increase = np.where(self.has_ai, self.increased_production_rate, 0)[..., None]
+            np.put_along_axis(rate, idx, np.take_along_axis(rate, idx, axis=-1) + increase, axis=-1)
+        return self.pop[..., None]*rate
+
+    def reactToChemical(self, chemicals : np.ndarray = None, produced : np.ndarray = None) -> np.ndarray:
+        """
+        Add the produced chemicals to the gut and change colony speed based on inducer chemicals.\n
+        As in the per colony loop each colony reacts to the chemicals produced by itself and the
+        colonies before it.
+
+        Parameters:\n
+            chemicals = (ndarray) (..., no_chemical) chemicals in the gut before production\n
+            produced = (ndarray) (..., no_bacteria, no_chemical) output of produceChemicals\n
+        Return:\n
+            chemicals = (ndarray) (..., no_chemical) chemicals in the gut after production
+        """
+        seen = np.cumsum(np.concatenate([chemicals[..., None, :], produced], axis=-2), axis=-2)
+        induced = np.concatenate([self.speed[..., None], seen[..., 1:, :]*self.chemical_inducer], axis=-1)
+        self.speed = np.cumsum(induced, axis=-1)[..., -1]
+
+        return seen[..., -1, :]
+
+    def findReward(self) -> np.ndarray:
+        """
+        Reward of every colony is its change in population.
+        """
+        self.reward = self.pop - self.pre_pop
+        return self.reward
+
+    def syncBacteria(self) -> None:
+        """
+        Write the array state back to the Bacteria objects (used for logging).
+        """
+        for i, bacteria in enumerate(self.bacterias):
+            bacteria.pop = float(self.pop[i])
+            bacteria.pre_pop = float(self.pre_pop[i])
+            bacteria.speed = float(self.speed[i])
+            bacteria.reward = float(self.reward[i])
+            bacteria.action = int(self.action[i])
@@ -0,0 +1,191 @@
+import array
+import collections
+import json
+import time
+import numpy as np
+
+# World methods timed by attach, (owner attribute, method, phase)
+WORLD_PHASES = [
+    (None, "step", "World.step"),
+    (None, "fastForward", "World.fastForward"),
+    (None, "integrate", "World.integrate"),
+    (None, "_log", "World._log"),
+    ("agent", "setCurrState", "Agent.setCurrState"),
+    (None, "_sortBacteria", "World._sortBacteria"),
+    (None, "agentAct", "World.agentAct"),
+    (None, "bacteriaAct", "World.bacteriaAct"),
+    ("agent", "setNextState", "Agent.setNextState"),
+    (None, "agentTrain", "World.agentTrain"),
+    ("agent", "decayChemicals", "Agent.decayChemicals"),
+]
+
+# learner model methods, (method, phase)
+MODEL_PHASES = [
+    ("predict", "AI.predict"),
+    ("predict_on_batch", "AI.predict"),
+    ("fit", "AI.fit"),
+    ("train_on_batch", "AI.fit"),
+]
+
+# Profiler class
+class Profiler:
+    def __init__(self, trace : bool = False, trace_file : str = None, folded_file : str = None) -> None:
+        """
+        Opt-in timers around the phases of World.step and the predict/fit calls of every learner.\n
+        attach replaces the methods of the given instances by timed versions and detach puts the
+        originals back, a world without a profiler runs exactly the original code.
+
+        Parameters:\n
+            trace = (bool) also keep the start of every call, needed for the trace files\n
+            trace_file = (str) Chrome trace (chrome://tracing, Perfetto) written by save\n
+            folded_file = (str) folded stacks (flamegraph.pl, speedscope) written by save\n
+        """
+        self.trace = trace or trace_file != None or folded_file != None
+        self.trace_file = trace_file
+        self.folded_file = folded_file
+        # phase -> durations (seconds)
+        self.samples = collections.defaultdict(lambda: array.array("d"))
+        self.counters = collections.Counter()
+        # call stack of phases, nested calls make folded stacks
+        self.stack = []
+        # (stack, start, duration) of every call when tracing
+        self.events = []
+        self.origin = time.perf_counter()
+        # (obj, method) pairs currently wrapped
+        self.wrapped = []
+
+    def wrap(self, obj = None, method : str = None, phase : str = None) -> None:
+        """
+        Replace obj.method by a timed version on the instance (an instance is wrapped once per method).
+        """
+        if obj == None or not hasattr(obj, method) or any(other is obj and name == method for other, name in self.wrapped):
+            return
+        func = getattr(obj, method)
+        samples = self.samples[phase]
+        stack = self.stack
+        events = self.events if self.trace else None
+        def timed(*args, **kwargs):
+            stack.append(phase)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                duration = time.perf_counter() - start
+                samples.append(duration)
+                if events != None:
+                    events.append((";".join(stack), start, duration))
+                stack.pop()
+        object.__setattr__(obj, method, timed)
+        self.wrapped.append((obj, method))
+
+    def attach(self, world = None) -> "Profiler":
+        """
+        Time the step phases of world and the predict/fit calls of its learners.
+        """
+        for owner, method, phase in WORLD_PHASES:
+            self.wrap(world if owner == None else getattr(world, owner), method, phase)
+        for ai in [world.agent.ai] + [bacteria.ai for bacteria in world.bacterias]:
+            # shared policy members time their shared AI
+            ai = getattr(ai, "policy", ai)
+            ai = getattr(ai, "ai", ai)
+            # pipelined learners are timed on the simulation side only
+            ai = getattr(ai, "acting", ai)
+            for method, phase in MODEL_PHASES:
+                self.wrap(getattr(ai, "model", None), method, phase)
+            self.wrap(getattr(ai, "numpy_model", None), "predict", "AI.predict")
+        world.profiler = self
+        return self
+
+    def detach(self) -> None:
+        """
+        Put the original methods back (the collected stats are kept).
+        """
+        for obj, method in self.wrapped:
+            # the timed version lives in the instance dict, removing it uncovers the class method
+            object.__delattr__(obj, method)
+        self.wrapped = []
+
+    def count(self, name : str = None, value : float = 1) -> None:
+        """
+        Add value to a named counter.
+        """
+        self.counters[name] += value
+
+    def reset(self) -> None:
+        """
+        Forget every sample, counter and event.
+        """
+        for samples in self.samples.values():
+            del samples[:]
+        self.counters.clear()
+        self.events.clear()
+
+    def stats(self) -> dict:
+        """
+        Return:\n
+            stats = (dict) {"phase" : {"count" : (int), "total", "mean", "p50", "p99", "max" : (float) seconds}, ...,
+                            "counters" : (dict) {"name" : value, ...}}
+        """
+        stats = {}
+        for phase, samples in self.samples.items():
+            if len(samples) == 0:
+                continue
+            samples = np.frombuffer(samples, dtype=float)
+            p50, p99 = np.percentile(samples, [50, 99])
+            stats[phase] = {"count" : len(samples), "total" : float(samples.sum()), "mean" : float(samples.mean()),
+                            "p50" : float(p50), "p99" : float(p99), "max" : float(samples.max())}
+        stats["counters"] = dict(self.counters)
+        return stats
+
+    def writeChromeTrace(self, filename : str = None) -> None:
+        """
+        Complete ("X") events of every traced call, times in microseconds.
+        """
+        events = [{"name" : stack.rsplit(";", 1)[-1], "ph" : "X", "pid" : 0, "tid" : 0,
+                   "ts" : (start - self.origin)*1e6, "dur" : duration*1e6}
+                  for stack, start, duration in self.events]
+        with open(filename, "w") as file:
+            json.dump({"traceEvents" : events, "displayTimeUnit" : "ms"}, file)
+
+    def writeFolded(self, filename : str = None) -> None:
+        """
+        Folded stacks ("World.step;World.bacteriaAct;AI.fit <microseconds>") of the self time of every stack.
+        """
+        inclusive = collections.defaultdict(float)
+        for stack, _, duration in self.events:
+            inclusive[stack] += duration
+        self_time = dict(inclusive)
+        for stack, duration in inclusive.items():
+            if ";" in stack:
+                parent = stack.rsplit(";", 1)[0]
+                if parent in self_time:
+                    self_time[parent] -= duration
+        with open(filename, "w") as file:
+            for stack, duration in sorted(self_time.items()):
+                file.write(f"{stack} {max(int(round(duration*1e6)), 0)}\n")
+
+    def save(self) -> None:
+        """
+        Write the trace files given in __init__.
+        """
+        if self.trace_file != None:
+            self.writeChromeTrace(self.trace_file)
+        if self.folded_file != None:
+            self.writeFolded(self.folded_file)
+
+    def __getstate__(self) -> dict:
+        """
+        Pickle support (checkpoints) : the stats are kept, the profiler has to be attached again.
+        """
+        state = self.__dict__.copy()
+        state["samples"] = {phase : samples.tolist() for phase, samples in self.samples.items()}
+        state["stack"] = []
+        state["wrapped"] = []
+        return state
+
+    def __setstate__(self, state : dict) -> None:
+        samples = collections.defaultdict(lambda: array.array("d"))
+        for phase, values in state["samples"].items():
+            samples[phase].extend(values)
+        state["samples"] = samples
+        self.__dict__.update(state)
@@ -0,0 +1,56 @@
+import numpy as np
+
+# ReplayBuffer class
+class ReplayBuffer:
+    def __init__(self, capacity : int = 10000, state_shape : tuple = (5,)) -> None:
+        """
+        Preallocated ring buffer of (state, action, reward, next_state) transitions.
+
+        Parameters:\n
+            capacity = (int) max number of transitions kept, the oldest is overwritten first\n
+            state_shape = (tuple) shape of a single state, (state_size,) or (lstm_memory, state_size)\n
+        """
+        self.capacity = capacity
+        self.state_shape = tuple(state_shape)
+        self.states = np.zeros((capacity,) + self.state_shape)
+        self.next_states = np.zeros((capacity,) + self.state_shape)
+        self.actions = np.zeros(capacity, dtype=int)
+        self.rewards = np.zeros(capacity)
+        # next slot to write and number of filled slots
+        self.idx = 0
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def add(self, states : np.ndarray = None, actions : np.ndarray = None,
+            rewards : np.ndarray = None, next_states : np.ndarray = None) -> None:
+        """
+        Store a batch of transitions.
+
+        Parameters:\n
+            states = (ndarray) (batch, *state_shape) states before action\n
+            actions = (ndarray) (batch,) actions taken\n
+            rewards = (ndarray) (batch,) rewards received\n
+            next_states = (ndarray) (batch, *state_shape) states after action\n
+        """
+        actions = np.atleast_1d(actions)
+        slots = (self.idx + np.arange(len(actions))) % self.capacity
+        self.states[slots] = np.reshape(states, (len(actions),) + self.state_shape)
+        self.next_states[slots] = np.reshape(next_states, (len(actions),) + self.state_shape)
+        self.actions[slots] = actions
+        self.rewards[slots] = rewards
+        self.idx = (self.idx + len(actions)) % self.capacity
+        self.size = min(self.size + len(actions), self.capacity)
+
+    def sample(self, batch_size : int = 32) -> tuple:
+        """
+        Sample transitions uniformly (with replacement).
+
+        Parameter:\n
+            batch_size = (int) number of transitions\n
+        Return:\n
+            (states, actions, rewards, next_states) = (tuple) of ndarrays
+        """
+        slots = np.random.randint(self.size, size=batch_size)
+        return self.states[slots], self.actions[slots], self.rewards[slots], self.next_states[slots]
@@ -0,0 +1,145 @@
+import copy
+import csv
+import itertools
+import multiprocessing
+import os
+import random
+import time
+import numpy as np
+
+def expandGrid(data : dict = None, grid : dict = None) -> list:
+    """
+    All combinations of a parameter grid applied on top of a base config.
+
+    Parameters:\n
+        data = (dict) base World data, eg : main.defaultData()\n
+        grid = (dict) {"agent_data.kick_satisfaction" : [10, 50], "engine" : ["vector"], ...}
+               dotted keys go into nested dicts, integer parts index lists ("bacteria_data.0.pop")\n
+    Return:\n
+        configs = (list) [(dict) {"name" : (str), "params" : (dict), "data" : (dict)}, ...]
+    """
+    keys = list(grid.keys())
+    configs = []
+    for idx, values in enumerate(itertools.product(*[grid[key] for key in keys])):
+        config = copy.deepcopy(data)
+        for key, value in zip(keys, values):
+            setPath(config, key, value)
+        configs.append({"name" : f"run{idx:03d}", "params" : dict(zip(keys, values)), "data" : config})
+    return configs
+
+def setPath(data : dict = None, key : str = None, value = None) -> None:
+    """
+    Set data["a"]["b"] for key "a.b" (integer parts index lists).
+    """
+    *parents, last = key.split(".")
+    for part in parents:
+        data = data[int(part)] if isinstance(data, list) else data[part]
+    if isinstance(data, list):
+        data[int(last)] = value
+    else:
+        data[last] = value
+
+def _needsTF(data : dict = None) -> bool:
+    """
+    True when some AI of the config is tensorflow backed.
+    """
+    AI_datas = [data["agent_data"]["AI_data"]] + [bacteria.get("AI_data") for bacteria in data["bacteria_data"]]
+    return any(AI_data != None and AI_data["NN_data"]["type"] not in ("random", "scripted", "tabular", "linear")
+               for AI_data in AI_datas)
+
+def _initWorker() -> None:
+    """
+    Process pool initializer : one intra-op thread per worker so workers don't fight over cores.
+    """
+    os.environ["TF_NUM_INTRAOP_THREADS"] = "1"
+    os.environ["TF_NUM_INTEROP_THREADS"] = "1"
+    os.environ["OMP_NUM_THREADS"] = "1"
+    os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "3")
+
+def seedAll(seed : int = 0, tensorflow : bool = False) -> None:
+    """
+    Seed python, numpy and (if it is used) tensorflow.
+    """
+    random.seed(seed)
+    np.random.seed(seed)
+    if tensorflow:
+        import tensorflow as tf
+        try:
+            tf.config.threading.set_intra_op_parallelism_threads(1)
+            tf.config.threading.set_inter_op_parallelism_threads(1)
+        except RuntimeError:
+            # already initialized by an earlier run of this worker
+            pass
+        tf.random.set_seed(seed)
+
+def runOne(job : dict = None) -> dict:
+    """
+    Run one (config, seed) pair, used inside the worker processes.
+
+    Parameter:\n
+        job = (dict) {"name" : (str), "params" : (dict), "data" : (dict), "seed" : (int), "total_time" : (int), "filename" : (str)}\n
+    Return:\n
+        row = (dict) params, seed, output file, wall time and World.summary() of the run
+    """
+    from main import start
+    data = copy.deepcopy(job["data"])
+    # workers never dump every step to the console
+    data["log_data"] = dict({"verbosity" : 0}, **data.get("log_data", {}))
+    seedAll(job["seed"], tensorflow=_needsTF(data))
+    start_time = time.perf_counter()
+    summary = start(data, job["total_time"], job["filename"])
+    row = {"name" : job["name"], "seed" : job["seed"], "filename" : job["filename"],
+           "wall" : time.perf_counter() - start_time}
+    row.update(job["params"])
+    row.update(summary)
+    return row
+
+def runExperiments(configs : list = None, seeds : list = None, total_time : int = 2000,
+                   output_dir : str = "./data/runs", processes : int = None) -> list:
+    """
+    Fan a list of configs x seeds out over a process pool.
+
+    Parameters:\n
+        configs = (list) [(dict) World data, ...] or output of expandGrid\n
+        seeds = (list) [(int), ...] seeds run for every config\n
+        total_time = (int) steps of every run\n
+        output_dir = (str) every run logs to output_dir/<name>_seed<seed>.csv, the table goes to summary.csv\n
+        processes = (int) number of workers, None uses every core\n
+    Return:\n
+        table = (list) [(dict) row, ...] one row per run, see runOne
+    """
+    seeds = [0] if seeds == None else seeds
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = []
+    for idx, config in enumerate(configs):
+        if "data" not in config:
+            config = {"name" : f"run{idx:03d}", "params" : {}, "data" : config}
+        for seed in seeds:
+            filename = os.path.join(output_dir, f"{config['name']}_seed{seed}.csv")
+            jobs.append(dict(config, seed=seed, total_time=total_time, filename=filename))
+
+    # spawn so workers don't inherit an initialized tensorflow
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(processes=processes, initializer=_initWorker) as pool:
+        table = pool.map(runOne, jobs, chunksize=1)
+
+    writeTable(table, os.path.join(output_dir, "summary.csv"))
+    return table
+
+def writeTable(table : list = None, filename : str = None) -> None:
+    """
+    Write a list of row dicts as csv.
+    """
+    fields = []
+    for row in table:
+        fields += [key for key in row if key not in fields]
+    with open(filename, "w", newline="") as csvfile:
+        csvwriter = csv.DictWriter(csvfile, fieldnames=fields)
+        csvwriter.writeheader()
+        csvwriter.writerows(table)
+
+if __name__=="__main__":
+    from main import defaultData
+    configs = expandGrid(defaultData(), {"agent_data.kick_satisfaction" : [10, 50], "agent_data.eat_default_time" : [5, 10]})
+    for row in runExperiments(configs, seeds=[0, 1], total_time=200):
+        print(row["name"], row["seed"], row["total_reward"], row["wall"])
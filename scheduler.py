@@ -0,0 +1,86 @@
+import heapq
+
+# kinds of timed events a World consumes
+EVENT_KINDS = ("meal", "dose", "colony", "knockdown")
+
+# Scheduler class
+class Scheduler:
+    def __init__(self, meal_interval = 10, first_meal : int = None, events : list = None) -> None:
+        """
+        Priority queue of the timed events of a World.\n
+        Events are kept in a heap ordered by (time, insertion order), the world pops the events
+        due at every step and can fast-forward the ticks in between. After each meal the next one
+        is scheduled meal_interval ticks later.
+
+        Parameters:\n
+            meal_interval = (int) ticks between meals, or (function) interval(world) -> (int) for variable or learned intervals\n
+            first_meal = (int) time of the first meal, None is one interval after time 0\n
+            events = (list) [(dict) {"time" : (int), "kind" : (str), ...}, ...] other events, see push\n
+        """
+        self.meal_interval = meal_interval
+        self.heap = []
+        # insertion counter, events of the same time pop in the order they were pushed
+        self.count = 0
+        self.next_meal = None
+        self.scheduleMeal(self.interval() if first_meal == None else first_meal)
+        for event in events or []:
+            event = dict(event)
+            self.push(time=event.pop("time"), kind=event.pop("kind"), **event)
+
+    def push(self, time : int = 0, kind : str = "dose", **data) -> None:
+        """
+        Add an event.
+
+        Parameters:\n
+            time = (int) step the event happens at\n
+            kind = (str) "meal" : the agent eats (an extra meal, the regular ones are scheduled by scheduleMeal)\n
+                         "dose" : {"chemicals" : (dict) {"chem_1" : (float) amount, ...}, "components" : (dict) {"comp_1" : (float) amount, ...}} added to the gut\n
+                         "colony" : {"id" : (int), "pop" : (float)} colony id is introduced (pop added to it)\n
+                         "knockdown" : {"factor" : (float), "ids" : (list)} antibiotic, pop of the colonies ids (None : all) multiplied by factor\n
+        """
+        if kind not in EVENT_KINDS:
+            raise ValueError(f"unknown event kind : {kind}")
+        heapq.heappush(self.heap, (int(time), self.count, kind, data))
+        self.count += 1
+
+    def scheduleMeal(self, time : int = 0) -> None:
+        """
+        Schedule the next meal at time.
+        """
+        self.next_meal = int(time)
+        # a regular meal schedules the next one when it is eaten
+        self.push(time=time, kind="meal", repeat=True)
+
+    def interval(self, world = None) -> int:
+        """
+        Ticks until the next meal (at least 1).
+        """
+        interval = self.meal_interval(world) if callable(self.meal_interval) else self.meal_interval
+        return max(int(round(interval)), 1)
+
+    def nextTime(self) -> int:
+        """
+        Time of the earliest event, None when the queue is empty.
+        """
+        return self.heap[0][0] if len(self.heap) > 0 else None
+
+    def due(self, time : int = 0) -> list:
+        """
+        Pop every event with a time up to time.
+
+        Return:\n
+            events = (list) [(kind, data), ...] in time then insertion order
+        """
+        events = []
+        while len(self.heap) > 0 and self.heap[0][0] <= time:
+            _, _, kind, data = heapq.heappop(self.heap)
+            events.append((kind, data))
+        return events
+
+    def shift(self, ticks : int = 0) -> None:
+        """
+        Move the meals ticks steps later (the world skipped ahead), other events keep their time.
+        """
+        self.heap = [(time + ticks if kind == "meal" else time, count, kind, data) for time, count, kind, data in self.heap]
+        heapq.heapify(self.heap)
+        self.next_meal += ticks
@@ -0,0 +1,174 @@
+from AI import AI
+from history import GRAPH_CHANNELS, isGraph
+import numpy as np
+
+# SharedPolicy class
+class SharedPolicy:
+    def __init__(self, no_members : int = 1, state_size : int = 5, action_size : int = 5,
+                 exploration : float = 1.0, exploration_decay : float = 0.94, NN_data : dict = None, **AI_data) -> None:
+        """
+        One network shared by colonies with the same architecture.\n
+        A one-hot colony id is appended to every state so the network can still tell
+        the colonies apart, and all their states go through one forward pass per step.
+
+        Parameters:\n
+            no_members = (int) number of colonies sharing the network\n
+            state_size = (int) state size of a single colony\n
+            action_size = (int) num of output layer nodes\n
+            exploration = (float) starting exploration of every colony\n
+            exploration_decay = (float) rate of exploration decay\n
+            NN_data = (dict) {"type" : "dense"} type of neural_net\n
+            AI_data = learning_rate, alpha, gamma, model_loc passed to AI\n
+        """
+        self.no_members = no_members
+        self.state_size = state_size
+        self.action_size = action_size
+        self.NN_data = NN_data
+        self.exploration_decay = exploration_decay
+        # every colony keeps its own exploration
+        self.exploration = np.full(no_members, exploration, dtype=float)
+        ai_state_size = state_size + no_members
+        if isGraph(NN_data):
+            # every member sees the same gut graph, the id is added to every node as extra channels
+            ai_state_size = state_size
+            NN_data = dict(NN_data, channels=NN_data.get("channels", GRAPH_CHANNELS) + no_members)
+        self.ai = AI(state_size=ai_state_size, action_size=action_size,
+                     exploration=exploration, exploration_decay=exploration_decay, NN_data=NN_data, **AI_data)
+
+    def member(self, idx : int = 0):
+        """
+        Per colony handle with the AI decide/train interface.
+        """
+        return PolicyMember(policy=self, idx=idx)
+
+    def _withId(self, states : np.ndarray = None, members : np.ndarray = None) -> np.ndarray:
+        """
+        Append the one-hot colony id to the states.
+
+        Parameters:\n
+            states = (ndarray) (batch, state_size), (batch, lstm_memory, state_size) or (batch, lstm_memory, nodes, channels)\n
+            members = (ndarray) (batch,) colony id of every state\n
+        """
+        one_hot = np.zeros((len(members), self.no_members))
+        one_hot[np.arange(len(members)), members] = 1
+        one_hot = one_hot.reshape((len(members),) + (1,)*(states.ndim - 2) + (self.no_members,))
+        one_hot = np.broadcast_to(one_hot, states.shape[:-1] + (self.no_members,))
+        return np.concatenate([states, one_hot], axis=-1)
+
+    def _stack(self, states : list = None) -> np.ndarray:
+        """
+        Stack per colony states, every state is a (1, ...) window of its history.
+        """
+        return np.concatenate(states, axis=0)
+
+    def decideBatch(self, members : np.ndarray = None, states : list = None) -> np.ndarray:
+        """
+        Decide the action of many colonies with a single forward pass.
+
+        Parameters:\n
+            members = (ndarray) (batch,) colony id of every state\n
+            states = (list) [(ndarray) state, ... ] current state of each colony\n
+        Return:\n
+            actions = (ndarray) (batch,) action of each colony\n
+        """
+        members = np.asarray(members, dtype=int)
+        q_values = self.ai._actBatch(self._withId(self._stack(states), members))
+        # exploitation, ties between max q values broken at random
+        is_max = q_values == np.max(q_values, axis=1, keepdims=True)
+        actions = np.argmax(np.where(is_max, np.random.random(q_values.shape), -1), axis=1)
+        # exploration
+        explore = np.random.random(len(members)) < self.exploration[members]
+        actions[explore] = np.random.randint(self.action_size, size=np.count_nonzero(explore))
+        # reduce exploration rate
+        self.exploration[members] *= self.exploration_decay
+
+        return actions
+
+    def trainBatch(self, members : np.ndarray = None, rewards : np.ndarray = None, states : list = None,
+                   next_states : list = None, actions : np.ndarray = None) -> None:
+        """
+        Train the shared network on the transitions of many colonies at once.
+
+        Parameters:\n
+            members = (ndarray) (batch,) colony id of every transition\n
+            rewards = (ndarray) (batch,) reward of each colony\n
+            states = (list) state of each colony before acting\n
+            next_states = (list) state of each colony after acting\n
+            actions = (ndarray) (batch,) action of each colony\n
+        """
+        members = np.asarray(members, dtype=int)
+        self.ai.trainBatch(rewards=np.asarray(rewards, dtype=float),
+                           states=self._withId(self._stack(states), members),
+                           next_states=self._withId(self._stack(next_states), members),
+                           actions=np.asarray(actions, dtype=int))
+
+# PolicyMember class
+class PolicyMember:
+    def __init__(self, policy : SharedPolicy = None, idx : int = 0) -> None:
+        """
+        A colony's view of a SharedPolicy, used where colonies act one at a time.
+
+        Parameters:\n
+            policy = (SharedPolicy) shared network\n
+            idx = (int) colony id inside the policy\n
+        """
+        self.policy = policy
+        self.idx = idx
+
+    @property
+    def exploration(self) -> float:
+        return self.policy.exploration[self.idx]
+
+    @exploration.setter
+    def exploration(self, value : float) -> None:
+        self.policy.exploration[self.idx] = value
+
+    def decide(self, state : np.ndarray = None) -> int:
+        return int(self.policy.decideBatch(members=[self.idx], states=[state])[0])
+
+    def train(self, reward : float = 0, state : np.ndarray = None,
+              next_state : np.ndarray = None, action : int = 0) -> None:
+        self.policy.trainBatch(members=[self.idx], rewards=[reward], states=[state],
+                               next_states=[next_state], actions=[action])
+
+def buildSharedPolicies(bacteria_data : list = None) -> list:
+    """
+    Group colonies whose AI_data has "shared" : True by architecture and build one
+    SharedPolicy per group.
+
+    Parameters:\n
+        bacteria_data = (list) [(dict) {"idx" : (int), ...}, ...] Bacteria initial data\n
+    Return:\n
+        members = (list) PolicyMember of each colony, None for colonies with their own AI\n
+    """
+    groups = {}
+    for i, data in enumerate(bacteria_data):
+        AI_data = data.get("AI_data")
+        if AI_data == None or not AI_data.get("shared", False):
+            continue
+        NN_data = AI_data["NN_data"]
+        # the whole NN_data (type, lstm_memory, units, heads, ...) and the hyper parameters (learning_rate,
+        # gamma, exploration_decay, model_loc, ...) are part of the key, colonies that differ in any of them
+        # get their own policy
+        hyper_params = _freeze({key : value for key, value in AI_data.items() if key not in ("shared", "NN_data")})
+        key = (data.get("state_size", 5), data.get("action_size", 5), _freeze(NN_data), hyper_params)
+        groups.setdefault(key, []).append(i)
+
+    members = [None]*len(bacteria_data)
+    for (state_size, action_size, _, _), idxs in groups.items():
+        # every colony of the group has the same hyper parameters
+        AI_data = {key : value for key, value in bacteria_data[idxs[0]]["AI_data"].items() if key != "shared"}
+        policy = SharedPolicy(no_members=len(idxs), state_size=state_size, action_size=action_size, **AI_data)
+        for member_idx, i in enumerate(idxs):
+            members[i] = policy.member(member_idx)
+    return members
+
+def _freeze(value = None):
+    """
+    Hashable copy of a (nested) dict or list, used as a group key.
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
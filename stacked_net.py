@@ -0,0 +1,69 @@
+import numpy as np
+import tensorflow as tf
+
+# StackedNet class
+class StackedNet:
+    def __init__(self, no_members : int = 1, state_size : int = 5, action_size : int = 5,
+                 learning_rate : float = 0.01, epochs : int = 10) -> None:
+        """
+        no_members independent copies of the AI dense model (10-10-action_size, softmax) whose
+        weights are stacked on a leading axis, so all of them run in one batched matmul.
+
+        Parameters:\n
+            no_members = (int) number of independent networks\n
+            state_size = (int) num of input layer nodes\n
+            action_size = (int) num of output layer nodes\n
+            learning_rate = (float) Adam learning rate\n
+            epochs = (int) gradient steps per train call (AI.train fits 10 epochs)\n
+        """
+        self.no_members = no_members
+        self.state_size = state_size
+        self.action_size = action_size
+        self.epochs = epochs
+        sizes = [state_size, 10, 10, action_size]
+        initializer = tf.keras.initializers.GlorotUniform()
+        self.weights = []
+        for n_in, n_out in zip(sizes[:-1], sizes[1:]):
+            self.weights.append(tf.Variable(initializer((no_members, n_in, n_out))))
+            self.weights.append(tf.Variable(tf.zeros((no_members, 1, n_out))))
+        self.optimizer = tf.keras.optimizers.Adam(learning_rate=learning_rate)
+        self._train_step = tf.function(self._trainStep)
+        self._forward = tf.function(self._call)
+
+    def _call(self, states):
+        w1, b1, w2, b2, w3, b3 = self.weights
+        x = tf.matmul(states, w1) + b1
+        x = tf.nn.relu(tf.matmul(x, w2) + b2)
+        return tf.nn.softmax(tf.matmul(x, w3) + b3)
+
+    def predict(self, states : np.ndarray = None) -> np.ndarray:
+        """
+        Q values of every member.
+
+        Parameter:\n
+            states = (ndarray) (no_members, batch, state_size)\n
+        Return:\n
+            q_values = (ndarray) (no_members, batch, action_size)
+        """
+        return self._forward(tf.constant(states, dtype=tf.float32)).numpy()
+
+    def _trainStep(self, states, targets):
+        with tf.GradientTape() as tape:
+            q_values = self._call(states)
+            # categorical crossentropy, summed over members so their gradients stay independent
+            loss = -tf.reduce_sum(tf.reduce_mean(tf.reduce_sum(targets*tf.math.log(q_values + 1e-7), axis=-1), axis=-1))
+        gradients = tape.gradient(loss, self.weights)
+        self.optimizer.apply_gradients(zip(gradients, self.weights))
+
+    def train(self, states : np.ndarray = None, targets : np.ndarray = None) -> None:
+        """
+        epochs gradient steps of every member on its own (states, targets).
+
+        Parameters:\n
+            states = (ndarray) (no_members, batch, state_size)\n
+            targets = (ndarray) (no_members, batch, action_size)
+        """
+        states = tf.constant(states, dtype=tf.float32)
+        targets = tf.constant(targets, dtype=tf.float32)
+        for _ in range(self.epochs):
+            self._train_step(states, targets)
@@ -0,0 +1,30 @@
+// Start a simulation and follow it over Server-Sent Events
+const runButton = document.getElementById("run-button");
+const runLog = document.getElementById("run-log");
+runButton.addEventListener("click", function() {
+  fetch("/runs", {
+    method: "POST",
+    headers: {"Content-Type": "application/json"},
+    body: JSON.stringify({total_time: 2000})
+  })
+    .then(response => response.json())
+    .then(function(result) {
+      const source = new EventSource(`/runs/${result.run_id}/stream`);
+      source.addEventListener("start", function(event) {
+        runLog.textContent = `run ${result.run_id} started\n`;
+      });
+      // one frame holds the deltas of many steps and the state after them
+      source.addEventListener("steps", function(event) {
+        const frame = JSON.parse(event.data);
+        const time = frame.time[frame.time.length - 1];
+        runLog.textContent += `time ${time} bacteria ${frame.state.bacteria_pop.map(pop => pop.toFixed(3)).join(" ")} reward ${frame.state.total_reward.toFixed(3)}\n`;
+      });
+      source.addEventListener("end", function(event) {
+        runLog.textContent += "done\n";
+        source.close();
+      });
+      source.addEventListener("error", function(event) {
+        source.close();
+      });
+    });
+});
@@ -0,0 +1,152 @@
+import collections
+import json
+import threading
+import time as _time
+import numpy as np
+
+# SimulationRun class
+class SimulationRun:
+    def __init__(self, data : dict = None, total_time : int = 2000, interval : float = 0.25,
+                 max_batch : int = 100, keep_frames : int = 1000) -> None:
+        """
+        World run in a background thread whose progress many clients can watch.\n
+        Every step adds the change of the colony populations and chemicals and the agent reward
+        to the current batch, a batch is published as one frame every interval seconds (or when
+        it holds max_batch steps) so a fast run doesn't flood the clients.\n
+        Frames are kept in a bounded list shared by all clients, a client only keeps a cursor.
+
+        Parameters:\n
+            data = (dict) World data, see main.defaultData\n
+            total_time = (int) steps of the run\n
+            interval = (float) min seconds between frames\n
+            max_batch = (int) max steps in a frame\n
+            keep_frames = (int) frames kept for clients that join late or lag behind\n
+        """
+        self.data = data
+        self.total_time = total_time
+        self.interval = interval
+        self.max_batch = max_batch
+        self.frames = collections.deque(maxlen=keep_frames)
+        # index of frames[0] among all frames published
+        self.first_frame = 0
+        self.done = False
+        # monotonic time the run ended at, None while running
+        self.finished = None
+        self.error = None
+        self.world = None
+        self._stop = threading.Event()
+        self._changed = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> "SimulationRun":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Ask the worker to stop after the current step.
+        """
+        self._stop.set()
+
+    def join(self, timeout : float = None) -> None:
+        self._thread.join(timeout)
+
+    def _observe(self, world, colonies : list = None) -> tuple:
+        pops = np.array([bacteria.pop for bacteria in colonies])
+        return pops, world.agent.chemicals_array.copy(), float(world.total_reward)
+
+    def _run(self) -> None:
+        from world import World
+        try:
+            world = World(**self.data)
+            self.world = world
+            # colonies in bacteria_data order, World re-sorts its own list every step
+            colonies = list(world.bacterias)
+            pops, chemicals, total_reward = self._observe(world, colonies)
+            self._publish("start", {"time" : world.time, "total_time" : self.total_time,
+                                    "bacteria" : [bacteria.id for bacteria in colonies],
+                                    "chemicals" : world.chemical_list,
+                                    "bacteria_pop" : pops.tolist(), "chemical_pop" : chemicals.tolist()})
+            batch = self._newBatch()
+            last = _time.monotonic()
+            while world.time < self.total_time and not self._stop.is_set():
+                world.step()
+                new_pops, new_chemicals, new_total = self._observe(world, colonies)
+                batch["time"].append(world.time)
+                batch["bacteria_pop"].append((new_pops - pops).tolist())
+                batch["chemical_pop"].append((new_chemicals - chemicals).tolist())
+                batch["reward"].append(new_total - total_reward)
+                pops, chemicals, total_reward = new_pops, new_chemicals, new_total
+                now = _time.monotonic()
+                if len(batch["time"]) >= self.max_batch or now - last >= self.interval:
+                    self._publishBatch(batch, pops, chemicals, total_reward)
+                    batch = self._newBatch()
+                    last = now
+            if len(batch["time"]) > 0:
+                self._publishBatch(batch, pops, chemicals, total_reward)
+            self._publish("end", world.summary())
+        except Exception as error:
+            self.error = repr(error)
+            self._publish("error", {"error" : self.error})
+        finally:
+            with self._changed:
+                self.done = True
+                self.finished = _time.monotonic()
+                self._changed.notify_all()
+
+    def _newBatch(self) -> dict:
+        return {"time" : [], "bacteria_pop" : [], "chemical_pop" : [], "reward" : []}
+
+    def _publishBatch(self, batch : dict = None, pops : np.ndarray = None, chemicals : np.ndarray = None,
+                      total_reward : float = 0) -> None:
+        """
+        Publish the per step deltas of a batch, plus the absolute values after it so a client
+        can resync instead of accumulating rounding errors.
+        """
+        batch["state"] = {"bacteria_pop" : pops.tolist(), "chemical_pop" : chemicals.tolist(), "total_reward" : total_reward}
+        self._publish("steps", batch)
+
+    def _publish(self, event : str = None, payload : dict = None) -> None:
+        with self._changed:
+            if len(self.frames) == self.frames.maxlen:
+                self.first_frame += 1
+            self.frames.append((event, json.dumps(payload)))
+            self._changed.notify_all()
+
+    def frame(self, cursor : int = 0, timeout : float = None) -> tuple:
+        """
+        Wait for the frame at cursor.
+
+        Parameters:\n
+            cursor = (int) index of the next frame the client wants\n
+            timeout = (float) seconds to wait, None waits until there is a frame or the run is over\n
+        Return:\n
+            (cursor, frame) = (int, tuple) next cursor and (event, json) frame, frame is None when
+                              nothing arrived in time or the run is over. A client that lagged past
+                              the kept frames skips to the oldest one.
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: cursor < self.first_frame + len(self.frames) or self.done, timeout)
+            cursor = max(cursor, self.first_frame)
+            if cursor < self.first_frame + len(self.frames):
+                return cursor + 1, self.frames[cursor - self.first_frame]
+            return cursor, None
+
+    def events(self, cursor : int = 0, keepalive : float = 15.0):
+        """
+        Server-Sent Events text of every frame from cursor until the run is over.
+        """
+        while True:
+            cursor, frame = self.frame(cursor, timeout=keepalive)
+            if frame != None:
+                event, payload = frame
+                yield f"id: {cursor - 1}\nevent: {event}\ndata: {payload}\n\n"
+            elif self.done and cursor >= self.first_frame + len(self.frames):
+                return
+            else:
+                # comment line, keeps proxies from closing an idle connection
+                yield ": keepalive\n\n"
+
+    def status(self) -> dict:
+        return {"time" : self.world.time if self.world != None else 0, "total_time" : self.total_time,
+                "done" : self.done, "error" : self.error, "frames" : self.first_frame + len(self.frames)}
@@ -0,0 +1,141 @@
+import numpy as np
+
+# TileCoder class
+class TileCoder:
+    def __init__(self, state_size : int = 5, tilings : int = 8, bins : int = 8, low : float = -6, high : float = 3,
+                 scale : str = "log", memory : int = 4096, seed : int = 0) -> None:
+        """
+        Map a continuous state to one active tile per tiling.\n
+        Every tiling cuts [low, high] of each state dim in bins, shifted by a fraction of a bin
+        (asymmetric offsets). Tiles are numbered exactly while the tilings fit in memory, else
+        hashed into memory slots.
+
+        Parameters:\n
+            state_size = (int) flattened state size\n
+            tilings = (int) overlapping tilings, 1 is a plain discretisation\n
+            bins = (int) bins per dim\n
+            low, high = (float) range covered by the bins (after scale), values outside go to the edge bins\n
+            scale = (str) "log" : bins over log10 of the amounts (chemicals are ~1e-4, components ~1e2), "linear" : raw values\n
+            memory = (int) max number of tiles\n
+            seed = (int) seed of the hash (never touches the global random state)\n
+        """
+        if scale not in ("log", "linear"):
+            raise ValueError(f"unknown scale : {scale}")
+        self.state_size = state_size
+        self.tilings = tilings
+        self.bins = bins
+        self.low = low
+        self.width = (high - low)/bins
+        self.scale = scale
+        # offset of every tiling in fractions of a bin, displacement (1, 3, 5, ...) per dim
+        self.offsets = (np.arange(tilings)[:, None]*(2*np.arange(state_size) + 1)[None, :]/tilings) % 1
+        # coordinates go from 0 to bins (the offset adds one more bin)
+        radix = bins + 1
+        exact = state_size*np.log(radix) + np.log(tilings) <= np.log(memory)
+        if exact:
+            self.size = tilings*radix**state_size
+            self.multipliers = radix**np.arange(state_size, dtype=np.int64)
+        else:
+            self.size = memory
+            self.multipliers = np.random.RandomState(seed).randint(1, 2**31 - 1, size=state_size).astype(np.int64)
+        self.exact = exact
+        self.tiling_base = np.arange(tilings, dtype=np.int64)*(radix**state_size if exact else 2654435761)
+
+    def tiles(self, states : np.ndarray = None) -> np.ndarray:
+        """
+        Parameter:\n
+            states = (ndarray) (batch, ...) states, flattened per row\n
+        Return:\n
+            tiles = (ndarray) (batch, tilings) active tile of every tiling
+        """
+        states = np.asarray(states, dtype=float).reshape(len(states), -1)
+        if self.scale == "log":
+            states = np.log10(np.maximum(states, 0) + 1e-12)
+        scaled = (states - self.low)/self.width
+        coords = np.clip(np.floor(scaled[:, None, :] + self.offsets[None, :, :]), 0, self.bins).astype(np.int64)
+        index = coords @ self.multipliers + self.tiling_base
+        if not self.exact:
+            index %= self.size
+        return index
+
+# TileQ class
+class TileQ:
+    def __init__(self, state_size : int = 5, action_size : int = 5, learning_rate : float = 0.01,
+                 alpha : float = 0.1, gamma : float = 0.9, exploration : float = 1.0,
+                 exploration_decay : float = 0.94, NN_data : dict = None, **kwargs) -> None:
+        """
+        Q learning on tile coded states, same decide/train interface and exploration decay as AI.\n
+        NN_data type "tabular" is a Q table over one discretisation, "linear" a linear
+        approximator over several overlapping tilings (Q = sum of the weights of the active tiles).
+
+        Parameters:\n
+            state_size = (int) state size\n
+            action_size = (int) possible action size\n
+            learning_rate = (float) unused, alpha is the step size\n
+            alpha = (float) rate of RL learning\n
+            gamma = (float) significance of previous reward\n
+            exploration = (float) determines exploration\n
+            exploration_decay = (float) rate of exploration decay\n
+            NN_data = (dict) {"type" : "tabular" | "linear", "tilings" : (int), "bins" : (int), "low" : (float),
+                              "high" : (float), "scale" : "log" | "linear", "memory" : (int)} see TileCoder\n
+        """
+        NN_data = {} if NN_data == None else NN_data
+        self.state_size = state_size
+        self.action_size = action_size
+        self.alpha = alpha
+        self.gamma = gamma
+        self.exploration = exploration
+        self.exploration_decay = exploration_decay
+        tilings = NN_data.get("tilings", 1 if NN_data.get("type") == "tabular" else 8)
+        memory = NN_data.get("memory", 4096)
+        self.coder = TileCoder(state_size=state_size, tilings=tilings, bins=NN_data.get("bins", 8),
+                               low=NN_data.get("low", -6), high=NN_data.get("high", 3),
+                               scale=NN_data.get("scale", "log"), memory=memory)
+        self.weights = np.zeros((self.coder.size, action_size))
+
+    def _act(self, state : np.ndarray = None) -> np.ndarray:
+        return self._actBatch(state)[0]
+
+    def _actBatch(self, states : np.ndarray = None) -> np.ndarray:
+        """
+        Q values of many states, (batch, action_size).
+        """
+        return self.weights[self.coder.tiles(states)].sum(axis=1)
+
+    def decide(self, state : np.ndarray = None) -> int:
+        """
+        Same exploration/exploitation rule as AI.decide.
+        """
+        q_values = self._act(state=state)
+        r = np.random.random()
+        if r < self.exploration:
+            # exploration
+            action = np.random.choice(range(self.action_size))
+        else:
+            # exploitation
+            action = np.random.choice(np.flatnonzero(q_values == np.max(q_values)))
+        # reduce exploration rate
+        self.exploration *= self.exploration_decay
+
+        return action
+
+    def train(self, reward : float = 0, state : np.ndarray = None,
+              next_state : np.ndarray = None, action : int = 0) -> None:
+        """
+        One TD step towards the target of the AI.train Bellman equation, only Q(state, action) moves.
+        """
+        self.trainBatch(rewards=[reward], states=state, next_states=next_state, actions=[action])
+
+    def trainBatch(self, rewards : np.ndarray = None, states : np.ndarray = None,
+                   next_states : np.ndarray = None, actions : np.ndarray = None) -> None:
+        """
+        train on many transitions, applied one after the other.
+        """
+        tiles = self.coder.tiles(states)
+        next_tiles = self.coder.tiles(next_states)
+        for i, action in enumerate(np.atleast_1d(actions)):
+            q_value = self.weights[tiles[i], action].sum()
+            next_q = self.weights[next_tiles[i]].sum(axis=0).max()
+            # Bellmann equation, the error is shared between the active tiles
+            error = rewards[i] + self.gamma*next_q - q_value
+            self.weights[tiles[i], action] += self.alpha*error/self.coder.tilings
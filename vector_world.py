@@ -0,0 +1,204 @@
+import numpy as np
+from bacteria import Bacteria
+from population import Population
+
+# StackedLearner class
+class StackedLearner:
+    def __init__(self, no_members : int = 1, state_size : int = 5, action_size : int = 5,
+                 AI_data : dict = None) -> None:
+        """
+        Decide/train for many independent learners at once (one per world, or per world and colony).
+
+        Parameters:\n
+            no_members = (int) number of learners\n
+            state_size = (int) state size of one learner\n
+            action_size = (int) possible action size\n
+            AI_data = (dict) same keys as for AI, NN_data type "dense" or "random"\n
+        """
+        self.no_members = no_members
+        self.action_size = action_size
+        self.alpha = AI_data.get("alpha", 0.1)
+        self.gamma = AI_data.get("gamma", 0.9)
+        self.exploration_decay = AI_data.get("exploration_decay", 0.94)
+        self.exploration = np.full(no_members, AI_data.get("exploration", 1.0), dtype=float)
+        nn_type = AI_data["NN_data"]["type"]
+        self.net = None
+        if nn_type == "dense":
+            from stacked_net import StackedNet
+            self.net = StackedNet(no_members=no_members, state_size=state_size, action_size=action_size,
+                                  learning_rate=AI_data.get("learning_rate", 0.01))
+        elif nn_type != "random":
+            raise ValueError(f"VectorWorld supports dense and random learners, got {nn_type}")
+
+    def decide(self, states : np.ndarray = None) -> np.ndarray:
+        """
+        Parameter:\n
+            states = (ndarray) (no_members, state_size)\n
+        Return:\n
+            actions = (ndarray) (no_members,)
+        """
+        actions = np.random.randint(self.action_size, size=self.no_members)
+        if self.net != None:
+            q_values = self.net.predict(states[:, None, :])[:, 0]
+            # exploitation, ties between max q values broken at random
+            is_max = q_values == np.max(q_values, axis=1, keepdims=True)
+            greedy = np.argmax(np.where(is_max, np.random.random(q_values.shape), -1), axis=1)
+            explore = np.random.random(self.no_members) < self.exploration
+            actions = np.where(explore, actions, greedy)
+        # reduce exploration rate
+        self.exploration *= self.exploration_decay
+        return actions
+
+    def train(self, rewards : np.ndarray = None, states : np.ndarray = None,
+              next_states : np.ndarray = None, actions : np.ndarray = None) -> None:
+        """
+        Same Bellman update as AI.train, one transition per learner.
+        """
+        if self.net == None:
+            return
+        q_all = self.net.predict(np.stack([states, next_states], axis=1))
+        q_values, next_q_values = q_all[:, 0], q_all[:, 1]
+        rows = np.arange(self.no_members)
+
+        # Bellmann equation
+        q_values[rows, actions] = (1 - self.alpha)*q_values[rows, actions] + self.alpha*(rewards + self.gamma*np.max(next_q_values, axis=1))
+
+        # update the NN weights
+        self.net.train(states[:, None, :], q_values[:, None, :])
+
+# VectorWorld class
+class VectorWorld:
+    def __init__(self, no_worlds : int = 4, no_bacteria : int = 5, no_components : int = 5,
+                 no_food : int = 5, no_chemical : int = 5,
+                 component_list : list = None, food_list : list = None, chemical_list : list = None,
+                 food_profile : dict = None, chemical_profile : dict = None,
+                 bacteria_data : list = None, agent_data : dict = None,
+                 food_access : str = "sequential", **kwargs) -> None:
+        """
+        no_worlds independent replicas of World stepped in lockstep.\n
+        Gut chemicals, components and colony populations carry a leading world axis and every
+        learner role (agent, each colony) has no_worlds independent networks evaluated and
+        trained in one batched call.\n
+        Learner states are the chemical/component amounts before and after the step.
+
+        Parameters:\n
+            no_worlds = (int) number of replicas\n
+            food_access = (str) "sequential" or "shared", see Population\n
+            other parameters = same as World (World only options like engine or log_data are ignored)\n
+        """
+        self.no_worlds = no_worlds
+        self.time = 0
+        self.no_bacteria = no_bacteria
+        self.component_list = component_list
+        self.food_list = food_list
+        self.chemical_list = chemical_list
+        K = no_worlds
+        # profiles as arrays
+        self.food_comp = np.array([[food_profile[food].get(comp, 0) for comp in component_list] for food in food_list], dtype=float)
+        self.kick = np.array([chemical_profile[chem]["kick"] for chem in chemical_list], dtype=float)
+        self.kick_resilience = np.array([agent_data["kick_resilience"][chem] for chem in chemical_list], dtype=float)
+        # agent state of every world
+        self.component_pop = np.repeat([[agent_data["component_pop"].get(comp, 0) for comp in component_list]], K, axis=0).astype(float)
+        self.chemicals = np.repeat([[agent_data["chemicals"].get(chem, 0) for chem in chemical_list]], K, axis=0).astype(float)
+        self.food_pop = np.repeat([[agent_data["food_pop"].get(food, 0) for food in food_list]], K, axis=0).astype(float)
+        self.food_consume_rate = agent_data.get("food_consume_rate", 1)
+        self.chemical_decay_rate = agent_data.get("chemical_decay_rate", 0.01)
+        self.eat_time_default = agent_data.get("eat_default_time", 10)
+        # every world counts down from the same value, so they all eat on the same step
+        self.eat_time = self.eat_time_default
+        self.action = np.zeros(K, dtype=int)
+        self.reward = np.zeros(K)
+        self.total_reward = np.zeros(K)
+        self.meals = 0
+        self.agent_ai = StackedLearner(no_members=K, state_size=len(chemical_list),
+                                       action_size=agent_data.get("action_size", len(food_list)), AI_data=agent_data["AI_data"])
+        # colonies, built without ai and tiled over the worlds
+        bacterias = [Bacteria(**dict(bacteria_data[i], AI_data=None)) for i in range(no_bacteria)]
+        self.population = Population(bacterias=bacterias, component_list=component_list,
+                                     chemical_list=chemical_list, food_access=food_access).tile(K)
+        self.population.has_ai[:] = [bacteria_data[i].get("AI_data") != None for i in range(no_bacteria)]
+        # colonies with the same action size and learner type are one batch of learners
+        groups = {}
+        for i in range(no_bacteria):
+            AI_data = bacteria_data[i].get("AI_data")
+            if AI_data != None:
+                key = (bacteria_data[i].get("action_size", 5), AI_data["NN_data"]["type"])
+                groups.setdefault(key, []).append(i)
+        self.colony_learners = []
+        for (action_size, _), colonies in groups.items():
+            learner = StackedLearner(no_members=K*len(colonies), state_size=len(component_list),
+                                     action_size=action_size, AI_data=bacteria_data[colonies[0]]["AI_data"])
+            self.colony_learners.append((np.array(colonies), learner))
+
+    def step(self) -> None:
+        """
+        One step of every world, same order as World.step.
+        """
+        population = self.population
+        worlds = np.arange(self.no_worlds)
+        chemicals_before = self.chemicals.copy()
+        population.sortBySpeed()
+        eating = self.eat_time == 0
+        if eating:
+            self.action = self.agent_ai.decide(chemicals_before)
+            self.food_pop[worlds, self.action] += self.food_consume_rate
+            self.component_pop += self.food_consume_rate*self.food_comp[self.action]
+            self.eat_time = self.eat_time_default
+        # bacteria grow, snapshots[:, i] is the food seen by colony i
+        self.component_pop, snapshots = population.growth(comp_pop=self.component_pop)
+        # position of every original colony in each world's speed order
+        position = np.argsort(population.index, axis=-1)
+        actions = np.zeros(population.pop.shape, dtype=int)
+        for colonies, learner in self.colony_learners:
+            rows = position[:, colonies]
+            states = snapshots[worlds[:, None], rows].reshape(-1, len(self.component_list))
+            actions[worlds[:, None], rows] = learner.decide(states).reshape(self.no_worlds, -1)
+        produced = population.produceChemicals(actions=actions)
+        self.chemicals = population.reactToChemical(chemicals=self.chemicals, produced=produced)
+        population.findReward()
+        for colonies, learner in self.colony_learners:
+            rows = position[:, colonies]
+            learner.train(rewards=population.reward[worlds[:, None], rows].ravel(),
+                          states=snapshots[worlds[:, None], rows].reshape(-1, len(self.component_list)),
+                          next_states=snapshots[worlds[:, None], rows + 1].reshape(-1, len(self.component_list)),
+                          actions=actions[worlds[:, None], rows].ravel())
+        if eating:
+            self.reward = ((self.chemicals - chemicals_before)/self.kick_resilience) @ self.kick
+            self.agent_ai.train(rewards=self.reward, states=chemicals_before, next_states=self.chemicals, actions=self.action)
+            self.total_reward += self.reward
+            self.meals += 1
+        # chemical decays
+        self.chemicals *= self.chemical_decay_rate
+        # time moves forward
+        self.time += 1
+        self.eat_time -= 1
+
+    def run(self, total_time : int = 2000) -> dict:
+        """
+        Step every world total_time times.
+
+        Return:\n
+            summary = (dict) see summary
+        """
+        for _ in range(total_time):
+            self.step()
+        return self.summary()
+
+    def summary(self) -> dict:
+        """
+        Per world summary, every value has a leading world axis.
+
+        Return:\n
+            summary = (dict) {"total_reward" : (ndarray) (no_worlds,), "bacteria_pop" : (ndarray) (no_worlds, no_bacteria), ...}
+        """
+        position = np.argsort(self.population.index, axis=-1)
+        return {
+            "time" : self.time,
+            "meals" : self.meals,
+            "total_reward" : self.total_reward.copy(),
+            "exploration" : self.agent_ai.exploration.copy(),
+            # colonies in bacteria_data order
+            "bacteria_pop" : np.take_along_axis(self.population.pop, position, axis=-1),
+            "component_pop" : self.component_pop.copy(),
+            "chemicals" : self.chemicals.copy(),
+        }
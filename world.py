@@ -1,15 +1,28 @@
+import copy
 import numpy as np
 from agent import Agent
 from bacteria import Bacteria
-import csv
+from population import Population
+from shared_policy import PolicyMember, buildSharedPolicies
+from logger import RunLogger
+from scheduler import Scheduler
+from interaction import loadInteractions
+from history import GutGraph, isGraph
 
 # world class
 class World:
+    # shortest quiet stretch fast-forwarded (or integrated), shorter ones are stepped faster (benchmark.py --fast-forward)
+    MIN_FAST_FORWARD = 32
+
     def __init__(self, no_bacteria : int = 5, no_components : int = 5,
                  no_food : int = 5, no_chemical : int = 5,
                  component_list : list = None, food_list : list = None, chemical_list : list = None,
                  food_profile : dict = None, chemical_profile : dict = None,
-                 bacteria_data : list = None, agent_data : dict = None) -> None:
+                 bacteria_data : list = None, agent_data : dict = None,
+                 engine : str = "object", food_access : str = "sequential", log_data : dict = None,
+                 profile_data : dict = None, schedule_data : dict = None, integrate_data : dict = None,
+                 interaction_data : dict = None, pipeline_data : dict = None, convergence_data : dict = None,
+                 metrics_data : dict = None) -> None:
         """
         World class\n
         
@@ -23,8 +36,27 @@ class World:
             chemical_list = (list) ["chem_1", ... ] List of chemical names\n
             food_profile = (dict) {"food_1" : (dict) {"comp_1" : (float) ratio, ...}, ... } Profile of food\n
             chemical_profile = (dict) {"chemical_1" : (dict) {"kick" : (float) value, ...}, ...} Profile of chemical\n
-            bacteria_data = (list) [(dict) {"idx" : (int), ...}, ...] Bacteria initial data\n
+            bacteria_data = (list) [(dict) {"idx" : (int), ...}, ...] Bacteria initial data, "shared" : True in AI_data puts the colony on a shared policy,
+                            stgraph learners (the agent too) are all fed one GutGraph of the whole gut\n
             agent_data = (dict) {"food_pop" : (dict) {}, ...} Agent initial data\n
+            engine = (str) "object" : loop over Bacteria objects, "vector" : batched Population arrays\n
+            food_access = (str) "sequential" or "shared" food access order of the "vector" engine\n
+            log_data = (dict) {"file_format" : (str), "chunk_size" : (int), "verbosity" : (int)} RunLogger options\n
+            profile_data = (dict) {"trace" : (bool), "trace_file" : (str), "folded_file" : (str)} Profiler options, None runs without timers\n
+            schedule_data = (dict) {"meal_interval" : (int) or (function), "first_meal" : (int), "events" : (list)} Scheduler options,
+                            meals default to every eat_default_time steps of the agent\n
+            integrate_data = (dict) {"method" : (str), "dt" : (int), "rtol" : (float), "atol" : (float)} GutODE options,
+                             quiet stretches are then integrated instead of stepped while the error estimate stays
+                             under rtol, None steps them\n
+            interaction_data = (dict) {"filename" : (str), "strength" : (float), "self_loops" : (bool)} colony interaction
+                               edge list (eg : "./data/csv/Bacteria.csv", nodes "bac<id>") applied in the growth, None : no interactions\n
+            pipeline_data = (dict) {"staleness" : (int)} train the agent and the colonies with their own AI in a background
+                            thread (TrainPipeline), None trains in the step\n
+            convergence_data = (dict) {"window" : (int), "rtol" : (float), "max_exploration" : (float), "action" : (str), ...}
+                               ConvergenceMonitor options, "stop" ends the run once it reached its steady state and
+                               "skip" jumps over it, None always runs every step\n
+            metrics_data = (dict) {"window" : (int), "buckets" : (int), "quantile_columns" : (list), ...} MetricsRecorder
+                           options, bounded memory plot data of every step, None records nothing\n
         """
         self.time = 0
         # number of each elements
@@ -39,10 +71,74 @@ class World:
         # profile of these elements
         self.food_profile = food_profile
         self.chemical_profile = chemical_profile
-        # define bacteria colonies and agent
-        self.bacterias = [ Bacteria(**bacteria_data[i]) for i in range(self.no_bacteria) ]        
-        self.agent = Agent(**agent_data)
+        # shared gut graph of the stgraph learners, their NN_data gets its shape
+        bacteria_data = bacteria_data[:self.no_bacteria]
+        self.graph = self._makeGraph(bacteria_data=bacteria_data, agent_data=agent_data)
+        if self.graph != None:
+            bacteria_data = [self._graphData(data) for data in bacteria_data]
+            agent_data = self._graphData(agent_data)
+        # define bacteria colonies and agent, colonies with "shared" : True in AI_data share one network
+        shared = buildSharedPolicies(bacteria_data)
+        self.bacterias = [ Bacteria(**bacteria_data[i], ai=shared[i]) for i in range(self.no_bacteria) ]
+        self.agent = Agent(**agent_data, chemical_list=chemical_list, component_list=component_list, food_list=food_list)
+        for learner, data in zip(self.bacterias + [self.agent], bacteria_data + [agent_data]):
+            if _isGraphLearner(data):
+                learner.graph = self.graph
+        # timed events (meals, doses, colony introductions, knockdowns)
+        schedule_data = {} if schedule_data == None else dict(schedule_data)
+        schedule_data.setdefault("meal_interval", self.agent.eat_time_default)
+        schedule_data.setdefault("first_meal", self.agent.eat_time)
+        self.scheduler = Scheduler(**schedule_data)
+        self.agent.eat_time = self.scheduler.next_meal - self.time
+        # coarse integration of the quiet stretches
+        self.integrate_data = integrate_data
         self.reward = 0
+        # agent reward summed over meals
+        self.total_reward = 0
+        self.meals = 0
+        # run log, opened on the first logged step
+        self.log_data = {} if log_data == None else log_data
+        self.logger = None
+        # plot data in constant memory
+        self.metrics = None
+        if metrics_data != None:
+            from metrics import MetricsRecorder
+            self.metrics = MetricsRecorder(bacteria_ids=[bacteria.id for bacteria in self.bacterias], component_list=component_list,
+                                           chemical_list=chemical_list, action_size=len(food_list), **metrics_data)
+        # background training, decisions use a copy of the weights at most staleness steps old
+        self.pipeline = None
+        if pipeline_data != None:
+            from pipeline import TrainPipeline
+            self.pipeline = TrainPipeline(**pipeline_data)
+            self.pipeline.time = self.time
+            self.agent.ai = self.pipeline.wrap(self.agent.ai)
+            for bacteria in self.bacterias:
+                bacteria.ai = self.pipeline.wrap(bacteria.ai)
+        # steady state detection, stop_reason is set when the monitor ended the run
+        self.monitor = None
+        self.stop_reason = None
+        if convergence_data != None:
+            from convergence import ConvergenceMonitor
+            self.monitor = ConvergenceMonitor(**convergence_data)
+        # sparse colony interactions, node index = position in bacteria_data
+        self.interaction = None
+        if interaction_data != None:
+            self.interaction = loadInteractions(ids=[bacteria.id for bacteria in self.bacterias], **interaction_data)
+        self.colony_index = {bacteria.id : idx for idx, bacteria in enumerate(self.bacterias)}
+        # struct-of-arrays engine for the colonies
+        if engine not in ("object", "vector"):
+            raise ValueError(f"unknown engine : {engine}")
+        self.engine = engine
+        self.population = None
+        if engine == "vector":
+            self.population = Population(bacterias=self.bacterias, component_list=self.component_list,
+                                         chemical_list=self.chemical_list, food_access=food_access)
+            self.population.interaction = self.interaction
+        # opt-in phase timers
+        self.profiler = None
+        if profile_data != None:
+            from profiler import Profiler
+            Profiler(**profile_data).attach(self)
     
     def step(self, filename : str = None) -> None:
         """
@@ -50,17 +146,24 @@ class World:
         """
         # log the data
         self._log(filename)
-        # set the state of the agent
+        # events of this step
+        meal, repeat = self._applyEvents()
+        # set the state of the agent (and the gut graph)
+        if self.graph != None:
+            self.graph.observeCurr(self)
         self.agent.setCurrState(chemical_list=self.chemical_list)
         # sort bacteria action according to speed value
         self._sortBacteria()
-        # Agent eats when eat_time becomes 0
-        if self.agent.eat_time == 0:
+        # Agent eats when a meal is due
+        if meal:
             action = self.agentAct()
             # bacteria acts
             self.bacteriaAct()
             self.agent.setNextState(chemical_list=self.chemical_list)
             self.agentTrain(action)
+            # next regular meal, the interval may depend on the meal just taken
+            if repeat:
+                self.scheduler.scheduleMeal(self.time + self.scheduler.interval(self))
         else:
             # Bacteria acts
             self.bacteriaAct()
@@ -69,7 +172,242 @@ class World:
         self.agent.decayChemicals()
         # time moves forward
         self.time += 1
-        self.agent.eat_time -= 1
+        self.agent.eat_time = self.scheduler.next_meal - self.time
+        if self.pipeline != None:
+            self.pipeline.endStep(self.time)
+
+    def advance(self, ticks : int = 1, filename : str = None) -> None:
+        """
+        Move the world ticks steps forward.\n
+        Stretches without events are fast-forwarded when no colony has an ai (nothing decides or
+        learns between events) and they are at least MIN_FAST_FORWARD steps long, the result is the
+        same as calling step every tick (up to rounding). With
+        integrate_data they are integrated instead (one log row per stretch, stepped when the integration
+        error estimate is above rtol).\n
+        A convergence monitor samples every step (no fast-forward) and stops or skips the steady state.
+        """
+        end = self.time + ticks
+        while self.time < end and self.stop_reason == None:
+            quiet = self._quietTicks(end=end)
+            if quiet < self.MIN_FAST_FORWARD:
+                quiet = 0
+            if quiet > 1 and self.integrate_data != None:
+                self.integrate(ticks=quiet, filename=filename)
+            elif quiet > 1:
+                self.fastForward(ticks=quiet, filename=filename)
+            else:
+                self.step(filename)
+                if self.monitor != None and self.monitor.observe(self):
+                    self._converged(end)
+
+    def _converged(self, end : int = 0) -> None:
+        """
+        The monitor detected the steady state : stop the run or skip whole periods up to end.
+        """
+        if self.monitor.action == "stop":
+            self.stop_reason = self.monitor.reason
+            return
+        if self.pipeline != None:
+            # the skipped steps queue no training
+            self.pipeline.drain()
+        self.monitor.skip(self, total_time=end)
+        if self.pipeline != None:
+            self.pipeline.time = self.time
+
+    def _quietTicks(self, end : int = 0) -> int:
+        """
+        Number of steps from now (up to end) without any event and without a colony ai.
+        """
+        if self.monitor != None or any(bacteria.ai != None for bacteria in self.bacterias):
+            return 0
+        next_time = self.scheduler.nextTime()
+        return (end if next_time == None else min(end, next_time)) - self.time
+
+    def fastForward(self, ticks : int = 1, filename : str = None) -> None:
+        """
+        Several steps without meal, events or colony ai over the Population arrays : the per tick
+        growth in one tight array recurrence, chemical production, decay and speed in closed form over
+        blocks of ticks (GutODE "discrete"). The last steps, whose observations the agent history window
+        still holds at the end, are stepped one by one.
+        """
+        from integrator import GutODE
+        population = self._populationView()
+        agent = self.agent
+        # two observations per step (curr and next state), the history keeps memory + 1
+        observed = (agent.history.memory + 2)//2
+        if self.graph != None:
+            observed = max(observed, (self.graph.memory + 2)//2)
+        bulk = max(ticks - observed, 0)
+        if bulk > 0:
+            start = self.time
+            observer = None
+            if filename != None or self.metrics != None:
+                observer = lambda *states: self._logTicks(population, filename, start, *states)
+            ode = GutODE(population=population, decay_rate=agent.chemical_decay_rate, method="discrete")
+            agent.component_pop_array, agent.chemicals_array = ode.advance(comp_pop=agent.component_pop_array,
+                                                                           chemicals=agent.chemicals_array,
+                                                                           ticks=bulk, observer=observer)
+            if self.population != None:
+                # the object engine only rewards colonies with an ai
+                population.findReward()
+            self.time = start + bulk
+            agent.eat_time = self.scheduler.next_meal - self.time
+        no_actions = np.zeros(population.no_bacteria, dtype=int)
+        for _ in range(ticks - bulk):
+            if filename != None or self.metrics != None:
+                if self.population == None:
+                    # the log of the object engine reads the Bacteria objects
+                    population.syncBacteria()
+                self._log(filename)
+            agent.setCurrState(chemical_list=self.chemical_list)
+            if self.graph != None:
+                self.graph.observeCurr(self, population=population)
+            population.sortBySpeed()
+            agent.component_pop_array, _ = population.growth(comp_pop=agent.component_pop_array)
+            produced = population.produceChemicals(actions=no_actions)
+            agent.chemicals_array = population.reactToChemical(chemicals=agent.chemicals_array, produced=produced)
+            if self.population != None:
+                population.findReward()
+            agent.setNextState(chemical_list=self.chemical_list)
+            if self.graph != None:
+                self.graph.observeNext(self, population=population)
+            agent.decayChemicals()
+            self.time += 1
+            agent.eat_time = self.scheduler.next_meal - self.time
+        population.syncBacteria()
+
+    def _logTicks(self, population : Population = None, filename : str = None, start : int = 0, pre_pops : np.ndarray = None,
+                  pops : np.ndarray = None, speeds : np.ndarray = None, comp_pops : np.ndarray = None,
+                  chemicals : np.ndarray = None) -> None:
+        """
+        Log a block of fast-forwarded ticks, the arrays hold the state at the start of every tick (see GutODE.advance),
+        start is the first tick of the stretch.
+        """
+        agent = self.agent
+        for tick in range(len(pops)):
+            population.pop, population.speed = pops[tick], speeds[tick]
+            if self.population == None:
+                # the log of the object engine reads the Bacteria objects
+                population.syncBacteria()
+            elif self.time > start:
+                population.pre_pop = pre_pops[tick]
+                population.findReward()
+            agent.component_pop_array, agent.chemicals_array = comp_pops[tick], chemicals[tick]
+            agent.eat_time = self.scheduler.next_meal - self.time
+            self._log(filename)
+            self.time += 1
+
+    def integrate(self, ticks : int = 1, filename : str = None, **integrate_data) -> float:
+        """
+        Several steps without meal, events or colony ai in one call of the GutODE integrator, one log
+        row for the whole stretch. When the error estimate of the integration is above its rtol the
+        stretch is stepped with fastForward instead.
+
+        Parameters:\n
+            ticks = (int) steps to advance\n
+            integrate_data = GutODE options, override those given to World\n
+        Return:\n
+            error = (float) error estimate of the integration (see GutODE)
+        """
+        from integrator import GutODE
+        options = dict(self.integrate_data or {}, **integrate_data)
+        population = self._populationView()
+        agent = self.agent
+        # integrated on a copy of the arrays, the world is untouched until the result is accepted
+        trial = copy.copy(population)
+        trial.bacterias = None
+        ode = GutODE(population=trial, decay_rate=agent.chemical_decay_rate, **options)
+        comp_pop, chemicals = ode.advance(comp_pop=agent.component_pop_array, chemicals=agent.chemicals_array, ticks=ticks)
+        if ode.error > ode.rtol:
+            self.fastForward(ticks=ticks, filename=filename)
+            return ode.error
+        self._log(filename)
+        agent.setCurrState(chemical_list=self.chemical_list)
+        if self.graph != None:
+            self.graph.observeCurr(self, population=population)
+        population.adopt(trial)
+        agent.component_pop_array, agent.chemicals_array = comp_pop, chemicals
+        if self.population != None:
+            # the object engine only rewards colonies with an ai
+            population.findReward()
+        agent.setNextState(chemical_list=self.chemical_list)
+        if self.graph != None:
+            self.graph.observeNext(self, population=population)
+        self.time += ticks
+        agent.eat_time = self.scheduler.next_meal - self.time
+        population.syncBacteria()
+        return ode.error
+
+    def _populationView(self) -> Population:
+        """
+        Population of the vector engine, or one built from the Bacteria objects (object engine).
+        """
+        if self.population != None:
+            return self.population
+        population = Population(bacterias=self.bacterias, component_list=self.component_list,
+                                chemical_list=self.chemical_list)
+        # position in the current list, mapped to the node index of the graph
+        population.index = np.array([self.colony_index[bacteria.id] for bacteria in self.bacterias])
+        population.interaction = self.interaction
+        return population
+
+    def _makeGraph(self, bacteria_data : list = None, agent_data : dict = None) -> GutGraph:
+        """
+        GutGraph shared by the stgraph learners (None without any), its window is the longest lstm_memory
+        and its colony slots the largest max_colonies among them.
+        """
+        NN_datas = [data["AI_data"]["NN_data"] for data in bacteria_data + [agent_data] if _isGraphLearner(data)]
+        if len(NN_datas) == 0:
+            return None
+        memory = max(NN_data.get("lstm_memory", 2) for NN_data in NN_datas)
+        max_colonies = max(NN_data.get("max_colonies", len(bacteria_data)) for NN_data in NN_datas)
+        return GutGraph(colony_ids=[data["id"] for data in bacteria_data], no_components=len(self.component_list),
+                        no_chemical=len(self.chemical_list), memory=memory, max_colonies=max_colonies)
+
+    def _graphData(self, data : dict = None) -> dict:
+        """
+        Copy of a learner data whose NN_data is given the window and the size of the gut graph.
+        """
+        if not _isGraphLearner(data):
+            return data
+        NN_data = dict(data["AI_data"]["NN_data"], lstm_memory=self.graph.memory, nodes=self.graph.nodes,
+                       max_colonies=self.graph.max_colonies)
+        return dict(data, AI_data=dict(data["AI_data"], NN_data=NN_data))
+
+    def _applyEvents(self) -> tuple:
+        """
+        Apply the events due at this step.
+
+        Return:\n
+            meal = (bool) the agent eats this step\n
+            repeat = (bool) the meal is a regular one, the next one has to be scheduled
+        """
+        meal = repeat = False
+        for kind, data in self.scheduler.due(self.time):
+            if kind == "meal":
+                meal = True
+                repeat = repeat or data.get("repeat", False)
+            elif kind == "dose":
+                if "chemicals" in data:
+                    self.agent.setChemicals(chemicals_produced=data["chemicals"])
+                if "components" in data:
+                    self.agent.component_pop_array += self._dictToArray(data["components"], self.component_list)
+            elif kind == "colony":
+                self._changePop(ids=[data["id"]], add=data.get("pop", 100))
+            elif kind == "knockdown":
+                self._changePop(ids=data.get("ids"), factor=data.get("factor", 0.1))
+        return meal, repeat
+
+    def _changePop(self, ids : list = None, factor : float = 1, add : float = 0) -> None:
+        """
+        pop = max(pop*factor + add, 0.01) for the colonies ids (None : every colony).
+        """
+        for i, bacteria in enumerate(self.bacterias):
+            if ids == None or bacteria.id in ids:
+                bacteria.pop = max(bacteria.pop*factor + add, 0.01)
+                if self.population != None:
+                    # same order as the bacterias list
+                    self.population.pop[i] = bacteria.pop
     
     def agentAct(self) -> int:
         # state in gut before taking action
@@ -82,43 +420,144 @@ class World:
     def agentTrain(self, action):
         # state and food in gut after taking action
         self.agent.findReward(chemical_list=self.chemical_list, chemical_profile=self.chemical_profile)
-        self.agent.ai.train(reward=self.agent.reward, state=self.agent.curr_state, next_state=self.agent.next_state, action=action)
+        self.agent.ai.train(reward=self.agent.reward, state=self.agent.curr_input, next_state=self.agent.next_input, action=action)
+        self.total_reward += self.agent.reward
+        self.meals += 1
 
     def bacteriaTrain(self, bacteria : Bacteria, action : int) -> None:
         # state and food in gut after taking action
         bacteria.findReward(component_list=self.component_list)
-        bacteria.ai.train(reward=bacteria.reward, state=bacteria.curr_state, next_state=bacteria.next_state, action=action)
+        bacteria.ai.train(reward=bacteria.reward, state=bacteria.curr_input, next_state=bacteria.next_input, action=action)
 
     def bacteriaAct(self):
+        if self.engine == "vector":
+            self._bacteriaActVector()
+            return
         # current total number of bacterias
         total_bacteria_pop = sum([bacteria.pop for bacteria in self.bacterias])
+        component_pop = dict(self.agent.component_pop)
+        effects = np.zeros(len(self.bacterias))
+        if self.interaction != None:
+            index = np.array([self.colony_index[bacteria.id] for bacteria in self.bacterias])
+            effects = self.interaction.effect(np.array([bacteria.pop for bacteria in self.bacterias]), total_bacteria_pop, index)
+        # stgraph colonies train once every colony acted and the gut graph moved on
+        deferred = []
         # each bacteria act according to its speed
-        for bacteria in self.bacterias:
-            bacteria.setCurrState(component_list=self.component_list, component_pop=self.agent.component_pop)
+        for bacteria, effect in zip(self.bacterias, effects):
+            bacteria.setCurrState(component_list=self.component_list, component_pop=component_pop)
             # bacteria grow/decay accordance with food availablity
-            self.agent.component_pop = bacteria.growth(comp_pop=self.agent.component_pop, total_bacteria_pop=total_bacteria_pop)
+            component_pop = bacteria.growth(comp_pop=component_pop, total_bacteria_pop=total_bacteria_pop, interaction=effect)
             # bacteria produce chemicals and agent updates its chem pop
             chemical_produced = bacteria.produceChemicals()
             self.agent.setChemicals(chemicals_produced=chemical_produced)
             # increase or decrease speed
             bacteria.recatToChemical(self.agent.chemicals)
             # bacteria learns
-            bacteria.setNextState(component_list=self.component_list, component_pop=self.agent.component_pop)
+            bacteria.setNextState(component_list=self.component_list, component_pop=component_pop)
+            if bacteria.graph != None:
+                deferred.append(bacteria)
+            elif bacteria.ai != None:
+                self.bacteriaTrain(bacteria=bacteria, action=bacteria.action)
+        self.agent.component_pop_array = self._dictToArray(component_pop, self.component_list)
+        if self.graph != None:
+            self.graph.observeNext(self)
+        for bacteria in deferred:
             self.bacteriaTrain(bacteria=bacteria, action=bacteria.action)
     
+    def _bacteriaActVector(self) -> None:
+        """
+        bacteriaAct on the Population arrays, colonies still act in speed order.
+        """
+        population = self.population
+        comp_pop = self.agent.component_pop_array
+        chemicals = self.agent.chemicals_array
+        # bacteria grow/decay, snapshots[i] is the food seen by colony i
+        comp_pop, snapshots = population.growth(comp_pop=comp_pop)
+        # colonies with an ai decide on the food they saw
+        ai_rows = np.flatnonzero(population.has_ai)
+        for i in ai_rows:
+            bacteria = self.bacterias[i]
+            bacteria.setCurrStateArray(values=snapshots[i])
+        actions = self._bacteriaDecide(rows=ai_rows)
+        # bacteria produce chemicals and react to them
+        produced = population.produceChemicals(actions=actions)
+        chemicals = population.reactToChemical(chemicals=chemicals, produced=produced)
+        population.findReward()
+        self.agent.component_pop_array = comp_pop
+        self.agent.chemicals_array = chemicals
+        if self.graph != None:
+            self.graph.observeNext(self)
+        # bacteria learns
+        for i in ai_rows:
+            bacteria = self.bacterias[i]
+            bacteria.setNextStateArray(values=snapshots[i + 1])
+        self._bacteriaTrainBatch(rows=ai_rows, actions=actions)
+        population.syncBacteria()
+
+    def _groupByPolicy(self, rows : np.ndarray = None) -> tuple:
+        """
+        Split colonies into those sharing a policy (grouped by policy) and those with their own AI.
+
+        Return:\n
+            groups = (dict) {(SharedPolicy) : [row, ...], ...}\n
+            single = (list) [row, ...]
+        """
+        groups = {}
+        single = []
+        for i in rows:
+            ai = self.bacterias[i].ai
+            if isinstance(ai, PolicyMember):
+                groups.setdefault(ai.policy, []).append(i)
+            else:
+                single.append(i)
+        return groups, single
+
+    def _bacteriaDecide(self, rows : np.ndarray = None) -> np.ndarray:
+        """
+        Actions of the given colonies, one forward pass per shared policy.
+        """
+        actions = np.zeros(len(self.bacterias), dtype=int)
+        groups, single = self._groupByPolicy(rows=rows)
+        for policy, group in groups.items():
+            members = [self.bacterias[i].ai.idx for i in group]
+            states = [self.bacterias[i].curr_input for i in group]
+            actions[group] = policy.decideBatch(members=members, states=states)
+        for i in single:
+            actions[i] = self.bacterias[i].ai.decide(self.bacterias[i].curr_input)
+        return actions
+
+    def _bacteriaTrainBatch(self, rows : np.ndarray = None, actions : np.ndarray = None) -> None:
+        """
+        Train the given colonies, one batched update per shared policy.
+        """
+        groups, single = self._groupByPolicy(rows=rows)
+        for policy, group in groups.items():
+            policy.trainBatch(members=[self.bacterias[i].ai.idx for i in group],
+                              rewards=self.population.reward[group],
+                              states=[self.bacterias[i].curr_input for i in group],
+                              next_states=[self.bacterias[i].next_input for i in group],
+                              actions=actions[group])
+        for i in single:
+            bacteria = self.bacterias[i]
+            bacteria.ai.train(reward=self.population.reward[i], state=bacteria.curr_input, next_state=bacteria.next_input, action=actions[i])
+
+    def _dictToArray(self, values : dict = None, names : list = None) -> np.ndarray:
+        """
+        Convert a name keyed dict to an array ordered as names (missing names are 0).
+        """
+        return np.array([values.get(name, 0) for name in names], dtype=float)
+
     def _sortBacteria(self) -> None:
         """
         Sort bacteria list as according to there speed value
         """
+        if self.engine == "vector":
+            self.population.sortBySpeed()
+            return
         self.bacterias.sort(reverse=True, key=lambda x: x.speed)
 
     def _chemToState(self, chemicals):
-        index = 0
-        state = np.zeros((1, self.no_chemical))
-        for chemical in self.chemical_list:
-            if chemical in chemicals:
-                state[0][index] = chemicals[chemical]
-            index += 1
+        state = self._dictToArray(chemicals, self.chemical_list)[None, :]
         # state[0] = self._normalize(state[0])
         return state
 
@@ -147,55 +586,67 @@ class World:
         state = np.exp(state)/np.sum(np.exp(state))
         return state
 
-    def _setPlotData(self, plot_time, plot_bacteria_pop, plot_component_pop, plot_food_pop, plot_chemical_pop, plot_reward):
-        plot_time.append(self.time)
-        
-        for i in range(self.no_bacteria):
-            plot_bacteria_pop[i].append(self.bacterias[i].pop)
-        for i, comp in enumerate(self.component_list):
-            plot_component_pop[i].append(self.agent.component_pop.get(comp, 0))
-        for i, chem in enumerate(self.chemical_list):
-            plot_chemical_pop[i].append(self.agent.chemicals.get(chem, 0))
-        plot_food_pop.append(self.agent.action)
-        plot_reward.append(self.reward)
+    def _setPlotData(self, metrics = None) -> None:
+        """
+        Add the current step to the plot data (MetricsRecorder, default : self.metrics).
+        """
+        metrics = self.metrics if metrics == None else metrics
+        metrics.record(self)
     
-    def _log(self, filename):
-        data = []
-        print("############################################")
-        print(f"Time : {self.time}")
-        data.append(self.time)
-        print("Bacterias:")
-        for i in range(self.no_bacteria):
-            print("------------------------------")
-            print(f"id : {self.bacterias[i].id}")
-            print(f"population : {self.bacterias[i].pop}")
-            print(f"speed : {self.bacterias[i].speed}")
-            print(f"reward : {self.bacterias[i].reward}")
-            data.append(self.bacterias[i].id)
-            data.append(self.bacterias[i].pop)
-            data.append(self.bacterias[i].speed)
-            data.append(self.bacterias[i].reward)
-        print("------------------------------")
-        print("Agent:")
-        print(f"Component in guts :{self.agent.component_pop}")
-        print(f"Chemicals in system: {self.agent.chemicals}")
-        # print(f"State of system: {self.agent.chemicals}")
-        print(f"Time till eat time : {self.agent.eat_time}")
-        print(f"Exploration : {self.agent.ai.exploration}")
-        print(f"Reward : {self.agent.reward}")
-        for comp in self.component_list:
-            data.append(self.agent.component_pop.get(comp, 0))
-        for chem in self.chemical_list:
-            data.append(self.agent.chemicals.get(chem, 0))
-        data.append(self.agent.eat_time)
-        data.append(self.agent.ai.exploration)
-        data.append(self.agent.reward)
-        print("############################################")
-            
-        # writing to csv file 
-        with open(filename, 'a') as csvfile: 
-            # creating a csv writer object 
-            csvwriter = csv.writer(csvfile)
-                
-            # writing the fields
-            csvwriter.writerow(data)
\ No newline at end of file
+    def summary(self) -> dict:
+        """
+        Summary of the run so far.
+
+        Return:\n
+            summary = (dict) {"time" : (int), "total_reward" : (float), ...}
+        """
+        summary = {
+            "time" : self.time,
+            "meals" : self.meals,
+            "total_reward" : float(self.total_reward),
+            "mean_reward" : float(self.total_reward/self.meals) if self.meals else 0.0,
+            "exploration" : float(self.agent.ai.exploration),
+            # "converged" : stopped by the convergence monitor, "skipped" : steady state skipped up to the end
+            "stop_reason" : self._stopReason(),
+            "skipped_steps" : 0 if self.monitor == None else self.monitor.skipped,
+        }
+        for bacteria in sorted(self.bacterias, key=lambda x: x.id):
+            summary[f"B{bacteria.id}_pop"] = float(bacteria.pop)
+        for chem, amount in zip(self.chemical_list, self.agent.chemicals_array):
+            summary[f"{chem}_pop"] = float(amount)
+        return summary
+
+    def _stopReason(self) -> str:
+        if self.stop_reason != None:
+            return self.stop_reason["reason"]
+        if self.monitor != None and self.monitor.skipped > 0:
+            return "skipped"
+        return "total_time"
+
+    def _log(self, filename : str = None) -> None:
+        """
+        Log the current step to filename (buffered, see RunLogger) and to the metrics.
+        """
+        if self.metrics != None:
+            self._setPlotData()
+        if filename == None:
+            return
+        if self.logger == None or self.logger.filename != filename:
+            self.closeLog()
+            self.logger = RunLogger(filename=filename, no_bacteria=self.no_bacteria, component_list=self.component_list,
+                                    chemical_list=self.chemical_list, **self.log_data)
+        self.logger.record(self)
+
+    def closeLog(self) -> None:
+        """
+        Flush and close the run log.
+        """
+        if self.logger != None:
+            self.logger.close()
+            self.logger = None
+
+def _isGraphLearner(data : dict = None) -> bool:
+    """
+    True when the colony / agent data builds an stgraph learner.
+    """
+    return data.get("AI_data") != None and isGraph(data["AI_data"].get("NN_data"))